@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from moepy import lowess
+
+from .common import dataset_sizes, load_turbine_power_curve, load_price_curve, construct_synthetic_ts, construct_reg_dates
+
+
+class WeightsMatrix:
+    params = dataset_sizes
+    param_names = ['num_rows']
+
+    def setup(self, num_rows):
+        self.x = construct_synthetic_ts(num_rows)['x'].values
+
+    def time_get_weights_matrix(self, num_rows):
+        lowess.get_weights_matrix(self.x, frac=0.3, num_fits=31)
+
+    def peakmem_get_weights_matrix(self, num_rows):
+        lowess.get_weights_matrix(self.x, frac=0.3, num_fits=31)
+
+
+class FitRegressions:
+    params = (dataset_sizes, ['linear', 'quantile'])
+    param_names = ['num_rows', 'reg_type']
+    timeout = 300
+
+    def setup(self, num_rows, reg_type):
+        if reg_type == 'quantile' and num_rows > 100_000:
+            raise NotImplementedError('The quantile solves are too slow to benchmark at this size')
+
+        df_synthetic = construct_synthetic_ts(num_rows)
+        self.x, self.y = df_synthetic['x'].values, df_synthetic['y'].values
+        self.weights = lowess.get_weights_matrix(self.x, frac=0.3, num_fits=31)
+
+        self.reg_kwargs = {
+            'linear': {'reg_func': lowess.calc_lin_reg_betas},
+            'quantile': {'reg_func': lowess.calc_quant_reg_betas, 'q': 0.5},
+        }[reg_type]
+
+    def time_fit_regressions(self, num_rows, reg_type):
+        lowess.fit_regressions(self.x, self.y, weights=self.weights, **self.reg_kwargs)
+
+    def peakmem_fit_regressions(self, num_rows, reg_type):
+        lowess.fit_regressions(self.x, self.y, weights=self.weights, **self.reg_kwargs)
+
+
+class LowessExample:
+    timeout = 300
+
+    def setup(self):
+        self.x, self.y = load_turbine_power_curve()
+        self.x_pred = np.linspace(self.x.min(), self.x.max(), 251)
+
+        self.model = lowess.Lowess()
+        self.model.fit(self.x, self.y, frac=0.2, num_fits=51)
+
+    def time_fit(self):
+        lowess.Lowess().fit(self.x, self.y, frac=0.2, num_fits=51)
+
+    def peakmem_fit(self):
+        lowess.Lowess().fit(self.x, self.y, frac=0.2, num_fits=51)
+
+    def time_predict(self):
+        self.model.predict(self.x_pred)
+
+    def time_bootstrap_model(self):
+        lowess.bootstrap_model(self.x, self.y, num_runs=10, frac=0.2, num_fits=51)
+
+    def peakmem_bootstrap_model(self):
+        lowess.bootstrap_model(self.x, self.y, num_runs=10, frac=0.2, num_fits=51)
+
+
+class LowessSynthetic:
+    params = dataset_sizes
+    param_names = ['num_rows']
+    timeout = 300
+
+    def setup(self, num_rows):
+        df_synthetic = construct_synthetic_ts(num_rows)
+        self.x, self.y = df_synthetic['x'].values, df_synthetic['y'].values
+        self.x_pred = np.linspace(10, 60, 501)
+
+        self.model = lowess.Lowess()
+        self.model.fit(self.x, self.y, frac=0.3, num_fits=31)
+
+    def time_fit(self, num_rows):
+        lowess.Lowess().fit(self.x, self.y, frac=0.3, num_fits=31)
+
+    def peakmem_fit(self, num_rows):
+        lowess.Lowess().fit(self.x, self.y, frac=0.3, num_fits=31)
+
+    def time_predict(self, num_rows):
+        self.model.predict(self.x_pred)
+
+    def time_predict_cached(self, num_rows):
+        self.model.predict(self.x_pred, cache_weights=True)
+
+
+class AnchorPlacement:
+    """Compares the hold-out error and fit time of the anchor placements as the number of anchors is reduced"""
+    params = (['GB', 'DE', 'turbine', 'synthetic'], ['uniform', 'quantile', 'curvature'], [8, 16, 31], [0.1, 0.3])
+    param_names = ['dataset', 'anchor_method', 'num_fits', 'frac']
+    timeout = 600
+
+    def setup(self, dataset, anchor_method, num_fits, frac):
+        if dataset in ['GB', 'DE']:
+            x, y = load_price_curve(dataset)
+        elif dataset == 'turbine':
+            x, y = load_turbine_power_curve()
+        else:
+            df_synthetic = construct_synthetic_ts(100_000)
+            x, y = df_synthetic['x'].values, df_synthetic['y'].values
+
+        # Every fifth data-point is held out
+        is_test = np.arange(x.size) % 5 == 0
+        self.x, self.y = x[~is_test], y[~is_test]
+        self.x_test, self.y_test = x[is_test], y[is_test]
+
+    def fit(self, anchor_method, num_fits, frac):
+        model = lowess.Lowess()
+        model.fit(self.x, self.y, frac=frac, num_fits=num_fits, anchor_method=anchor_method, robust_iters=1)
+
+        return model
+
+    def track_holdout_rmse(self, dataset, anchor_method, num_fits, frac):
+        model = self.fit(anchor_method, num_fits, frac)
+        holdout_rmse = np.sqrt(np.mean((model.predict(self.x_test) - self.y_test)**2))
+
+        return holdout_rmse
+
+    track_holdout_rmse.unit = 'rmse'
+
+    def time_fit(self, dataset, anchor_method, num_fits, frac):
+        self.fit(anchor_method, num_fits, frac)
+
+
+def fit_smooth_dates(df_synthetic, reg_dates):
+    smooth_dates = lowess.SmoothDates()
+    smooth_dates.fit(df_synthetic['x'], df_synthetic['y'], reg_dates=reg_dates,
+                     frac=0.3, num_fits=31, threshold_value=26, threshold_units='W')
+
+    return smooth_dates
+
+
+class SmoothDatesFit:
+    params = dataset_sizes
+    param_names = ['num_rows']
+    timeout = 600
+
+    def setup(self, num_rows):
+        self.df_synthetic = construct_synthetic_ts(num_rows)
+        self.reg_dates = construct_reg_dates(self.df_synthetic.index)
+
+    def time_fit(self, num_rows):
+        fit_smooth_dates(self.df_synthetic, self.reg_dates)
+
+    def peakmem_fit(self, num_rows):
+        fit_smooth_dates(self.df_synthetic, self.reg_dates)
+
+
+class SmoothDatesPredict:
+    timeout = 300
+
+    def setup(self):
+        df_synthetic = construct_synthetic_ts(100_000)
+
+        self.dt_pred = df_synthetic.index.normalize().unique()
+        self.x_pred = np.round(np.linspace(10, 60, 501), 1)
+        self.model = fit_smooth_dates(df_synthetic, construct_reg_dates(df_synthetic.index))
+
+    def time_predict(self):
+        self.model.predict(x_pred=self.x_pred, dt_pred=self.dt_pred)
+
+    def peakmem_predict(self):
+        self.model.predict(x_pred=self.x_pred, dt_pred=self.dt_pred)
+
+
+class ConstructPredTs:
+    params = dataset_sizes
+    param_names = ['num_rows']
+    timeout = 600
+
+    def setup(self, num_rows):
+        if num_rows > 100_000:
+            raise NotImplementedError('The row-wise surface lookup is too slow to benchmark at this size')
+
+        df_synthetic = construct_synthetic_ts(num_rows)
+        dt_pred = df_synthetic.index.normalize().unique()
+        x_pred = np.round(np.arange(0, 80, 0.1), 1)
+
+        self.s = df_synthetic['x'].clip(0, 79.9)
+        self.df_pred = pd.DataFrame(np.zeros((x_pred.size, dt_pred.size)), index=x_pred, columns=dt_pred.strftime('%Y-%m-%d'))
+
+    def time_construct_pred_ts(self, num_rows):
+        lowess.construct_pred_ts(self.s, self.df_pred)
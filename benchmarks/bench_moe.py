@@ -0,0 +1,97 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+import urllib.parse
+import urllib.request
+
+from moepy import moe
+
+from .common import dataset_sizes, load_hydro_ts, construct_synthetic_ts
+
+
+class WeightedMeanExample:
+    def setup(self):
+        self.s_hydro = load_hydro_ts()
+        self.dt_rng = pd.date_range(self.s_hydro.index.min(), self.s_hydro.index.max(), freq='W')
+
+    def time_weighted_mean_s(self):
+        moe.weighted_mean_s(self.s_hydro, dt_rng=self.dt_rng)
+
+
+class WeightedMeanSynthetic:
+    params = dataset_sizes
+    param_names = ['num_rows']
+
+    def setup(self, num_rows):
+        df_synthetic = construct_synthetic_ts(num_rows)
+        self.s, self.s_weight = df_synthetic['y'], df_synthetic['x']
+        self.dt_rng = pd.date_range(df_synthetic.index.min(), df_synthetic.index.max(), freq='W')
+
+    def time_weighted_mean_s(self, num_rows):
+        moe.weighted_mean_s(self.s, self.s_weight, dt_rng=self.dt_rng)
+
+    def peakmem_weighted_mean_s(self, num_rows):
+        moe.weighted_mean_s(self.s, self.s_weight, dt_rng=self.dt_rng)
+
+
+def calc_latency_percentiles(query_func, queries, percentile):
+    """Times each query individually, returning the latency percentile in microseconds"""
+    latencies = []
+
+    for query in queries:
+        start_time = time.perf_counter_ns()
+        query_func(*query)
+        latencies += [time.perf_counter_ns() - start_time]
+
+    return np.percentile(latencies, percentile)/1e3
+
+
+def construct_query_service(num_rows=100_000):
+    """Preloads random price surfaces for three quantiles and constructs synthetic queries covering them"""
+    x_pred = np.round(np.linspace(-2, 61, 631), 1)
+    dt_pred = pd.date_range('2009-01-01', '2020-12-31', freq='1D')
+    rng = np.random.default_rng(0)
+
+    q_to_df_pred = {q: pd.DataFrame(rng.normal(size=(x_pred.size, dt_pred.size)), index=x_pred, columns=dt_pred) for q in [0.1, 0.5, 0.9]}
+    service = moe.SurfaceQueryService(q_to_df_pred)
+
+    df_synthetic = construct_synthetic_ts(num_rows, start_date='2010-01-01')
+
+    return service, df_synthetic['x'].values, df_synthetic.index
+
+
+class SurfaceQueryLatency:
+    params = [50, 99]
+    param_names = ['percentile']
+    unit = 'us'
+    timeout = 300
+
+    def setup(self, percentile):
+        self.service, x, dt_idx = construct_query_service(10_000)
+        self.queries = [(x_value, dt.to_pydatetime(), 0.5) for x_value, dt in zip(x, dt_idx)]
+
+        self.server = self.service.start_server(port=0)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/query'
+
+    def teardown(self, percentile):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def track_query_latency(self, percentile):
+        return calc_latency_percentiles(self.service.query, self.queries, percentile)
+
+    def track_http_query_latency(self, percentile):
+        http_query = lambda x, dt, q: urllib.request.urlopen(f"{self.url}?{urllib.parse.urlencode({'x': x, 'dt': dt.isoformat(), 'quantile': q})}").read()
+
+        return calc_latency_percentiles(http_query, self.queries[:1_000], percentile)
+
+
+class SurfaceQueryBatch:
+    timeout = 300
+
+    def setup(self):
+        self.service, self.x, self.dt_idx = construct_query_service(100_000)
+
+    def time_query_batch(self):
+        self.service.query_batch(self.x, self.dt_idx, quantiles=0.5)
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'lowess_examples')
+raw_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'raw')
+dataset_sizes = [10_000, 100_000, 1_000_000]
+
+def load_turbine_power_curve():
+    """Loads the wind speed and power output from the raw turbine example data"""
+    df_turbine = pd.read_csv(f'{data_dir}/turbine_power_wind_speed_raw.csv').dropna()
+
+    x = df_turbine['wind_speed'].values.astype(float)
+    y = df_turbine['active_power'].values.astype(float)
+
+    return x, y
+
+def load_hydro_ts():
+    """Loads the hourly Portugese hydro output example data"""
+    s_hydro = pd.read_csv(f'{data_dir}/portugese_hydro.csv', index_col='datetime', parse_dates=True)['power_MW']
+
+    return s_hydro
+
+def load_price_curve(country):
+    """Loads the dispatchable generation and price for GB (Electric Insights) or DE (Energy-Charts and ENTSOE)"""
+    from moepy import eda
+
+    if country == 'GB':
+        EI_fp = f'{raw_data_dir}/electric_insights.csv'
+
+        if not os.path.exists(EI_fp):
+            raise NotImplementedError(f'The GB price data is not available at {EI_fp}')
+
+        df = eda.load_EI_df(EI_fp, columns=['day_ahead_price', 'demand', 'solar', 'wind']).dropna()
+        s_dispatchable = df['demand'] - df[['solar', 'wind']].sum(axis=1)
+        s_price = df['day_ahead_price']
+
+    elif country == 'DE':
+        EC_fp, ENTSOE_fp = f'{raw_data_dir}/energy_charts.csv', f'{raw_data_dir}/ENTSOE_DE_price.csv'
+
+        if not (os.path.exists(EC_fp) and os.path.exists(ENTSOE_fp)):
+            raise NotImplementedError(f'The DE price data is not available at {EC_fp} and {ENTSOE_fp}')
+
+        df = eda.load_DE_df(EC_fp, ENTSOE_fp)[['price', 'demand', 'Solar', 'Wind']].dropna()
+        s_dispatchable = df['demand'] - df[['Solar', 'Wind']].sum(axis=1)
+        s_price = df['price']
+
+    return s_dispatchable.values.astype(float), s_price.values.astype(float)
+
+def construct_synthetic_ts(num_rows, start_date='1990-01-01', seed=0):
+    """Constructs half-hourly dispatchable demand and price series with a drifting merit order curve"""
+    rng = np.random.default_rng(seed)
+    dt_idx = pd.date_range(start_date, periods=num_rows, freq='30T', tz='UTC')
+
+    day_frac = np.asarray(dt_idx.hour*2 + dt_idx.minute//30)/48
+    year_frac = np.arange(num_rows)/(48*365.25)
+
+    x = 35 + 10*np.sin(2*np.pi*day_frac) + 5*np.cos(2*np.pi*year_frac) + rng.normal(0, 3, num_rows)
+    y = 0.02*x**2 + 0.5*x + 2*np.sin(2*np.pi*year_frac/4) + rng.normal(0, 2, num_rows)
+
+    df_synthetic = pd.DataFrame({'x': x, 'y': y}, index=dt_idx)
+
+    return df_synthetic
+
+def construct_reg_dates(dt_idx, num_reg_dates=8):
+    """Spreads a fixed number of regression dates over the series, so that the fits scale with the rows"""
+    reg_dates = pd.date_range(dt_idx.min().normalize(), dt_idx.max().normalize(), periods=num_reg_dates)
+
+    return reg_dates
@@ -5,7 +5,11 @@ __all__ = ["index", "modules", "custom_doc_links", "git_url"]
 index = {"query_API": "dev-01-retrieval.ipynb",
          "dict_col_2_cols": "dev-01-retrieval.ipynb",
          "clean_nested_dict_cols": "dev-01-retrieval.ipynb",
+         "values_2_typed_array": "dev-01-retrieval.ipynb",
+         "json_records_2_df": "dev-01-retrieval.ipynb",
          "set_dt_idx": "dev-01-retrieval.ipynb",
+         "dt_rng_2_SPs": "dev-01-retrieval.ipynb",
+         "construct_df_dt_rng": "dev-01-retrieval.ipynb",
          "create_df_dt_rng": "dev-01-retrieval.ipynb",
          "clean_df_dts": "dev-01-retrieval.ipynb",
          "retrieve_stream_df": "dev-01-retrieval.ipynb",
@@ -17,6 +21,11 @@ index = {"query_API": "dev-01-retrieval.ipynb",
          "retrieve_production": "dev-01-retrieval.ipynb",
          "load_EI_df": "dev-02-eda.ipynb",
          "load_DE_df": "dev-02-eda.ipynb",
+         "csv_2_columnar": "dev-02-eda.ipynb",
+         "load_columnar_df": "dev-02-eda.ipynb",
+         "get_default_cache_dir": "dev-02-eda.ipynb",
+         "get_columnar_cache_fp": "dev-02-eda.ipynb",
+         "load_cached_df": "dev-02-eda.ipynb",
          "clean_df_for_plot": "dev-02-eda.ipynb",
          "rgb_2_plt_tuple": "dev-02-eda.ipynb",
          "convert_fuel_colour_dict_to_plt_tuple": "dev-02-eda.ipynb",
@@ -35,54 +44,193 @@ index = {"query_API": "dev-01-retrieval.ipynb",
          "get_weighting_locs": "dev-03-lowess.ipynb",
          "create_dist_matrix": "dev-03-lowess.ipynb",
          "num_fits_2_reg_anchors": "dev-03-lowess.ipynb",
+         "num_fits_2_quantile_reg_anchors": "dev-03-lowess.ipynb",
+         "num_fits_2_curvature_reg_anchors": "dev-03-lowess.ipynb",
          "get_weights_matrix": "dev-03-lowess.ipynb",
          "calc_lin_reg_betas": "dev-03-lowess.ipynb",
          "fit_regressions": "dev-03-lowess.ipynb",
          "check_array": "dev-03-lowess.ipynb",
          "lowess_fit_and_predict": "dev-03-lowess.ipynb",
-         "calc_robust_weights": "dev-03-lowess.ipynb",
+         "calc_robust_weights": "dev-13-kernels.ipynb",
          "robust_lowess_fit_and_predict": "dev-03-lowess.ipynb",
+         "pred_weights_cache": "dev-03-lowess.ipynb",
+         "pred_weights_cache_lock": "dev-03-lowess.ipynb",
+         "max_pred_weights_cache_bytes": "dev-03-lowess.ipynb",
+         "get_sparse_nbytes": "dev-03-lowess.ipynb",
+         "get_cached_pred_weights": "dev-03-lowess.ipynb",
+         "lowess_backends": "dev-03-lowess.ipynb",
+         "resolve_backend": "dev-03-lowess.ipynb",
+         "get_reg_func_kind": "dev-03-lowess.ipynb",
          "Lowess": "dev-03-lowess.ipynb",
+         "calc_weighted_moment_sums": "dev-03-lowess.ipynb",
+         "moment_sums_2_design_matrix": "dev-03-lowess.ipynb",
+         "merge_lowess_fits": "dev-03-lowess.ipynb",
+         "fit_lowess_chunked": "dev-03-lowess.ipynb",
+         "calc_frac_fits": "dev-03-lowess.ipynb",
+         "calc_frac_scores": "dev-03-lowess.ipynb",
+         "select_frac": "dev-03-lowess.ipynb",
          "get_bootstrap_idxs": "dev-03-lowess.ipynb",
          "get_bootstrap_resid_std_devs": "dev-03-lowess.ipynb",
          "run_model": "dev-03-lowess.ipynb",
          "bootstrap_model": "dev-03-lowess.ipynb",
          "get_confidence_interval": "dev-03-lowess.ipynb",
          "pred_to_quantile_loss": "dev-03-lowess.ipynb",
-         "calc_quant_reg_loss": "dev-03-lowess.ipynb",
-         "calc_quant_reg_betas": "dev-03-lowess.ipynb",
+         "calc_quant_reg_loss": "dev-13-kernels.ipynb",
+         "calc_quant_reg_betas": "dev-13-kernels.ipynb",
          "quantile_model": "dev-03-lowess.ipynb",
          "calc_timedelta_dists": "dev-03-lowess.ipynb",
          "construct_dt_weights": "dev-03-lowess.ipynb",
+         "construct_shared_fit_weights": "dev-03-lowess.ipynb",
+         "get_weight_support": "dev-03-lowess.ipynb",
+         "fit_lowess_on_support": "dev-03-lowess.ipynb",
          "fit_external_weighted_ensemble": "dev-03-lowess.ipynb",
          "get_ensemble_preds": "dev-03-lowess.ipynb",
+         "get_pred_dt_weights": "dev-03-lowess.ipynb",
+         "get_shared_pred_kwargs": "dev-03-lowess.ipynb",
+         "calc_smooth_dates_surface": "dev-03-lowess.ipynb",
+         "get_reg_date_supports": "dev-03-lowess.ipynb",
+         "estimate_fit_cost": "dev-03-lowess.ipynb",
+         "calc_pilot_reg_date_preds": "dev-03-lowess.ipynb",
+         "plan_reg_dates": "dev-03-lowess.ipynb",
+         "max_fallback_reg_dates": "dev-03-lowess.ipynb",
          "process_smooth_dates_fit_inputs": "dev-03-lowess.ipynb",
          "SmoothDates": "dev-03-lowess.ipynb",
          "construct_pred_ts": "dev-05-price-moe.ipynb",
          "LowessDates": "dev-03-lowess.ipynb",
          "PicklableFunction": "dev-04-price-surface-estimation.ipynb",
          "get_fit_kwarg_sets": "dev-04-price-surface-estimation.ipynb",
+         "hash_fit_code": "dev-04-price-surface-estimation.ipynb",
+         "hash_fit_value": "dev-04-price-surface-estimation.ipynb",
+         "get_fit_job_hash": "dev-04-price-surface-estimation.ipynb",
+         "load_fit_manifest": "dev-04-price-surface-estimation.ipynb",
+         "atomic_write": "dev-04-price-surface-estimation.ipynb",
+         "construct_fit_jobs": "dev-04-price-surface-estimation.ipynb",
+         "get_model_spec_reg_dates": "dev-04-price-surface-estimation.ipynb",
+         "add_shared_fit_weights": "dev-04-price-surface-estimation.ipynb",
+         "add_latest_fit_weights": "dev-04-price-surface-estimation.ipynb",
+         "fit_model_job": "dev-04-price-surface-estimation.ipynb",
+         "pool_worker_fit_weights": "dev-04-price-surface-estimation.ipynb",
+         "fit_model_job_in_pool": "dev-04-price-surface-estimation.ipynb",
          "fit_models": "dev-04-price-surface-estimation.ipynb",
          "construct_dispatchable_lims_df": "dev-05-price-moe.ipynb",
+         "construct_pred_mask": "dev-05-price-moe.ipynb",
          "construct_pred_mask_df": "dev-05-price-moe.ipynb",
          "AxTransformer": "dev-05-price-moe.ipynb",
          "set_ticks": "dev-05-price-moe.ipynb",
          "set_date_ticks": "dev-05-price-moe.ipynb",
          "construct_df_pred": "dev-05-price-moe.ipynb",
+         "df_pred_cache": "dev-05-price-moe.ipynb",
+         "max_df_pred_cache_size": "dev-05-price-moe.ipynb",
+         "get_cached_df_pred": "dev-05-price-moe.ipynb",
+         "get_local_dates": "dev-05-price-moe.ipynb",
+         "get_surface_idxs": "dev-05-price-moe.ipynb",
+         "gather_surface_preds": "dev-05-price-moe.ipynb",
          "calc_error_metrics": "dev-05-price-moe.ipynb",
+         "construct_multi_pred_ts": "dev-05-price-moe.ipynb",
+         "clean_pred_ts_inputs": "dev-05-price-moe.ipynb",
+         "get_model_multi_pred_ts": "dev-05-price-moe.ipynb",
          "get_model_pred_ts": "dev-05-price-moe.ipynb",
+         "calc_surface_cells": "dev-05-price-moe.ipynb",
+         "calc_surface_date_means": "dev-05-price-moe.ipynb",
+         "calc_weighted_pred_intvl": "dev-05-price-moe.ipynb",
+         "calc_window_sums": "dev-05-price-moe.ipynb",
          "weighted_mean_s": "dev-05-price-moe.ipynb",
-         "app": "dev-10-ci-cd.ipynb",
+         "stream_surface": "dev-05-price-moe.ipynb",
+         "stream_multi_pred_ts": "dev-05-price-moe.ipynb",
+         "stream_moe": "dev-05-price-moe.ipynb",
+         "summarise_moe_aggs": "dev-05-price-moe.ipynb",
+         "stream_moe_aggregates": "dev-05-price-moe.ipynb",
+         "run_moe_pipeline": "dev-05-price-moe.ipynb",
+         "construct_scenario_state": "dev-05-price-moe.ipynb",
+         "scenario_worker_state": "dev-05-price-moe.ipynb",
+         "init_scenario_worker": "dev-05-price-moe.ipynb",
+         "evaluate_scenario": "dev-05-price-moe.ipynb",
+         "evaluate_scenarios": "dev-05-price-moe.ipynb",
+         "calc_scenario_savings": "dev-05-price-moe.ipynb",
+         "run_scenarios": "dev-05-price-moe.ipynb",
+         "predict_model_surface": "dev-05-price-moe.ipynb",
+         "predict_model_surfaces": "dev-05-price-moe.ipynb",
+         "get_position_lookup": "dev-05-price-moe.ipynb",
+         "dt_to_local_day": "dev-05-price-moe.ipynb",
+         "dts_to_local_days": "dev-05-price-moe.ipynb",
+         "SurfaceQueryService": "dev-05-price-moe.ipynb",
+         "SurfaceQueryHandler": "dev-05-price-moe.ipynb",
+         "app": "dev-14-distributed.ipynb",
          "get_current_package_version": "dev-10-ci-cd.ipynb",
          "increment_package_version": "dev-10-ci-cd.ipynb",
-         "set_current_package_version": "dev-10-ci-cd.ipynb"}
+         "set_current_package_version": "dev-10-ci-cd.ipynb",
+         "check_import_time": "dev-10-ci-cd.ipynb",
+         "profiler_state": "dev-11-profiling.ipynb",
+         "get_array_sizes": "dev-11-profiling.ipynb",
+         "Profiler": "dev-11-profiling.ipynb",
+         "profile_stage": "dev-11-profiling.ipynb",
+         "profiled": "dev-11-profiling.ipynb",
+         "load_definitions_file": "dev-12-batch.ipynb",
+         "parse_col_list": "dev-12-batch.ipynb",
+         "get_series_cols": "dev-12-batch.ipynb",
+         "load_data_df": "dev-12-batch.ipynb",
+         "construct_series": "dev-12-batch.ipynb",
+         "data_keys": "dev-12-batch.ipynb",
+         "construct_model_definitions": "dev-12-batch.ipynb",
+         "ColumnarChunkWriter": "dev-12-batch.ipynb",
+         "write_columnar_chunks": "dev-12-batch.ipynb",
+         "write_while_streaming": "dev-12-batch.ipynb",
+         "surface_chunk_to_rows": "dev-12-batch.ipynb",
+         "load_surface": "dev-12-batch.ipynb",
+         "get_model_fps": "dev-12-batch.ipynb",
+         "get_output_fp": "dev-12-batch.ipynb",
+         "run_model_jobs": "dev-12-batch.ipynb",
+         "predict_surface_job": "dev-12-batch.ipynb",
+         "load_input_series": "dev-12-batch.ipynb",
+         "predict_ts_job": "dev-12-batch.ipynb",
+         "moe_report_job": "dev-12-batch.ipynb",
+         "parse_series_expr": "dev-12-batch.ipynb",
+         "construct_x_pred": "dev-12-batch.ipynb",
+         "fit": "dev-12-batch.ipynb",
+         "predict_surface": "dev-12-batch.ipynb",
+         "predict_ts": "dev-12-batch.ipynb",
+         "moe_report": "dev-12-batch.ipynb",
+         "numba_available": "dev-13-kernels.ipynb",
+         "jit_kernel": "dev-13-kernels.ipynb",
+         "tricube_weight": "dev-13-kernels.ipynb",
+         "calc_anchor_dist_thresholds": "dev-13-kernels.ipynb",
+         "calc_fused_moment_sums": "dev-13-kernels.ipynb",
+         "calc_weights_matrix_moment_sums": "dev-13-kernels.ipynb",
+         "predict_fused_lin_regs": "dev-13-kernels.ipynb",
+         "FitCoordinator": "dev-14-distributed.ipynb",
+         "FitWorkerManager": "dev-14-distributed.ipynb",
+         "is_loopback_address": "dev-14-distributed.ipynb",
+         "serve_coordinator": "dev-14-distributed.ipynb",
+         "stop_coordinator": "dev-14-distributed.ipynb",
+         "get_connect_address": "dev-14-distributed.ipynb",
+         "compact_lowess": "dev-14-distributed.ipynb",
+         "compact_smooth_dates": "dev-14-distributed.ipynb",
+         "fit_ensemble_member_task": "dev-14-distributed.ipynb",
+         "worker_state": "dev-14-distributed.ipynb",
+         "add_cached_fit_weights": "dev-14-distributed.ipynb",
+         "fit_model_job_task": "dev-14-distributed.ipynb",
+         "task_kind_to_func": "dev-14-distributed.ipynb",
+         "run_fit_task": "dev-14-distributed.ipynb",
+         "get_worker_id": "dev-14-distributed.ipynb",
+         "renew_lease_until": "dev-14-distributed.ipynb",
+         "run_fit_worker": "dev-14-distributed.ipynb",
+         "check_workers_available": "dev-14-distributed.ipynb",
+         "run_distributed_tasks": "dev-14-distributed.ipynb",
+         "fit_ensemble_members_distributed": "dev-14-distributed.ipynb",
+         "fit_jobs_distributed": "dev-14-distributed.ipynb",
+         "parse_address": "dev-14-distributed.ipynb",
+         "worker": "dev-14-distributed.ipynb"}
 
 modules = ["retrieval.py",
            "eda.py",
            "lowess.py",
            "surface.py",
            "moe.py",
-           "cicd.py"]
+           "cicd.py",
+           "profiling.py",
+           "batch.py",
+           "kernels.py",
+           "distributed.py"]
 
 doc_url = "https://AyrtonB.github.io/Merit-Order-Effect/"
 
@@ -0,0 +1,401 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-12-batch.ipynb (unless otherwise specified).
+
+__all__ = ['load_definitions_file', 'parse_col_list', 'get_series_cols', 'load_data_df', 'construct_series',
+           'data_keys', 'construct_model_definitions', 'ColumnarChunkWriter', 'write_columnar_chunks',
+           'write_while_streaming', 'surface_chunk_to_rows', 'load_surface', 'get_model_fps', 'get_output_fp',
+           'run_model_jobs', 'predict_surface_job', 'load_input_series', 'predict_ts_job', 'moe_report_job', 'app',
+           'parse_series_expr', 'construct_x_pred', 'fit', 'predict_surface', 'predict_ts', 'moe_report']
+
+# Cell
+import os
+import json
+import glob
+import typer
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from moepy import surface, moe, eda
+
+# Cell
+def load_definitions_file(definitions_fp):
+    """Loads the model definitions from a JSON or YAML file"""
+    with open(definitions_fp, 'r') as f:
+        if os.path.splitext(definitions_fp)[1] in ['.yml', '.yaml']:
+            import yaml
+            definitions = yaml.safe_load(f)
+        else:
+            definitions = json.load(f)
+
+    return definitions
+
+def parse_col_list(cols):
+    """Converts a comma separated string of column names into a list"""
+    if cols is None:
+        return []
+    elif isinstance(cols, str):
+        return [col.strip() for col in cols.split(',') if col.strip() != '']
+    else:
+        return list(cols)
+
+def get_series_cols(series_def):
+    """Identifies the columns that are added and subtracted to construct a series"""
+    if isinstance(series_def, str):
+        return [series_def], []
+    else:
+        return parse_col_list(series_def.get('add')), parse_col_list(series_def.get('subtract'))
+
+def load_data_df(data_fp, columns=None, dt_col='local_datetime', file_format=None, cache_dir=None):
+    """Loads the specified columns of a CSV (via the columnar cache) or a columnar data file"""
+    if file_format is None:
+        file_format = os.path.splitext(data_fp)[1].strip('.')
+
+    if file_format == 'csv':
+        df = eda.load_cached_df(data_fp, columns=columns, cache_dir=cache_dir, dt_col=dt_col)
+    else:
+        df = eda.load_columnar_df(data_fp, columns=columns, dt_col=dt_col, file_format=file_format)
+
+    return df
+
+def construct_series(df, series_def):
+    """Constructs a series by adding and subtracting the specified columns"""
+    add_cols, subtract_cols = get_series_cols(series_def)
+
+    s = df[add_cols].sum(axis=1, min_count=len(add_cols))
+
+    if len(subtract_cols) > 0:
+        s = s - df[subtract_cols].sum(axis=1, min_count=len(subtract_cols))
+
+    return s.astype(float)
+
+# Cell
+data_keys = ['data_fp', 'dt_col', 'file_format', 'cache_dir', 'x', 'y', 'start_date', 'end_date', 'quantiles']
+
+def construct_model_definitions(definitions):
+    """Loads the data for each definition and converts them into `surface.fit_models` model definitions"""
+    model_definitions = dict()
+
+    for model_parent_name, definition in definitions.items():
+        columns = sum([sum(get_series_cols(definition[key]), []) for key in ['x', 'y']], [])
+        df = load_data_df(definition['data_fp'], columns=sorted(set(columns)), dt_col=definition.get('dt_col', 'local_datetime'),
+                          file_format=definition.get('file_format'), cache_dir=definition.get('cache_dir'))
+
+        df = df.loc[definition.get('start_date'):definition.get('end_date')]
+        df_xy = pd.DataFrame({'x': construct_series(df, definition['x']), 'y': construct_series(df, definition['y'])}).dropna()
+
+        model_definitions[model_parent_name] = {
+            'dt_idx': df_xy.index,
+            'x': df_xy['x'].values,
+            'y': df_xy['y'].values,
+            **{key: value for key, value in definition.items() if key not in data_keys},
+            'fit_kwarg_sets': surface.get_fit_kwarg_sets(qs=definition.get('quantiles', np.linspace(0.1, 0.9, 9)))
+        }
+
+    return model_definitions
+
+# Cell
+class ColumnarChunkWriter:
+    """Writes DataFrame chunks to a parquet or feather file as they're generated"""
+
+    def __init__(self, output_fp, file_format='parquet'):
+        assert file_format in ['parquet', 'feather'], f'`file_format` must be one of parquet or feather, {file_format} was passed'
+
+        self.output_fp = output_fp
+        self.tmp_fp = f'{output_fp}.tmp'
+        self.file_format = file_format
+        self.writer = None
+        self.df_chunks = []
+        self.num_rows = 0
+
+        return
+
+
+    def write(self, df_chunk):
+        """Appends a chunk, as a new row group for parquet or held until closing for feather"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.file_format == 'parquet':
+            table = pa.Table.from_pandas(df_chunk.reset_index(), preserve_index=False)
+
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.tmp_fp, table.schema)
+
+            self.writer.write_table(table)
+        else:
+            self.df_chunks += [df_chunk]
+
+        self.num_rows += df_chunk.shape[0]
+
+        return
+
+
+    def close(self):
+        """Finishes writing and moves the file into place, nothing is written if there were no chunks"""
+        if self.file_format == 'parquet' and self.writer is not None:
+            self.writer.close()
+            os.replace(self.tmp_fp, self.output_fp)
+
+        elif self.file_format == 'feather' and len(self.df_chunks) > 0:
+            pd.concat(self.df_chunks).reset_index().to_feather(self.tmp_fp)
+            os.replace(self.tmp_fp, self.output_fp)
+
+        return self.num_rows
+
+def write_columnar_chunks(df_chunks, output_fp, file_format='parquet'):
+    """Writes a stream of DataFrame chunks to a columnar file, returning the number of rows written"""
+    chunk_writer = ColumnarChunkWriter(output_fp, file_format=file_format)
+
+    for df_chunk in df_chunks:
+        chunk_writer.write(df_chunk)
+
+    num_rows = chunk_writer.close()
+
+    return num_rows
+
+def write_while_streaming(df_chunks, chunk_writer):
+    """Passes the chunks through whilst also writing them, so a stream can be saved and consumed in one pass"""
+    for df_chunk in df_chunks:
+        chunk_writer.write(df_chunk)
+        yield df_chunk
+
+def surface_chunk_to_rows(df_pred):
+    """Transposes a surface chunk so that each date is a row and each x value is a column, allowing chunks to be appended"""
+    df_pred = df_pred.T
+    df_pred.columns = df_pred.columns.astype(str)
+    df_pred.index.name = 'local_date'
+
+    return df_pred
+
+def load_surface(surface_fp, file_format='parquet'):
+    """Loads a saved surface back into the (x by date) layout used in `moe`"""
+    df_pred = getattr(pd, f'read_{file_format}')(surface_fp).set_index('local_date').T
+    df_pred.index = df_pred.index.astype(float)
+
+    return df_pred
+
+# Cell
+def get_model_fps(models):
+    """Identifies the model filepaths matching a glob pattern (or comma separated list of patterns)"""
+    model_fps = sorted(set(sum([glob.glob(pattern) for pattern in parse_col_list(models)], [])))
+    assert len(model_fps) > 0, f'No models were found matching {models}'
+
+    return model_fps
+
+def get_output_fp(output_dir, model_fp, suffix, file_format='parquet'):
+    """Constructs the output filepath for a model"""
+    model_name = os.path.splitext(os.path.basename(model_fp))[0]
+    output_fp = os.path.join(output_dir, f'{model_name}_{suffix}.{file_format}')
+
+    return output_fp
+
+def run_model_jobs(job_func, model_fps, n_jobs=1, **job_kwargs):
+    """Runs the batch job for each model, distributing the models across `n_jobs` processes"""
+    if n_jobs == 1 or len(model_fps) == 1:
+        model_fp_to_results = {model_fp: job_func(model_fp, **job_kwargs) for model_fp in model_fps}
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            model_fp_to_future = {model_fp: executor.submit(job_func, model_fp, **job_kwargs) for model_fp in model_fps}
+            model_fp_to_results = {model_fp: future.result() for model_fp, future in model_fp_to_future.items()}
+
+    return model_fp_to_results
+
+def predict_surface_job(model_fp, output_dir, x_pred, dt_pred, chunk_freq='AS', file_format='parquet'):
+    """Predicts and saves the surface for a single model"""
+    df_pred_chunks = moe.stream_surface(model_fp, x_pred=x_pred, dt_pred=dt_pred, chunk_freq=chunk_freq)
+    output_fp = get_output_fp(output_dir, model_fp, 'surface', file_format=file_format)
+
+    num_rows = write_columnar_chunks(map(surface_chunk_to_rows, df_pred_chunks), output_fp, file_format=file_format)
+
+    return {'output_fp': output_fp, 'num_rows': num_rows}
+
+def load_input_series(data_fp, series_defs, dt_col='local_datetime', start_date=None, end_date=None):
+    """Loads the data and constructs the named input series"""
+    columns = sum([sum(get_series_cols(series_def), []) for series_def in series_defs.values()], [])
+    df = load_data_df(data_fp, columns=sorted(set(columns)), dt_col=dt_col).loc[start_date:end_date]
+
+    series = {name: construct_series(df, series_def) for name, series_def in series_defs.items()}
+
+    return series
+
+def predict_ts_job(model_fp, output_dir, series, x_pred, chunk_freq='AS', file_format='parquet'):
+    """Predicts and saves the time-series of each input series for a single model"""
+    df_pred_ts_chunks = moe.stream_multi_pred_ts(model_fp, series, x_pred=x_pred, chunk_freq=chunk_freq)
+    output_fp = get_output_fp(output_dir, model_fp, 'pred_ts', file_format=file_format)
+
+    num_rows = write_columnar_chunks(df_pred_ts_chunks, output_fp, file_format=file_format)
+
+    return {'output_fp': output_fp, 'num_rows': num_rows}
+
+def moe_report_job(model_fp, output_dir, s_dispatchable, s_demand, x_pred, chunk_freq='AS', agg_freq='D', rolling_window=28, file_format='parquet', save_moe_ts=False):
+    """Calculates and saves the aggregated MOE (and optionally its time-series) for a single model"""
+    df_moe_chunks = moe.stream_moe(model_fp, s_dispatchable, s_demand, x_pred=x_pred, chunk_freq=chunk_freq)
+    report = dict()
+
+    if save_moe_ts == True:
+        moe_ts_writer = ColumnarChunkWriter(get_output_fp(output_dir, model_fp, 'moe_ts', file_format=file_format), file_format=file_format)
+        df_moe_chunks = write_while_streaming(df_moe_chunks, moe_ts_writer)
+
+    df_moe_summaries = moe.stream_moe_aggregates(df_moe_chunks, agg_freq=agg_freq, rolling_window=rolling_window)
+    output_fp = get_output_fp(output_dir, model_fp, 'moe', file_format=file_format)
+
+    report['output_fp'] = output_fp
+    report['num_rows'] = write_columnar_chunks(df_moe_summaries, output_fp, file_format=file_format)
+
+    if save_moe_ts == True:
+        report['moe_ts_fp'] = moe_ts_writer.output_fp
+        report['moe_ts_rows'] = moe_ts_writer.close()
+
+    return report
+
+# Cell
+app = typer.Typer()
+
+def parse_series_expr(series_expr):
+    """Converts a column expression (e.g. demand-solar-wind) into a series definition"""
+    series_expr = series_expr.replace(' ', '').replace('-', ',-').replace('+', ',+')
+    terms = [term for term in series_expr.split(',') if term != '']
+
+    series_def = {
+        'add': [term.lstrip('+') for term in terms if not term.startswith('-')],
+        'subtract': [term[1:] for term in terms if term.startswith('-')]
+    }
+
+    return series_def
+
+def construct_x_pred(x_min=-2., x_max=61., x_step=0.1):
+    """Constructs the independent variable locations for the surface predictions"""
+    x_pred = np.round(np.linspace(x_min, x_max, int(round((x_max - x_min)/x_step)) + 1), 10)
+
+    return x_pred
+
+# Cell
+@app.command()
+def fit(
+    definitions_fp: str = typer.Argument(..., help='JSON or YAML file of the model definitions (data file, x and y column expressions, hyper-parameters and quantiles)'),
+    models_dir: str = typer.Option('data/models', help='Directory the fitted models and their manifest are saved in'),
+    n_jobs: int = typer.Option(1, help='Number of processes to fit the models across'),
+    manifest_fp: str = typer.Option(None, help='Filepath of the fit manifest, defaults to manifest.json in the models directory'),
+    track_memory: bool = typer.Option(True, help='Record the peak (traced) memory of each fit in the manifest')
+):
+    """
+    Fits the models in the definitions file, models that are already fitted with unchanged inputs are skipped.
+    Unlike the prediction commands there's no chunking option, each model's date kernels span its whole
+    date range so all of its data is needed at once (only the columns it uses are loaded).
+    """
+    definitions = load_definitions_file(definitions_fp)
+    model_definitions = construct_model_definitions(definitions)
+
+    os.makedirs(models_dir, exist_ok=True)
+    manifest = surface.fit_models(model_definitions, models_dir, n_jobs=n_jobs, manifest_fp=manifest_fp, track_memory=track_memory)
+
+    typer.echo(f'{len(manifest)} models are fitted in {models_dir}')
+
+    return manifest
+
+@app.command()
+def predict_surface(
+    models: str = typer.Argument(..., help='Glob pattern (or comma separated patterns) of the model files'),
+    output_dir: str = typer.Option('data/surfaces', help='Directory the surfaces are saved in'),
+    start_date: str = typer.Option('2009-01-01', help='First date of the surface'),
+    end_date: str = typer.Option('2020-12-31', help='Last date of the surface'),
+    x_min: float = typer.Option(-2., help='Lowest value of the independent variable to predict at'),
+    x_max: float = typer.Option(61., help='Highest value of the independent variable to predict at'),
+    x_step: float = typer.Option(0.1, help='Spacing of the independent variable values'),
+    chunk_freq: str = typer.Option('AS', help='Pandas frequency of the date chunks the surface is predicted and written in'),
+    n_jobs: int = typer.Option(1, help='Number of processes to distribute the models across'),
+    file_format: str = typer.Option('parquet', help='Output file format, parquet or feather')
+):
+    """Predicts the (date by x) surface of each model, streaming it to a columnar file one date chunk at a time"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    model_fp_to_results = run_model_jobs(
+        predict_surface_job, get_model_fps(models), n_jobs=n_jobs, output_dir=output_dir,
+        x_pred=construct_x_pred(x_min, x_max, x_step), dt_pred=pd.date_range(start_date, end_date, freq='1D'),
+        chunk_freq=chunk_freq, file_format=file_format
+    )
+
+    for model_fp, results in model_fp_to_results.items():
+        typer.echo(f"{model_fp} -> {results['output_fp']} ({results['num_rows']} dates)")
+
+    return model_fp_to_results
+
+@app.command()
+def predict_ts(
+    models: str = typer.Argument(..., help='Glob pattern (or comma separated patterns) of the model files'),
+    data_fp: str = typer.Argument(..., help='CSV or columnar file of the input data'),
+    series: str = typer.Option('dispatchable=demand-solar-wind', help='Semi-colon separated name=expression pairs of the series to predict for, e.g. "dispatchable=demand-solar-wind;demand=demand"'),
+    output_dir: str = typer.Option('data/predictions', help='Directory the predicted time-series are saved in'),
+    dt_col: str = typer.Option('local_datetime', help='Datetime column of the input data'),
+    start_date: str = typer.Option(None, help='First date of the input data to use'),
+    end_date: str = typer.Option(None, help='Last date of the input data to use'),
+    x_min: float = typer.Option(-2., help='Lowest value of the independent variable to predict at'),
+    x_max: float = typer.Option(61., help='Highest value of the independent variable to predict at'),
+    x_step: float = typer.Option(0.1, help='Spacing of the independent variable values'),
+    chunk_freq: str = typer.Option('AS', help='Pandas frequency of the date chunks the predictions are made and written in'),
+    n_jobs: int = typer.Option(1, help='Number of processes to distribute the models across'),
+    file_format: str = typer.Option('parquet', help='Output file format, parquet or feather')
+):
+    """Predicts the time-series of each model for the named input series, streaming them to a columnar file one date chunk at a time"""
+    series_defs = {
+        name: parse_series_expr(series_expr)
+        for name, series_expr
+        in [named_series_expr.split('=') for named_series_expr in series.split(';')]
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    model_fp_to_results = run_model_jobs(
+        predict_ts_job, get_model_fps(models), n_jobs=n_jobs, output_dir=output_dir,
+        series=load_input_series(data_fp, series_defs, dt_col=dt_col, start_date=start_date, end_date=end_date),
+        x_pred=construct_x_pred(x_min, x_max, x_step), chunk_freq=chunk_freq, file_format=file_format
+    )
+
+    for model_fp, results in model_fp_to_results.items():
+        typer.echo(f"{model_fp} -> {results['output_fp']} ({results['num_rows']} rows)")
+
+    return model_fp_to_results
+
+@app.command()
+def moe_report(
+    models: str = typer.Argument(..., help='Glob pattern (or comma separated patterns) of the model files'),
+    data_fp: str = typer.Argument(..., help='CSV or columnar file of the input data'),
+    dispatchable: str = typer.Option('demand-solar-wind', help='Column expression of the dispatchable load'),
+    demand: str = typer.Option('demand', help='Column expression of the demand'),
+    output_dir: str = typer.Option('data/moe', help='Directory the MOE aggregates and report are saved in'),
+    dt_col: str = typer.Option('local_datetime', help='Datetime column of the input data'),
+    start_date: str = typer.Option(None, help='First date of the input data to use'),
+    end_date: str = typer.Option(None, help='Last date of the input data to use'),
+    x_min: float = typer.Option(-2., help='Lowest value of the independent variable to predict at'),
+    x_max: float = typer.Option(61., help='Highest value of the independent variable to predict at'),
+    x_step: float = typer.Option(0.1, help='Spacing of the independent variable values'),
+    chunk_freq: str = typer.Option('AS', help='Pandas frequency of the date chunks the MOE is calculated in'),
+    agg_freq: str = typer.Option('D', help='Pandas frequency the MOE is aggregated to'),
+    rolling_window: int = typer.Option(28, help='Number of aggregated periods in the rolling average'),
+    save_moe_ts: bool = typer.Option(False, help='Also save the full MOE time-series alongside the aggregates'),
+    n_jobs: int = typer.Option(1, help='Number of processes to distribute the models across'),
+    file_format: str = typer.Option('parquet', help='Output file format, parquet or feather')
+):
+    """Calculates the merit order effect of each model and saves its aggregates, with a JSON report of the outputs"""
+    series = load_input_series(data_fp, {'dispatchable': parse_series_expr(dispatchable), 'demand': parse_series_expr(demand)},
+                               dt_col=dt_col, start_date=start_date, end_date=end_date)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    model_fp_to_results = run_model_jobs(
+        moe_report_job, get_model_fps(models), n_jobs=n_jobs, output_dir=output_dir,
+        s_dispatchable=series['dispatchable'], s_demand=series['demand'], x_pred=construct_x_pred(x_min, x_max, x_step),
+        chunk_freq=chunk_freq, agg_freq=agg_freq, rolling_window=rolling_window, file_format=file_format, save_moe_ts=save_moe_ts
+    )
+
+    with open(os.path.join(output_dir, 'report.json'), 'w') as f:
+        json.dump(model_fp_to_results, f, indent=4)
+
+    for model_fp, results in model_fp_to_results.items():
+        typer.echo(f"{model_fp} -> {results['output_fp']} ({results['num_rows']} periods)")
+
+    return model_fp_to_results
+
+# Cell
+if __name__ == '__main__' and '__file__' in globals():
+    app()
\ No newline at end of file
@@ -1,11 +1,14 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-10-ci-cd.ipynb (unless otherwise specified).
 
-__all__ = ['app', 'get_current_package_version', 'increment_package_version', 'set_current_package_version']
+__all__ = ['app', 'get_current_package_version', 'increment_package_version', 'set_current_package_version',
+           'check_import_time']
 
 # Cell
 import os
 import re
+import sys
 import typer
+import subprocess
 import logging
 from warnings import warn
 from configparser import ConfigParser
@@ -59,6 +62,31 @@ def set_current_package_version(version: str, settings_fp: str='settings.ini'):
 
     return
 
+# Cell
+@app.command()
+def check_import_time(module: str='moepy.moe', budget_s: float=2.5, num_runs: int=3,
+                      lazy_modules: str='seaborn,matplotlib,IPython,ipypb,FEAutils,entsoe,dotenv,requests,xmltodict,numba'):
+    code = f'import sys, time; start_time = time.perf_counter(); import {module}; print(time.perf_counter() - start_time); print(",".join(sys.modules.keys()))'
+
+    import_times = []
+
+    for _ in range(num_runs):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip().split('\n')
+        import_times += [float(output[0])]
+
+    import_time = min(import_times)
+    imported_modules = output[1].split(',')
+    eagerly_imported = [lazy_module for lazy_module in lazy_modules.split(',') if lazy_module in imported_modules]
+
+    assert len(eagerly_imported) == 0, f'Importing {module} should not import {", ".join(eagerly_imported)}'
+    assert import_time < budget_s, f'Importing {module} took {import_time:.2f}s which is over the {budget_s}s budget'
+
+    logger = logging.getLogger('package_release')
+    logger.setLevel('INFO')
+    logger.info(f'Importing {module} took {import_time:.2f}s')
+
+    return import_time
+
 # Cell
 if __name__ == '__main__' and '__file__' in globals():
     app()
\ No newline at end of file
@@ -0,0 +1,548 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-14-distributed.ipynb (unless otherwise specified).
+
+__all__ = ['FitCoordinator', 'FitWorkerManager', 'is_loopback_address', 'serve_coordinator', 'stop_coordinator',
+           'get_connect_address', 'compact_lowess', 'compact_smooth_dates', 'fit_ensemble_member_task', 'worker_state',
+           'add_cached_fit_weights', 'fit_model_job_task', 'task_kind_to_func', 'run_fit_task', 'get_worker_id',
+           'renew_lease_until', 'run_fit_worker', 'check_workers_available', 'run_distributed_tasks',
+           'fit_ensemble_members_distributed', 'fit_jobs_distributed', 'app', 'parse_address', 'worker']
+
+# Cell
+import os
+import time
+import pickle
+import socket
+import typer
+import ipaddress
+import threading
+import traceback
+import numpy as np
+from collections import deque
+from multiprocessing import Process
+from multiprocessing.managers import BaseManager
+
+from moepy import lowess, surface
+
+# Cell
+class FitCoordinator:
+    """
+    Holds the queue of fit tasks that workers pull from. Each task that is handed
+    out is leased to its worker, the worker renews the lease whilst fitting and if
+    it stops doing so (e.g. because its process or host was lost) the lease expires
+    and the task is returned to the queue for another worker. Tasks that raise an
+    error or whose lease expires are retried until they have been attempted
+    `max_attempts` times, so a task that kills its workers is eventually abandoned.
+
+    The coordinator is served to the workers by `serve_coordinator`, its methods
+    are called concurrently from the manager's connection threads.
+
+    Initialisation Parameters:
+        tasks: Mapping from each task id to its payload
+        lease_timeout: Seconds a worker can go without renewing its lease before the task is requeued
+        max_attempts: Number of times a task can fail before it is abandoned
+
+    Attributes:
+        task_id_to_payload: Mapping from each task id to its payload
+        pending: Queue of task ids waiting to be handed out
+        leases: Mapping from the task ids that are being fitted to their worker and lease expiry
+        completed: Ids of the completed tasks
+        failed: Mapping from the abandoned task ids to the traceback of their last error
+        worker_last_seen: Mapping from each worker id to when it last requested a task or renewed a lease
+    """
+
+    def __init__(self, tasks, lease_timeout=300, max_attempts=3):
+        self.task_id_to_payload = dict(tasks)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+        self.pending = deque(self.task_id_to_payload.keys())
+        self.attempts = {task_id: 0 for task_id in self.task_id_to_payload.keys()}
+        self.leases = dict()
+        self.completed = set()
+        self.failed = dict()
+        self.results = dict()
+        self.worker_last_seen = dict()
+        self.lock = threading.Lock()
+
+        return
+
+
+    def requeue_expired_leases(self):
+        """Returns the tasks whose leases have expired to the front of the queue, abandoning those that have used up their attempts"""
+        now = time.monotonic()
+
+        for task_id, lease in list(self.leases.items()):
+            if lease['expires_at'] < now:
+                del self.leases[task_id]
+
+                if self.attempts[task_id] >= self.max_attempts:
+                    self.failed[task_id] = f"The lease held by worker {lease['worker_id']} expired on attempt {self.attempts[task_id]}, the worker may have been killed by the task"
+                else:
+                    self.pending.appendleft(task_id)
+
+        return
+
+
+    def get_task(self, worker_id):
+        """Leases the next pending task to the worker, returning its id and payload or None if there are no pending tasks"""
+        with self.lock:
+            self.worker_last_seen[worker_id] = time.monotonic()
+            self.requeue_expired_leases()
+
+            while len(self.pending) > 0:
+                task_id = self.pending.popleft()
+
+                if task_id in self.completed or task_id in self.failed or task_id in self.leases:
+                    continue
+
+                self.attempts[task_id] += 1
+                self.leases[task_id] = {'worker_id': worker_id, 'expires_at': time.monotonic() + self.lease_timeout}
+
+                return task_id, self.task_id_to_payload[task_id]
+
+        return None
+
+
+    def renew_lease(self, task_id, worker_id):
+        """Extends the worker's lease on the task, returning False if it no longer holds it"""
+        with self.lock:
+            self.worker_last_seen[worker_id] = time.monotonic()
+            lease = self.leases.get(task_id)
+
+            if lease is None or lease['worker_id'] != worker_id:
+                return False
+
+            lease['expires_at'] = time.monotonic() + self.lease_timeout
+
+        return True
+
+
+    def complete_task(self, task_id, worker_id, result):
+        """Records the result of a task, results of tasks that were already completed by another worker are discarded"""
+        with self.lock:
+            if task_id in self.completed:
+                return False
+
+            if self.leases.get(task_id, {}).get('worker_id') == worker_id:
+                del self.leases[task_id]
+
+            self.completed.add(task_id)
+            self.failed.pop(task_id, None)
+            self.results[task_id] = result
+
+        return True
+
+
+    def fail_task(self, task_id, worker_id, error):
+        """Records a task's error, requeueing it unless it has used up its attempts"""
+        with self.lock:
+            if self.leases.get(task_id, {}).get('worker_id') != worker_id or task_id in self.completed:
+                return
+
+            del self.leases[task_id]
+
+            if self.attempts[task_id] >= self.max_attempts:
+                self.failed[task_id] = error
+            else:
+                self.pending.append(task_id)
+
+        return
+
+
+    def pop_results(self):
+        """Removes and returns the results that have been completed since the last call"""
+        with self.lock:
+            results, self.results = self.results, dict()
+
+        return results
+
+
+    def get_lease_timeout(self):
+        """Retrieves the seconds a worker can go without renewing its lease, used by the workers to set their heartbeat"""
+        return self.lease_timeout
+
+
+    def is_finished(self):
+        """Checks whether every task has either been completed or abandoned"""
+        with self.lock:
+            self.requeue_expired_leases()
+
+            return len(self.completed) + len(self.failed) == len(self.task_id_to_payload)
+
+
+    def get_active_workers(self, within=None):
+        """Identifies the workers that have requested a task or renewed a lease in the last `within` seconds (defaults to the lease timeout)"""
+        within = self.lease_timeout if within is None else within
+        now = time.monotonic()
+
+        with self.lock:
+            return [worker_id for worker_id, last_seen in self.worker_last_seen.items() if now - last_seen <= within]
+
+
+    def get_status(self):
+        """Counts the tasks in each state"""
+        with self.lock:
+            self.requeue_expired_leases()
+
+            status = {
+                'pending': len(set(self.pending) - self.completed - set(self.failed.keys()) - set(self.leases.keys())),
+                'leased': len(self.leases),
+                'completed': len(self.completed),
+                'failed': len(self.failed)
+            }
+
+        return status
+
+# Cell
+class FitWorkerManager(BaseManager):
+    """Manager used by the workers to connect to a served `FitCoordinator`"""
+    pass
+
+FitWorkerManager.register('get_coordinator')
+
+def is_loopback_address(address):
+    """Checks whether the host of the address can only be reached from this machine"""
+    host = address[0]
+
+    if host == 'localhost':
+        return True
+
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def serve_coordinator(coordinator, address=('127.0.0.1', 0), authkey=None):
+    """
+    Serves the coordinator from a background thread so that workers in other processes or on other
+    hosts can connect to it, a port of 0 selects a free port which is available from `server.address`.
+
+    The manager unpickles whatever its authenticated clients send, so the authentication key is what
+    prevents other machines from running code on the coordinator. A random key is generated when
+    serving on a loopback address (available from `server.authkey`), any other address requires an
+    explicit key that should be kept secret.
+    """
+    if authkey is None:
+        if is_loopback_address(address) == False:
+            raise ValueError(f'An explicit `authkey` is required when serving on {address[0]}, as any client with the key can run code on the coordinator')
+
+        authkey = os.urandom(16).hex().encode()
+
+    # A manager class is created for each coordinator so that their registries are kept separate
+    coordinator_manager = type('FitCoordinatorManager', (BaseManager,), {})
+    coordinator_manager.register('get_coordinator', callable=lambda: coordinator)
+
+    server = coordinator_manager(address=tuple(address), authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+def stop_coordinator(server):
+    """Stops serving the coordinator and releases its port"""
+    server.stop_event.set()
+    server.listener.close()
+
+    return
+
+def get_connect_address(address):
+    """Identifies the address that local workers should connect to, servers bound to all interfaces are reached through localhost"""
+    host, port = address
+
+    if host in ['', '0.0.0.0']:
+        host = '127.0.0.1'
+
+    return (host, port)
+
+# Cell
+def compact_lowess(model):
+    """Drops the loading weights from a fitted `Lowess` model, leaving the design matrix and anchors needed to predict"""
+    model.loading_weights = None
+
+    return model
+
+def compact_smooth_dates(smooth_dates):
+    """Drops the data-point weightings from a fitted `SmoothDates` model so that it can be cheaply returned from a worker"""
+    smooth_dates.ensemble_member_to_weights = None
+
+    for model in smooth_dates.ensemble_member_to_models.values():
+        compact_lowess(model)
+
+    return smooth_dates
+
+def fit_ensemble_member_task(x, y, weight_support, external_weights, base_weights, reg_anchors, robust_weights=None, lowess_kwargs={}, fit_kwargs={}):
+    """
+    Fits a single member of a `SmoothDates` ensemble on the data-points within its weight support,
+    returning the compacted `Lowess` model. The full `x`, `y` and `base_weights` are sent as the
+    robustifying weights are calculated from the in-sample predictions across the full dataset.
+    """
+    model = lowess.fit_lowess_on_support(lowess.Lowess(**lowess_kwargs), x, y, weight_support, reg_anchors=reg_anchors, external_weights=external_weights,
+                                         base_weights=base_weights, robust_weights=robust_weights, **fit_kwargs)
+
+    return compact_lowess(model)
+
+worker_state = dict()
+
+def add_cached_fit_weights(fit_job):
+    """
+    Adds the shared fit weights to the job, the weightings of the most recent model definition are
+    kept so that a worker fitting several variants of the same model only calculates them once
+    """
+    model_parent_name_to_fit_weights = worker_state.setdefault('model_parent_name_to_fit_weights', dict())
+    fit_job = surface.add_latest_fit_weights(fit_job, model_parent_name_to_fit_weights)
+
+    return fit_job
+
+def fit_model_job_task(fit_job, track_memory=True, share_fit_weights=True):
+    """Fits the model for a single `surface` fit job, returning its fit information alongside the compacted model"""
+    if share_fit_weights == True:
+        fit_job = add_cached_fit_weights(fit_job)
+
+    fit_results = surface.fit_model_job(fit_job, track_memory=track_memory, save_model=False)
+    fit_results['model'] = compact_smooth_dates(fit_results['model'])
+
+    return fit_results
+
+task_kind_to_func = {
+    'ensemble_member': fit_ensemble_member_task,
+    'fit_job': fit_model_job_task
+}
+
+def run_fit_task(payload):
+    """Runs the fit task specified by the payload's kind with its keyword arguments"""
+    task_func = task_kind_to_func[payload['kind']]
+    result = task_func(**payload['kwargs'])
+
+    return result
+
+# Cell
+def get_worker_id(pid=None):
+    """Constructs the default id of a worker from its host name and process id"""
+    pid = os.getpid() if pid is None else pid
+
+    return f'{socket.gethostname()}-{pid}'
+
+def renew_lease_until(coordinator, task_id, worker_id, heartbeat_interval, stop_event):
+    """Periodically renews the worker's lease on the task until the stop event is set"""
+    while not stop_event.wait(heartbeat_interval):
+        if coordinator.renew_lease(task_id, worker_id) == False:
+            break
+
+    return
+
+def run_fit_worker(address, authkey, worker_id=None, poll_interval=1, heartbeat_interval=None):
+    """
+    Connects to a served `FitCoordinator` and fits the tasks it hands out until all of them
+    are complete (or the coordinator stops), the lease of each task is renewed from a
+    background thread whilst it's being fitted
+
+    Parameters:
+        address: Host and port of the served coordinator
+        authkey: Authentication key of the served coordinator
+        worker_id: Identifier of the worker, defaults to its host name and process id
+        poll_interval: Seconds to wait before asking for another task when none are pending
+        heartbeat_interval: Seconds between lease renewals, defaults to a third of the lease timeout
+
+    Returns:
+        num_completed: Number of tasks the worker completed
+    """
+    if worker_id is None:
+        worker_id = get_worker_id()
+
+    worker_state.clear()
+
+    manager = FitWorkerManager(address=tuple(address), authkey=authkey)
+    manager.connect()
+    coordinator = manager.get_coordinator()
+
+    if heartbeat_interval is None:
+        heartbeat_interval = coordinator.get_lease_timeout()/3
+
+    num_completed = 0
+
+    try:
+        while True:
+            task = coordinator.get_task(worker_id)
+
+            if task is None:
+                if coordinator.is_finished() == True:
+                    break
+
+                time.sleep(poll_interval)
+                continue
+
+            task_id, payload = task
+
+            stop_event = threading.Event()
+            heartbeat = threading.Thread(target=renew_lease_until, args=(coordinator, task_id, worker_id, heartbeat_interval, stop_event), daemon=True)
+            heartbeat.start()
+
+            try:
+                result = run_fit_task(payload)
+            except Exception:
+                coordinator.fail_task(task_id, worker_id, traceback.format_exc())
+            else:
+                coordinator.complete_task(task_id, worker_id, result)
+                num_completed += 1
+            finally:
+                stop_event.set()
+                heartbeat.join()
+
+    except (EOFError, ConnectionError):
+        pass # the coordinator has stopped serving
+
+    return num_completed
+
+# Cell
+def check_workers_available(coordinator, workers):
+    """Raises an error if every local worker process has exited and no other workers have been active within the lease timeout"""
+    if len(workers) == 0 or any([worker.is_alive() for worker in workers]):
+        return
+
+    local_worker_ids = [get_worker_id(worker.pid) for worker in workers]
+    other_worker_ids = [worker_id for worker_id in coordinator.get_active_workers() if worker_id not in local_worker_ids]
+
+    if len(other_worker_ids) == 0 and coordinator.is_finished() == False:
+        exit_codes = [worker.exitcode for worker in workers]
+        raise RuntimeError(f'All of the local workers have exited (exit codes {exit_codes}) and no other workers are connected, {coordinator.get_status()}')
+
+    return
+
+def run_distributed_tasks(tasks, address=('127.0.0.1', 0), authkey=None, n_local_workers=0, lease_timeout=300, max_attempts=3, poll_interval=0.5, timeout=None):
+    """
+    Serves the tasks to workers and yields each task id and result as they're completed. Local
+    worker processes can be started alongside any that connect from other hosts (using the
+    `worker` command of this module). An error is raised if any task can't be completed, if
+    every local worker has exited without any other workers being connected, or if the tasks
+    haven't finished within the `timeout`.
+
+    Parameters:
+        tasks: Mapping from each task id to its payload
+        address: Host and port to serve the tasks on, use ('0.0.0.0', port) to accept workers from other hosts
+        authkey: Authentication key the workers must provide, required unless the address is a loopback one (where a random key is used)
+        n_local_workers: Number of worker processes to start on this host
+        lease_timeout: Seconds a worker can go without renewing its lease before the task is requeued
+        max_attempts: Number of times a task can fail before it is abandoned
+        poll_interval: Seconds between checks for completed tasks
+        timeout: Seconds to wait for all of the tasks to finish, by default there is no limit
+    """
+    coordinator = FitCoordinator(tasks, lease_timeout=lease_timeout, max_attempts=max_attempts)
+    server = serve_coordinator(coordinator, address=address, authkey=authkey)
+
+    workers = [
+        Process(target=run_fit_worker, args=(get_connect_address(server.address), server.authkey), daemon=True)
+        for _ in range(n_local_workers)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    start_time = time.monotonic()
+
+    try:
+        while coordinator.is_finished() == False:
+            yield from coordinator.pop_results().items()
+            check_workers_available(coordinator, workers)
+
+            if timeout is not None and time.monotonic() - start_time > timeout:
+                raise TimeoutError(f'The tasks did not finish within {timeout} seconds, {coordinator.get_status()}')
+
+            time.sleep(poll_interval)
+
+        yield from coordinator.pop_results().items()
+
+        if len(coordinator.failed) > 0:
+            task_id, error = next(iter(coordinator.failed.items()))
+            raise RuntimeError(f'{len(coordinator.failed)} task(s) failed after {max_attempts} attempts, e.g. task {task_id}:\n{error}')
+
+    finally:
+        stop_coordinator(server)
+
+        for worker in workers:
+            worker.join(timeout=poll_interval*2 + 1)
+
+            if worker.is_alive():
+                worker.terminate()
+
+def fit_ensemble_members_distributed(x, y, ensemble_member_to_weights, weighting_locs, base_weights, robust_weights=None, lowess_kwargs={}, slice_to_support=True, distributed={}, **fit_kwargs):
+    """
+    Fits each member of a `SmoothDates` ensemble as a separate task, `distributed` holds the keyword
+    arguments of `run_distributed_tasks`. Any `reg_func` in the `lowess_kwargs` must be picklable,
+    e.g. wrapped in `surface.PicklableFunction`.
+    """
+    ensemble_members = list(ensemble_member_to_weights.keys())
+    tasks = dict()
+
+    for task_id, ensemble_member in enumerate(ensemble_members):
+        ensemble_weights = ensemble_member_to_weights[ensemble_member]
+        weight_support = lowess.get_weight_support(ensemble_weights) if slice_to_support == True else slice(None)
+
+        tasks[task_id] = {
+            'kind': 'ensemble_member',
+            'kwargs': {
+                'x': x,
+                'y': y,
+                'weight_support': weight_support,
+                'external_weights': ensemble_weights,
+                'base_weights': base_weights,
+                'reg_anchors': weighting_locs,
+                'robust_weights': robust_weights,
+                'lowess_kwargs': lowess_kwargs,
+                'fit_kwargs': fit_kwargs
+            }
+        }
+
+    task_id_to_model = dict(run_distributed_tasks(tasks, **distributed))
+    ensemble_member_to_models = {ensemble_member: task_id_to_model[task_id] for task_id, ensemble_member in enumerate(ensemble_members)}
+
+    return ensemble_member_to_models
+
+def fit_jobs_distributed(fit_jobs, track_memory=True, share_fit_weights=True, **distributed_kwargs):
+    """
+    Fits the `surface` fit jobs as distributed tasks, yielding each model name and its fit information
+    as they're completed. The workers return the compacted models which are then saved by the coordinator,
+    so the workers don't need access to the models directory.
+    """
+    tasks = {
+        fit_job['model_name']: {
+            'kind': 'fit_job',
+            'kwargs': {
+                'fit_job': {key: value for key, value in fit_job.items() if key != 'fit_weights'},
+                'track_memory': track_memory,
+                'share_fit_weights': share_fit_weights
+            }
+        }
+        for fit_job
+        in fit_jobs
+    }
+
+    model_name_to_fp = {fit_job['model_name']: fit_job['model_fp'] for fit_job in fit_jobs}
+
+    for model_name, fit_results in run_distributed_tasks(tasks, **distributed_kwargs):
+        smooth_dates = fit_results.pop('model')
+        surface.atomic_write(model_name_to_fp[model_name], lambda f: pickle.dump(smooth_dates, f))
+
+        yield model_name, fit_results
+
+# Cell
+app = typer.Typer()
+
+def parse_address(address):
+    """Parses a `host:port` address"""
+    host, port = address.rsplit(':', 1)
+
+    return (host, int(port))
+
+@app.command()
+def worker(
+    address: str = typer.Argument(..., help='Host and port of the coordinator, e.g. 10.0.0.5:50000'),
+    authkey: str = typer.Option(..., envvar='MOEPY_AUTHKEY', help='Authentication key of the coordinator, can be set with the MOEPY_AUTHKEY environment variable to keep it out of the process list'),
+    poll_interval: float = typer.Option(1, help='Seconds to wait before asking for another task when none are pending')
+):
+    """Fits the tasks handed out by a coordinator until all of them are complete"""
+    num_completed = run_fit_worker(parse_address(address), authkey=authkey.encode(), poll_interval=poll_interval)
+    typer.echo(f'Completed {num_completed} tasks')
+
+    return
+
+# Cell
+if __name__ == '__main__' and '__file__' in globals():
+    app()
@@ -1,19 +1,94 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-02-eda.ipynb (unless otherwise specified).
 
-__all__ = ['load_EI_df', 'load_DE_df', 'clean_df_for_plot', 'rgb_2_plt_tuple', 'convert_fuel_colour_dict_to_plt_tuple',
-           'hide_spines', 'stacked_fuel_plot']
+__all__ = ['load_EI_df', 'load_DE_df', 'csv_2_columnar', 'load_columnar_df', 'get_default_cache_dir',
+           'get_columnar_cache_fp', 'load_cached_df', 'clean_df_for_plot', 'rgb_2_plt_tuple',
+           'convert_fuel_colour_dict_to_plt_tuple', 'hide_spines', 'stacked_fuel_plot']
 
 # Cell
+import os
+import hashlib
 import pandas as pd
 
-import seaborn as sns
-import matplotlib.pyplot as plt
-import matplotlib.transforms as mtf
+# Cell
+def csv_2_columnar(csv_fp, columnar_fp, dt_col='local_datetime', float_dtype='float32', file_format='parquet'):
+    """Converts a raw CSV into a typed columnar file with int64 UTC timestamps and downcast floats"""
+    df = pd.read_csv(csv_fp)
+
+    df[dt_col] = pd.DatetimeIndex(pd.to_datetime(df[dt_col], utc=True)).asi8
+    float_cols = df.select_dtypes('float').columns
+    df[float_cols] = df[float_cols].astype(float_dtype)
+
+    # Writing to a temporary file first so that an interrupted conversion can't leave a partial cache
+    tmp_fp = f'{columnar_fp}.tmp'
+    getattr(df, f'to_{file_format}')(tmp_fp)
+    os.replace(tmp_fp, columnar_fp)
+
+    return
+
+def load_columnar_df(columnar_fp, columns=None, dt_col='local_datetime', file_format='parquet'):
+    """Loads a typed columnar file, optionally only reading the specified columns"""
+    if columns is not None:
+        columns = [dt_col] + [col for col in columns if col != dt_col]
+
+    df = getattr(pd, f'read_{file_format}')(columnar_fp, columns=columns)
+
+    df.index = pd.to_datetime(df.pop(dt_col).values, utc=True)
+    df.index.name = dt_col
+
+    return df
+
+def get_default_cache_dir():
+    """Identifies the user cache directory for the columnar files, this can be overridden with the MOEPY_CACHE_DIR environment variable"""
+    default_cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'moepy')
+    cache_dir = os.environ.get('MOEPY_CACHE_DIR', default_cache_dir)
+
+    return cache_dir
+
+def get_columnar_cache_fp(csv_fp, cache_dir, dt_col='local_datetime', float_dtype='float32', file_format='parquet'):
+    """
+    Constructs the filepath of a CSV's columnar cache, the name is keyed on a hash of the
+    CSV's absolute path and the conversion settings so that CSVs sharing a basename (or
+    conversions with a different float dtype) don't overwrite each other's cache
+    """
+    csv_name = os.path.splitext(os.path.basename(csv_fp))[0]
+    cache_key = hashlib.md5(f'{os.path.abspath(csv_fp)}|{dt_col}'.encode()).hexdigest()[:12]
+    columnar_fp = os.path.join(cache_dir, f'{csv_name}_{float_dtype}_{cache_key}.{file_format}')
+
+    return columnar_fp
+
+def load_cached_df(csv_fp, columns=None, cache_dir=None, dt_col='local_datetime', float_dtype='float32', file_format='parquet'):
+    """
+    Loads a raw CSV via a typed columnar cache, the cache is (re)built
+    the first time it is requested or whenever the CSV is newer than it
+
+    Parameters:
+        csv_fp: Filepath of the raw CSV
+        columns: Subset of columns to load, all are loaded if None
+        cache_dir: Directory for the columnar files, defaults to the user cache directory (see `get_default_cache_dir`)
+        dt_col: Column containing the local datetimes
+        float_dtype: Data type that the float columns will be stored as
+        file_format: One of 'parquet' or 'feather'
+    """
+    if cache_dir is None:
+        cache_dir = get_default_cache_dir()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    columnar_fp = get_columnar_cache_fp(csv_fp, cache_dir, dt_col=dt_col, float_dtype=float_dtype, file_format=file_format)
+
+    if not os.path.exists(columnar_fp) or os.path.getmtime(columnar_fp) < os.path.getmtime(csv_fp):
+        csv_2_columnar(csv_fp, columnar_fp, dt_col=dt_col, float_dtype=float_dtype, file_format=file_format)
+
+    df = load_columnar_df(columnar_fp, columns=columns, dt_col=dt_col, file_format=file_format)
+
+    return df
 
 # Cell
-def load_EI_df(EI_fp):
+def load_EI_df(EI_fp, use_cache=False, columns=None, cache_dir=None):
     """Loads the electric insights data and returns a DataFrame"""
-    df = pd.read_csv(EI_fp)
+    if use_cache == True:
+        return load_cached_df(EI_fp, columns=columns, cache_dir=cache_dir)
+
+    df = pd.read_csv(EI_fp, usecols=None if columns is None else ['local_datetime']+list(columns))
 
     df['local_datetime'] = pd.to_datetime(df['local_datetime'], utc=True)
     df = df.set_index('local_datetime')
@@ -21,19 +96,24 @@ def load_EI_df(EI_fp):
     return df
 
 # Cell
-def load_DE_df(EC_fp, ENTSOE_fp):
+def load_DE_df(EC_fp, ENTSOE_fp, use_cache=False, columns=None, cache_dir=None):
     """Loads the energy-charts and ENTSOE data and returns a DataFrame"""
-    # Energy-Charts
-    df_DE = pd.read_csv(EC_fp)
+    if use_cache == True:
+        df_DE = load_cached_df(EC_fp, cache_dir=cache_dir)
+        df_ENTSOE = load_cached_df(ENTSOE_fp, columns=['DE_price'], cache_dir=cache_dir)
 
-    df_DE['local_datetime'] = pd.to_datetime(df_DE['local_datetime'], utc=True)
-    df_DE = df_DE.set_index('local_datetime')
+    else:
+        # Energy-Charts
+        df_DE = pd.read_csv(EC_fp)
 
-    # ENTSOE
-    df_ENTSOE = pd.read_csv(ENTSOE_fp)
+        df_DE['local_datetime'] = pd.to_datetime(df_DE['local_datetime'], utc=True)
+        df_DE = df_DE.set_index('local_datetime')
 
-    df_ENTSOE['local_datetime'] = pd.to_datetime(df_ENTSOE['local_datetime'], utc=True)
-    df_ENTSOE = df_ENTSOE.set_index('local_datetime')
+        # ENTSOE
+        df_ENTSOE = pd.read_csv(ENTSOE_fp)
+
+        df_ENTSOE['local_datetime'] = pd.to_datetime(df_ENTSOE['local_datetime'], utc=True)
+        df_ENTSOE = df_ENTSOE.set_index('local_datetime')
 
     # Combining data
     df_DE['demand'] = df_DE.sum(axis=1)
@@ -41,6 +121,9 @@ def load_DE_df(EC_fp, ENTSOE_fp):
     s_price = df_ENTSOE['DE_price']
     df_DE['price'] = s_price[~s_price.index.duplicated(keep='first')]
 
+    if columns is not None:
+        df_DE = df_DE[columns]
+
     return df_DE
 
 # Cell
@@ -94,6 +177,8 @@ def hide_spines(ax, positions=["top", "right"]):
 
 def stacked_fuel_plot(df, fuel_colour_dict, ax=None, save_path=None, dpi=150):
     """Plots the electric insights fuel data as a stacked area graph"""
+    import matplotlib.pyplot as plt
+
     df = df[fuel_colour_dict.keys()]
 
     if ax == None:
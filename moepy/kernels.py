@@ -0,0 +1,167 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-13-kernels.ipynb (unless otherwise specified).
+
+__all__ = ['numba_available', 'jit_kernel', 'tricube_weight', 'calc_anchor_dist_thresholds', 'calc_fused_moment_sums',
+           'calc_weights_matrix_moment_sums', 'predict_fused_lin_regs', 'calc_robust_weights', 'calc_quant_reg_loss',
+           'calc_quant_reg_betas']
+
+# Cell
+import numpy as np
+from scipy.optimize import minimize
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Cell
+numba_available = numba is not None
+
+def jit_kernel(func):
+    """Compiles the kernel with Numba (releasing the GIL) when it's installed, otherwise the pure Python function is returned"""
+    if numba_available == True:
+        return numba.njit(nogil=True, cache=True, error_model='numpy')(func)
+
+    return func
+
+# Cell
+@jit_kernel
+def tricube_weight(dist, dist_threshold):
+    """Calculates the tricube weighting of a single distance, matching `lowess.dist_to_weights`"""
+    scaled_dist = dist/dist_threshold
+
+    if scaled_dist > 1:
+        return 0.0
+
+    return (1 - scaled_dist**3)**3
+
+@jit_kernel
+def calc_anchor_dist_thresholds(x, weighting_locs, frac_idx):
+    """Identifies the distance from each anchor that contains the LOWESS data fraction, without sorting the full distance matrix"""
+    dist_thresholds = np.empty(weighting_locs.shape[0])
+    dists = np.empty(x.shape[0])
+
+    for i in range(weighting_locs.shape[0]):
+        for j in range(x.shape[0]):
+            dists[j] = abs(weighting_locs[i] - x[j])
+
+        dist_thresholds[i] = np.partition(dists, frac_idx)[frac_idx]
+
+    return dist_thresholds
+
+# Cell
+@jit_kernel
+def calc_fused_moment_sums(x, y, weighting_locs, dist_thresholds, point_weights):
+    """
+    Calculates the weighted moment sums (w, wx, wx^2, wy, wxy) of each local linear regression, the
+    distances, tricube weights and their normalisation across anchors are recalculated on the fly
+    so that no (anchor by data-point) matrices are allocated
+    """
+    num_locs, num_points = weighting_locs.shape[0], x.shape[0]
+
+    # Normalising constants for each data-point
+    weight_sums = np.zeros(num_points)
+
+    for j in range(num_points):
+        for i in range(num_locs):
+            weight_sums[j] += tricube_weight(abs(weighting_locs[i] - x[j]), dist_thresholds[i])*point_weights[j]
+
+    # Accumulating the moments of each local regression
+    moment_sums = np.zeros((num_locs, 5))
+
+    for i in range(num_locs):
+        for j in range(num_points):
+            weight = tricube_weight(abs(weighting_locs[i] - x[j]), dist_thresholds[i])*point_weights[j]/weight_sums[j]
+
+            if not np.isfinite(weight) or weight == 0:
+                continue
+
+            moment_sums[i, 0] += weight
+            moment_sums[i, 1] += weight*x[j]
+            moment_sums[i, 2] += weight*x[j]*x[j]
+            moment_sums[i, 3] += weight*y[j]
+            moment_sums[i, 4] += weight*x[j]*y[j]
+
+    return moment_sums
+
+@jit_kernel
+def calc_weights_matrix_moment_sums(x, y, base_weights, point_weights):
+    """Calculates the weighted moment sums of each local linear regression from precomputed (anchor by data-point) distance weights"""
+    num_locs, num_points = base_weights.shape
+
+    weight_sums = np.zeros(num_points)
+
+    for i in range(num_locs):
+        for j in range(num_points):
+            weight_sums[j] += base_weights[i, j]*point_weights[j]
+
+    moment_sums = np.zeros((num_locs, 5))
+
+    for i in range(num_locs):
+        for j in range(num_points):
+            weight = base_weights[i, j]*point_weights[j]/weight_sums[j]
+
+            if not np.isfinite(weight) or weight == 0:
+                continue
+
+            moment_sums[i, 0] += weight
+            moment_sums[i, 1] += weight*x[j]
+            moment_sums[i, 2] += weight*x[j]*x[j]
+            moment_sums[i, 3] += weight*y[j]
+            moment_sums[i, 4] += weight*x[j]*y[j]
+
+    return moment_sums
+
+# Cell
+@jit_kernel
+def predict_fused_lin_regs(x_pred, weighting_locs, dist_thresholds, design_matrix):
+    """Blends the local linear regressions at each prediction location, calculating the tricube weights on the fly"""
+    y_pred = np.zeros(x_pred.shape[0])
+
+    for j in range(x_pred.shape[0]):
+        weight_sum, weighted_evals = 0.0, 0.0
+
+        for i in range(weighting_locs.shape[0]):
+            weight = tricube_weight(abs(weighting_locs[i] - x_pred[j]), dist_thresholds[i])
+            weight_sum += weight
+            weighted_evals += weight*(design_matrix[i, 0] + design_matrix[i, 1]*x_pred[j])
+
+        if np.isfinite(weighted_evals/weight_sum):
+            y_pred[j] = weighted_evals/weight_sum
+
+    return y_pred
+
+# Cell
+@jit_kernel
+def calc_robust_weights(y, y_pred, max_std_dev=6):
+    """Calculates robustifying weightings that penalise outliers, matching `lowess.calc_robust_weights`"""
+    residuals = y - y_pred
+    std_dev = np.quantile(np.abs(residuals), 0.682)
+
+    robust_weights = np.empty(residuals.shape[0])
+
+    for j in range(residuals.shape[0]):
+        cleaned_residual = min(max(residuals[j]/(max_std_dev*std_dev), -1.0), 1.0)
+        robust_weights[j] = (1 - cleaned_residual**2)**2
+
+    return robust_weights
+
+# Cell
+@jit_kernel
+def calc_quant_reg_loss(x0, x, y, q, weights):
+    """Makes a quantile prediction then calculates its error in a single pass, matching `lowess.calc_quant_reg_loss`"""
+    loss = 0.0
+
+    for j in range(x.shape[0]):
+        residual = weights[j]*(y[j] - (x0[0] + x0[1]*x[j]))
+        loss += max(q*residual, (q-1)*residual)
+
+    return loss/x.shape[0]
+
+def calc_quant_reg_betas(x, y, q=0.5, x0=np.zeros(2), weights=None, method='nelder-mead'):
+    """Calculates the intercept and gradient of a local quantile regression using the compiled loss"""
+    x, y = np.ascontiguousarray(x, dtype=float), np.ascontiguousarray(y, dtype=float)
+    weights = np.ones(x.shape[0]) if weights is None else np.ascontiguousarray(weights, dtype=float)
+
+    betas = minimize(calc_quant_reg_loss, x0, method=method, args=(x, y, float(q), weights)).x
+
+    return betas
@@ -3,26 +3,38 @@
 __all__ = ['get_dist', 'get_dist_threshold', 'dist_to_weights', 'get_all_weights', 'vector_to_dist_matrix',
            'get_frac_idx', 'get_dist_thresholds', 'clean_weights', 'dist_2_weights_matrix',
            'get_full_dataset_weights_matrix', 'get_weighting_locs', 'create_dist_matrix', 'num_fits_2_reg_anchors',
-           'get_weights_matrix', 'calc_lin_reg_betas', 'fit_regressions', 'check_array', 'lowess_fit_and_predict',
-           'calc_robust_weights', 'robust_lowess_fit_and_predict', 'Lowess', 'get_bootstrap_idxs',
-           'get_bootstrap_resid_std_devs', 'run_model', 'bootstrap_model', 'get_confidence_interval',
-           'pred_to_quantile_loss', 'calc_quant_reg_loss', 'calc_quant_reg_betas', 'quantile_model',
-           'calc_timedelta_dists', 'construct_dt_weights', 'fit_external_weighted_ensemble', 'get_ensemble_preds',
+           'num_fits_2_quantile_reg_anchors', 'num_fits_2_curvature_reg_anchors', 'get_weights_matrix',
+           'calc_lin_reg_betas', 'fit_regressions', 'check_array', 'lowess_fit_and_predict', 'calc_robust_weights',
+           'robust_lowess_fit_and_predict', 'pred_weights_cache', 'pred_weights_cache_lock',
+           'max_pred_weights_cache_bytes', 'get_sparse_nbytes', 'get_cached_pred_weights', 'lowess_backends', 'resolve_backend',
+           'get_reg_func_kind', 'Lowess', 'calc_weighted_moment_sums', 'moment_sums_2_design_matrix',
+           'merge_lowess_fits', 'fit_lowess_chunked', 'calc_frac_fits', 'calc_frac_scores', 'select_frac',
+           'get_bootstrap_idxs', 'get_bootstrap_resid_std_devs', 'run_model', 'bootstrap_model',
+           'get_confidence_interval', 'pred_to_quantile_loss', 'calc_quant_reg_loss', 'calc_quant_reg_betas',
+           'quantile_model', 'calc_timedelta_dists', 'construct_dt_weights', 'construct_shared_fit_weights',
+           'get_weight_support', 'fit_lowess_on_support', 'fit_external_weighted_ensemble', 'get_ensemble_preds',
+           'get_pred_dt_weights', 'get_shared_pred_kwargs', 'calc_smooth_dates_surface', 'get_reg_date_supports',
+           'estimate_fit_cost', 'calc_pilot_reg_date_preds', 'plan_reg_dates', 'max_fallback_reg_dates',
            'process_smooth_dates_fit_inputs', 'SmoothDates', 'construct_pred_ts', 'LowessDates']
 
 # Cell
 import pandas as pd
 import numpy as np
 
+import logging
+import threading
+from warnings import warn
 from collections.abc import Iterable
 from sklearn import linear_model
 
 from sklearn.base import BaseEstimator, RegressorMixin
 from scipy.optimize import minimize
-from scipy import linalg
+from scipy import linalg, sparse
 
 from tqdm import tqdm
 
+from .profiling import profiled, profile_stage
+
 # Cell
 get_dist = lambda X, x: np.abs(X - x)
 
@@ -91,11 +103,62 @@ def get_full_dataset_weights_matrix(x, frac=0.4):
 # Cell
 num_fits_2_reg_anchors = lambda x, num_fits: np.linspace(x.min(), x.max(), num=num_fits)
 
-def get_weighting_locs(x, reg_anchors=None, num_fits=None):
-    """Identifies the weighting locations for the provided dataset"""
+def num_fits_2_quantile_reg_anchors(x, num_fits):
+    """Places the regression anchors at evenly spaced quantiles of `x`, concentrating them where the data is dense"""
+    reg_anchors = np.quantile(x, np.linspace(0, 1, num=num_fits))
+
+    return reg_anchors
+
+def num_fits_2_curvature_reg_anchors(x, y, num_fits, num_bins=100, curvature_weight=1):
+    """
+    Places the regression anchors at the quantiles of `x` reweighted by the curvature of a
+    binned-mean pilot curve, concentrating them where the data is dense and the curve bends
+    """
+    bin_edges = np.linspace(x.min(), x.max(), num=num_bins+1)
+    bin_centres = (bin_edges[:-1] + bin_edges[1:])/2
+    bin_idxs = np.clip(np.searchsorted(bin_edges, x, side='right') - 1, 0, num_bins-1)
+
+    bin_counts = np.bincount(bin_idxs, minlength=num_bins)
+    bin_sums = np.bincount(bin_idxs, weights=y, minlength=num_bins)
+
+    # Interpolating the pilot curve over empty bins then smoothing it
+    has_data = bin_counts > 0
+    pilot_curve = np.interp(bin_centres, bin_centres[has_data], bin_sums[has_data]/bin_counts[has_data])
+    pilot_curve = np.convolve(np.pad(pilot_curve, 2, mode='edge'), np.ones(5)/5, mode='valid')
+
+    curvature = np.abs(np.gradient(np.gradient(pilot_curve)))
+
+    # Boosting the data density where the curve bends, the density weighting stops noisy sparse bins dominating
+    density = bin_counts/bin_counts.sum()
+    mean_curvature = np.sum(density*curvature)
+    curvature_boost = curvature/mean_curvature if mean_curvature > 0 else np.zeros(num_bins)
+
+    anchor_density = density*(1 + curvature_weight*curvature_boost)
+    anchor_cdf = np.concatenate([[0], np.cumsum(anchor_density)])
+    anchor_cdf = anchor_cdf/anchor_cdf[-1]
+
+    reg_anchors = np.interp(np.linspace(0, 1, num=num_fits), anchor_cdf, bin_edges)
+
+    return reg_anchors
+
+def get_weighting_locs(x, reg_anchors=None, num_fits=None, anchor_method='uniform', y=None):
+    """
+    Identifies the weighting locations for the provided dataset, when `num_fits` is specified the
+    anchors are spaced using the `anchor_method`: 'uniform' across the range of `x`, at the
+    'quantile's of `x`, or by 'curvature' (which also requires `y`)
+    """
+    anchor_method_to_reg_anchors = {
+        'uniform': lambda x, num_fits: num_fits_2_reg_anchors(x, num_fits),
+        'quantile': lambda x, num_fits: num_fits_2_quantile_reg_anchors(x, num_fits),
+        'curvature': lambda x, num_fits: num_fits_2_curvature_reg_anchors(x, y, num_fits),
+    }
+
+    assert anchor_method in anchor_method_to_reg_anchors.keys(), f'`anchor_method` must be one of {", ".join(anchor_method_to_reg_anchors.keys())}'
+    assert anchor_method != 'curvature' or y is not None, 'The curvature anchor placement requires `y`'
+
     num_type_2_dist_rows = {
         type(None) : lambda x, num_fits: x.reshape(-1, 1),
-        int : lambda x, num_fits: num_fits_2_reg_anchors(x, num_fits).reshape(-1, 1),
+        int : lambda x, num_fits: anchor_method_to_reg_anchors[anchor_method](x, num_fits).reshape(-1, 1),
     }
 
     if reg_anchors is None:
@@ -113,17 +176,23 @@ def create_dist_matrix(x, reg_anchors=None, num_fits=None):
     return dist_matrix
 
 # Cell
-def get_weights_matrix(x, frac=0.4, weighting_locs=None, reg_anchors=None, num_fits=None):
-    """Wrapper for calculating weights from the raw data and LOWESS fraction"""
-    frac_idx = get_frac_idx(x, frac)
+@profiled()
+def get_weights_matrix(x, frac=0.4, weighting_locs=None, reg_anchors=None, num_fits=None, bandwidth=None):
+    """Wrapper for calculating weights from the raw data and LOWESS fraction, or from a fixed `bandwidth` in x units when specified"""
+    with profile_stage('lowess.distance_matrix'):
+        if weighting_locs is not None:
+            dist_matrix = np.abs(weighting_locs - x.reshape(1, -1))
+        else:
+            dist_matrix = create_dist_matrix(x, reg_anchors=reg_anchors, num_fits=num_fits)
 
-    if weighting_locs is not None:
-        dist_matrix = np.abs(weighting_locs - x.reshape(1, -1))
+    if bandwidth is not None:
+        dist_thresholds = np.full(dist_matrix.shape[0], float(bandwidth))
     else:
-        dist_matrix = create_dist_matrix(x, reg_anchors=reg_anchors, num_fits=num_fits)
+        with profile_stage('lowess.distance_sorting', dist_matrix=dist_matrix):
+            dist_thresholds = get_dist_thresholds(x, get_frac_idx(x, frac), dist_matrix)
 
-    dist_thresholds = get_dist_thresholds(x, frac_idx, dist_matrix)
-    weights = dist_2_weights_matrix(dist_matrix, dist_thresholds)
+    with profile_stage('lowess.distance_weights', dist_matrix=dist_matrix):
+        weights = dist_2_weights_matrix(dist_matrix, dist_thresholds)
 
     return weights
 
@@ -144,6 +213,7 @@ def calc_lin_reg_betas(x, y, weights=None):
 # Cell
 check_array = lambda array, x: np.ones(len(x)) if array is None else array
 
+@profiled()
 def fit_regressions(x, y, weights=None, reg_func=calc_lin_reg_betas, num_coef=2, **reg_params):
     """Calculates the design matrix for the specified local regressions"""
     if weights is None:
@@ -177,6 +247,7 @@ def lowess_fit_and_predict(x, y, frac=0.4, reg_anchors=None, num_fits=None, x_pr
     return y_pred
 
 # Cell
+@profiled()
 def calc_robust_weights(y, y_pred, max_std_dev=6):
     """Calculates robustifying weightings that penalise outliers"""
     residuals = y - y_pred
@@ -225,6 +296,85 @@ def robust_lowess_fit_and_predict(x, y, frac=0.4, reg_anchors=None, num_fits=Non
 
     return y_pred
 
+# Cell
+pred_weights_cache = dict()
+pred_weights_cache_lock = threading.Lock()
+max_pred_weights_cache_bytes = 256*2**20
+
+def get_sparse_nbytes(sparse_matrix):
+    """Calculates the memory held by the arrays backing a CSR matrix"""
+    return sparse_matrix.data.nbytes + sparse_matrix.indices.nbytes + sparse_matrix.indptr.nbytes
+
+def get_cached_pred_weights(x_pred, frac, weighting_locs, bandwidth=None):
+    """
+    Retrieves the sparse (x_pred by anchor) weights used to blend the local regressions, they're
+    calculated and cached the first time a grid is used so that the members of an ensemble (which
+    share their anchors) and repeated predictions on the same grid only need a sparse mat-vec.
+
+    The cache is bounded by `max_pred_weights_cache_bytes`, the least recently used grids are
+    evicted first and weights larger than the whole budget are returned without being cached.
+    """
+    x_pred = np.ascontiguousarray(x_pred, dtype=float)
+    weighting_locs = np.ascontiguousarray(weighting_locs, dtype=float)
+    cache_key = (x_pred.tobytes(), frac, bandwidth, weighting_locs.tobytes())
+
+    with pred_weights_cache_lock:
+        pred_weights = pred_weights_cache.pop(cache_key, None) # popped and re-added so that the least recently used grid is evicted
+
+    # The weights are calculated outside of the lock so that threads predicting on different grids don't wait on each other
+    if pred_weights is None:
+        pred_weights = sparse.csr_matrix(get_weights_matrix(x_pred, frac=frac, reg_anchors=weighting_locs, bandwidth=bandwidth).T)
+
+    if get_sparse_nbytes(pred_weights) > max_pred_weights_cache_bytes:
+        return pred_weights
+
+    with pred_weights_cache_lock:
+        pred_weights_cache[cache_key] = pred_weights
+        cache_nbytes = sum(get_sparse_nbytes(cached_weights) for cached_weights in pred_weights_cache.values())
+
+        for evicted_key in list(pred_weights_cache.keys())[:-1]:
+            if cache_nbytes <= max_pred_weights_cache_bytes:
+                break
+
+            cache_nbytes -= get_sparse_nbytes(pred_weights_cache.pop(evicted_key))
+
+    return pred_weights
+
+# Cell
+lowess_backends = ['numpy', 'numba']
+
+def resolve_backend(backend='numpy'):
+    """
+    Identifies the kernel backend to use, 'auto' will use Numba when it's installed and
+    requesting Numba without it installed falls back to the NumPy implementation
+    """
+    assert backend in lowess_backends + ['auto'], f'`backend` must be one of {", ".join(lowess_backends + ["auto"])}'
+
+    if backend == 'numpy':
+        return backend
+
+    from moepy import kernels # only imported when requested as loading Numba adds to the import time
+
+    if backend == 'auto':
+        backend = 'numba' if kernels.numba_available == True else 'numpy'
+
+    if backend == 'numba' and kernels.numba_available == False:
+        warn('Numba is not installed, the NumPy backend will be used instead')
+        backend = 'numpy'
+
+    return backend
+
+def get_reg_func_kind(reg_func):
+    """Identifies whether the regression function is the linear or quantile one (including when wrapped to be picklable), these have compiled kernels"""
+    reg_func_code = getattr(getattr(reg_func, '_fun', reg_func), '__code__', None)
+
+    if reg_func_code == calc_lin_reg_betas.__code__:
+        return 'linear'
+    elif reg_func_code == calc_quant_reg_betas.__code__:
+        return 'quantile'
+
+    return None
+
 # Cell
 class Lowess(BaseEstimator, RegressorMixin):
     """
@@ -254,23 +404,29 @@ class Lowess(BaseEstimator, RegressorMixin):
 
     Initialisation Parameters:
         reg_func: function that accepts the x and y values then returns the intercepts and gradients
+        backend: Implementation of the hot loops, one of 'numpy', 'numba' or 'auto' (Numba when installed)
 
     Attributes:
         reg_func: function that accepts the x and y values then returns the intercepts and gradients
+        backend: Implementation of the hot loops, the Numba backend doesn't store the `loading_weights`
         fitted: Boolean flag indicating whether the model has been fitted
         frac: Fraction of the dataset to use in each local regression
+        bandwidth: Fixed distance (in x units) used by each local regression in place of `frac`
         weighting_locs: Locations of the local regression centers
         loading_weights: Weights of each data-point across the localalised models
         design_matrix: Regression coefficients for each of the localised models
+        moment_sums: Weighted moment sums of each localised model accumulated by `partial_fit`
     """
 
-    def __init__(self, reg_func=calc_lin_reg_betas):
+    def __init__(self, reg_func=calc_lin_reg_betas, backend='numpy'):
         self.reg_func = reg_func
+        self.backend = backend
         self.fitted = False
         return
 
 
-    def calculate_loading_weights(self, x, reg_anchors=None, num_fits=None, external_weights=None, robust_weights=None):
+    @profiled()
+    def calculate_loading_weights(self, x, reg_anchors=None, num_fits=None, external_weights=None, robust_weights=None, base_weights=None):
         """
         Calculates the loading weights for each data-point across the localised models
 
@@ -280,11 +436,16 @@ class Lowess(BaseEstimator, RegressorMixin):
             num_fits: Number of locations at which to carry out a local regression
             external_weights: Further weighting for the specific regression
             robust_weights: Robustifying weights to remove the influence of outliers
+            base_weights: Precomputed distance weights for the regression anchors, calculated if not provided
         """
 
         # Calculating the initial loading weights
         weighting_locs = get_weighting_locs(x, reg_anchors=reg_anchors, num_fits=num_fits)
-        loading_weights = get_weights_matrix(x, frac=self.frac, weighting_locs=weighting_locs)
+
+        if base_weights is None:
+            loading_weights = get_weights_matrix(x, frac=self.frac, weighting_locs=weighting_locs, bandwidth=self.bandwidth)
+        else:
+            loading_weights = base_weights
 
         # Applying weight adjustments
         if external_weights is None:
@@ -308,9 +469,10 @@ class Lowess(BaseEstimator, RegressorMixin):
         return
 
 
+    @profiled()
     def fit(self, x, y, frac=0.4, reg_anchors=None,
             num_fits=None, external_weights=None,
-            robust_weights=None, robust_iters=3, **reg_params):
+            robust_weights=None, robust_iters=3, base_weights=None, anchor_method='uniform', bandwidth=None, **reg_params):
         """
         Calculation of the local regression coefficients for
         a LOWESS model across the dataset provided. This method
@@ -326,21 +488,46 @@ class Lowess(BaseEstimator, RegressorMixin):
             external_weights: Further weighting for the specific regression
             robust_weights: Robustifying weights to remove the influence of outliers
             robust_iters: Number of robustifying iterations to carry out
+            base_weights: Precomputed distance weights for the regression anchors, calculated if not provided
+            anchor_method: Placement of the `num_fits` regression anchors, one of 'uniform', 'quantile' or 'curvature'
+            bandwidth: Fixed LOWESS bandwidth in x units, overrides `frac` when specified
         """
 
         self.frac = frac
+        self.bandwidth = bandwidth
+        self.moment_sums = None
+
+        # Placing the anchors once so they're shared by the robustifying iterations
+        if reg_anchors is None and num_fits is not None and anchor_method != 'uniform':
+            reg_anchors = get_weighting_locs(x, num_fits=num_fits, anchor_method=anchor_method, y=y).flatten()
 
         # Solving for the design matrix
-        self.calculate_loading_weights(x, reg_anchors=reg_anchors, num_fits=num_fits, external_weights=external_weights, robust_weights=robust_weights)
-        self.design_matrix = fit_regressions(x, y, weights=self.loading_weights, reg_func=self.reg_func, **reg_params)
+        backend = resolve_backend(getattr(self, 'backend', 'numpy')) # models pickled before the backends were added don't have the attribute
+        reg_func_kind = get_reg_func_kind(self.reg_func)
+
+        if backend == 'numba':
+            from moepy import kernels
+
+        if backend == 'numba' and reg_func_kind == 'linear':
+            self.fit_fused_lin_regs(x, y, reg_anchors=reg_anchors, num_fits=num_fits, external_weights=external_weights, robust_weights=robust_weights, base_weights=base_weights)
+        else:
+            reg_func = kernels.calc_quant_reg_betas if (backend == 'numba' and reg_func_kind == 'quantile') else self.reg_func
+
+            self.calculate_loading_weights(x, reg_anchors=reg_anchors, num_fits=num_fits, external_weights=external_weights, robust_weights=robust_weights, base_weights=base_weights)
+            self.design_matrix = fit_regressions(x, y, weights=self.loading_weights, reg_func=reg_func, **reg_params)
 
         # Recursive robust regression
         if robust_iters > 1:
-            y_pred = self.predict(x)
-            robust_weights = calc_robust_weights(y, y_pred)
+            with profile_stage('lowess.robust_iteration'):
+                y_pred = self.predict(x, cache_weights=False)
+
+                if backend == 'numba':
+                    robust_weights = kernels.calc_robust_weights(np.asarray(y, dtype=float), y_pred)
+                else:
+                    robust_weights = calc_robust_weights(y, y_pred)
 
-            robust_iters -= 1
-            y_pred = self.fit(x, y, frac=self.frac, reg_anchors=reg_anchors, num_fits=num_fits, external_weights=external_weights, robust_weights=robust_weights, robust_iters=robust_iters, **reg_params)
+                robust_iters -= 1
+                y_pred = self.fit(x, y, frac=self.frac, reg_anchors=reg_anchors, num_fits=num_fits, external_weights=external_weights, robust_weights=robust_weights, robust_iters=robust_iters, base_weights=base_weights, bandwidth=bandwidth, **reg_params)
 
             return y_pred
 
@@ -349,24 +536,264 @@ class Lowess(BaseEstimator, RegressorMixin):
         return
 
 
-    def predict(self, x_pred):
+    @profiled()
+    def predict(self, x_pred, cache_weights=False):
         """
         Inference using the design matrix from the LOWESS fit
 
         Parameters:
             x_pred: Locations for the LOWESS inference
+            cache_weights: Flag specifying whether to reuse the (sparse) prediction weights of recently used grids,
+                worthwhile for fixed grids that are predicted on repeatedly (e.g. surfaces) but not for one-off inputs
 
         Returns:
             y_pred: Estimated values using the LOWESS fit
         """
 
-        point_evals = self.design_matrix[:, 0] + np.dot(x_pred.reshape(-1, 1), self.design_matrix[:, 1].reshape(1, -1))
-        pred_weights = get_weights_matrix(x_pred, frac=self.frac, reg_anchors=self.weighting_locs)
+        bandwidth = getattr(self, 'bandwidth', None) # models pickled before the fixed-bandwidth mode don't have the attribute
+
+        if cache_weights == False and resolve_backend(getattr(self, 'backend', 'numpy')) == 'numba':
+            from moepy import kernels
+
+            x_pred = np.ascontiguousarray(x_pred, dtype=float)
+            weighting_locs = self.weighting_locs.flatten()
+
+            if bandwidth is not None:
+                dist_thresholds = np.full(weighting_locs.shape[0], float(bandwidth))
+            else:
+                dist_thresholds = kernels.calc_anchor_dist_thresholds(x_pred, weighting_locs, get_frac_idx(x_pred, self.frac))
+
+            return kernels.predict_fused_lin_regs(x_pred, weighting_locs, dist_thresholds, self.design_matrix)
+
+        if cache_weights == True:
+            pred_weights = get_cached_pred_weights(x_pred, self.frac, self.weighting_locs, bandwidth=bandwidth)
+        else:
+            pred_weights = get_weights_matrix(x_pred, frac=self.frac, reg_anchors=self.weighting_locs, bandwidth=bandwidth).T
 
-        y_pred = np.multiply(pred_weights, point_evals.T).sum(axis=0)
+        # Blending the local regressions, equivalent to weighting each of their evaluations at every x_pred
+        y_pred = pred_weights @ self.design_matrix[:, 0] + x_pred * (pred_weights @ self.design_matrix[:, 1])
 
         return y_pred
 
+
+    @profiled()
+    def fit_fused_lin_regs(self, x, y, reg_anchors=None, num_fits=None, external_weights=None, robust_weights=None, base_weights=None):
+        """
+        Solves the local linear regressions with the compiled kernels, these fuse the distance,
+        weighting and moment accumulation steps so the loading weights are never materialised
+
+        Parameters:
+            x: values for the independent variable
+            y: values for the dependent variable
+            reg_anchors: Locations at which to center the local regressions
+            num_fits: Number of locations at which to carry out a local regression
+            external_weights: Further weighting for the specific regression
+            robust_weights: Robustifying weights to remove the influence of outliers
+            base_weights: Precomputed distance weights for the regression anchors, calculated if not provided
+        """
+
+        from moepy import kernels
+
+        x, y = np.ascontiguousarray(x, dtype=float), np.ascontiguousarray(y, dtype=float)
+        weighting_locs = get_weighting_locs(x, reg_anchors=reg_anchors, num_fits=num_fits).astype(float).flatten()
+
+        point_weights = np.ones(x.shape[0])
+
+        for weight_adj in [external_weights, robust_weights]:
+            if weight_adj is not None:
+                point_weights = point_weights*weight_adj
+
+        if base_weights is not None:
+            moment_sums = kernels.calc_weights_matrix_moment_sums(x, y, base_weights, point_weights)
+        else:
+            if self.bandwidth is not None:
+                dist_thresholds = np.full(weighting_locs.shape[0], float(self.bandwidth))
+            else:
+                dist_thresholds = kernels.calc_anchor_dist_thresholds(x, weighting_locs, get_frac_idx(x, self.frac))
+
+            moment_sums = kernels.calc_fused_moment_sums(x, y, weighting_locs, dist_thresholds, point_weights)
+
+        self.weighting_locs = weighting_locs.reshape(-1, 1)
+        self.loading_weights = None
+        self.design_matrix = moment_sums_2_design_matrix(moment_sums)
+
+        return
+
+
+    @profiled()
+    def partial_fit(self, x, y, bandwidth=None, reg_anchors=None, external_weights=None):
+        """
+        Accumulates the weighted moment sums of the local linear regressions from
+        a chunk of the dataset and then updates the design matrix. With a fixed
+        `bandwidth` each data-point's loading weights only depend on its own
+        location, so the chunks can be streamed from disk or fitted in separate
+        processes and merged with `merge_lowess_fits`. Robustifying iterations
+        are not carried out as they require a further pass over the whole dataset.
+
+        Parameters:
+            x: values for the independent variable in this chunk
+            y: values for the dependent variable in this chunk
+            bandwidth: Fixed LOWESS bandwidth in x units, required on the first call
+            reg_anchors: Locations at which to center the local regressions, required on the first call
+            external_weights: Further weighting for the specific regression
+        """
+
+        if getattr(self, 'moment_sums', None) is None:
+            assert bandwidth is not None and reg_anchors is not None, 'The first call of `partial_fit` must specify the `bandwidth` and `reg_anchors`'
+            assert self.reg_func is calc_lin_reg_betas, '`partial_fit` is only available for the linear `reg_func`'
+
+            self.frac = None
+            self.bandwidth = bandwidth
+            self.weighting_locs = np.asarray(reg_anchors, dtype=float).reshape(-1, 1)
+            self.moment_sums = np.zeros((self.weighting_locs.shape[0], 5))
+
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+        self.calculate_loading_weights(x, reg_anchors=self.weighting_locs, external_weights=external_weights)
+        self.moment_sums += calc_weighted_moment_sums(x, y, self.loading_weights)
+        self.loading_weights = None # only the moment sums need to be kept between chunks
+
+        self.design_matrix = moment_sums_2_design_matrix(self.moment_sums)
+        self.fitted = True
+
+        return
+
+# Cell
+def calc_weighted_moment_sums(x, y, weights):
+    """Calculates the additive weighted moment sums (w, wx, wx^2, wy, wxy) of each local regression"""
+    moment_sums = weights @ np.stack([np.ones(x.shape[0]), x, x**2, y, x*y], axis=1)
+
+    return moment_sums
+
+def moment_sums_2_design_matrix(moment_sums):
+    """Solves the local linear regressions from their weighted moment sums, matching `calc_lin_reg_betas`"""
+    design_matrix = np.zeros((moment_sums.shape[0], 2))
+
+    for i, (s0, s1, s2, t0, t1) in enumerate(moment_sums):
+        design_matrix[i, :] = np.linalg.lstsq(np.array([[s0, s1], [s1, s2]]), np.array([t0, t1]), rcond=None)[0]
+
+    return design_matrix
+
+def merge_lowess_fits(models):
+    """Combines `Lowess` models fitted with `partial_fit` on separate chunks (with the same anchors and bandwidth) into a single model"""
+    merged_model = Lowess()
+    merged_model.frac = None
+    merged_model.bandwidth = models[0].bandwidth
+    merged_model.weighting_locs = models[0].weighting_locs
+    merged_model.loading_weights = None
+
+    for model in models[1:]:
+        assert model.bandwidth == merged_model.bandwidth and np.array_equal(model.weighting_locs, merged_model.weighting_locs), 'Only models with the same anchors and bandwidth can be merged'
+
+    merged_model.moment_sums = np.sum([model.moment_sums for model in models], axis=0)
+    merged_model.design_matrix = moment_sums_2_design_matrix(merged_model.moment_sums)
+    merged_model.fitted = True
+
+    return merged_model
+
+def fit_lowess_chunked(x, y, bandwidth, reg_anchors, chunk_size=1_000_000, external_weights=None, model=None):
+    """
+    Fits a fixed-bandwidth `Lowess` model one chunk at a time, the inputs can be memory-mapped
+    arrays (e.g. `np.load(fp, mmap_mode='r')`) so that only a single chunk is held in memory
+    """
+    if model is None:
+        model = Lowess()
+
+    for chunk_start in range(0, len(x), chunk_size):
+        chunk = slice(chunk_start, chunk_start+chunk_size)
+        chunk_external_weights = None if external_weights is None else external_weights[chunk]
+
+        model.partial_fit(x[chunk], y[chunk], bandwidth=bandwidth, reg_anchors=reg_anchors, external_weights=chunk_external_weights)
+
+    return model
+
+# Cell
+def calc_frac_fits(sorted_dists, dist_matrix, x, y, frac, external_weights=None):
+    """
+    Fits the linear LOWESS for a single `frac` using the pre-sorted anchor distances, returning
+    the in-sample predictions and the diagonal of the hat matrix that maps `y` to them
+    """
+    dist_thresholds = sorted_dists[:, get_frac_idx(x, frac)]
+    loading_weights = dist_to_weights(dist_matrix, dist_thresholds.reshape(-1, 1))
+
+    if external_weights is not None:
+        loading_weights = loading_weights * external_weights
+
+    loading_weights = clean_weights(loading_weights)
+
+    # Local weighted least squares for every anchor at once
+    s0, s1, s2 = loading_weights.sum(axis=1), loading_weights @ x, loading_weights @ (x**2)
+    t0, t1 = loading_weights @ y, loading_weights @ (x*y)
+
+    A = np.stack([np.stack([s0, s1], axis=-1), np.stack([s1, s2], axis=-1)], axis=-2)
+    A_inv = np.linalg.pinv(A)
+    betas = np.einsum('ijk,ik->ij', A_inv, np.stack([t0, t1], axis=-1))
+
+    # The in-sample blending weights are the loading weights, so the smoother is linear in y
+    y_pred = (loading_weights * (betas[:, [0]] + betas[:, [1]]*x)).sum(axis=0)
+    leverages = A_inv[:, [0], 0] + 2*A_inv[:, [0], 1]*x + A_inv[:, [1], 1]*x**2
+    hat_diag = (loading_weights**2 * leverages).sum(axis=0)
+
+    return y_pred, hat_diag
+
+@profiled()
+def calc_frac_scores(x, y, fracs=np.linspace(0.1, 0.9, 17), reg_anchors=None, num_fits=None, anchor_method='uniform', external_weights=None):
+    """
+    Scores each LOWESS `frac` using the standard linear smoother approximations of the
+    leave-one-out cross-validation and generalised cross-validation (GCV) errors, i.e. the
+    residuals are scaled by the diagonal (or mean trace) of the hat matrix. These treat the
+    fit as a fixed linear smoother so they ignore how dropping a point would change the
+    neighbouring bandwidths and weights, and they don't account for robustifying iterations.
+    The anchor distances are calculated and sorted once and then shared by every `frac`, so
+    each candidate only costs a single fit.
+
+    Parameters:
+        x: Values for the independent variable
+        y: Values for the dependent variable
+        fracs: Candidate LOWESS bandwidths
+        reg_anchors: Locations at which to center the local regressions
+        num_fits: Number of locations at which to carry out a local regression
+        anchor_method: Placement of the `num_fits` regression anchors, one of 'uniform', 'quantile' or 'curvature'
+        external_weights: Further weighting for the specific regression
+
+    Returns:
+        df_scores: The LOO and GCV mean squared errors, residual mean squared error and effective degrees of freedom for each `frac`
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+    weighting_locs = get_weighting_locs(x, reg_anchors=reg_anchors, num_fits=num_fits, anchor_method=anchor_method, y=y)
+    dist_matrix = np.abs(weighting_locs - x.reshape(1, -1))
+
+    with profile_stage('lowess.distance_sorting', dist_matrix=dist_matrix):
+        sorted_dists = np.sort(dist_matrix)
+
+    frac_to_scores = dict()
+
+    for frac in fracs:
+        y_pred, hat_diag = calc_frac_fits(sorted_dists, dist_matrix, x, y, frac, external_weights=external_weights)
+        residuals = y - y_pred
+        trace_hat = hat_diag.sum()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac_to_scores[frac] = {
+                'loo_mse': np.mean((residuals/(1 - hat_diag))**2),
+                'gcv_mse': np.mean(residuals**2)/(1 - trace_hat/x.size)**2,
+                'mse': np.mean(residuals**2),
+                'effective_dof': trace_hat
+            }
+
+    df_scores = pd.DataFrame(frac_to_scores).T
+    df_scores.index.name = 'frac'
+
+    return df_scores
+
+def select_frac(x, y, fracs=np.linspace(0.1, 0.9, 17), criterion='gcv_mse', **frac_score_kwargs):
+    """Selects the LOWESS `frac` with the lowest LOO or GCV error, returning it alongside the score curve"""
+    df_scores = calc_frac_scores(x, y, fracs=fracs, **frac_score_kwargs)
+    best_frac = df_scores[criterion].idxmin()
+
+    return best_frac, df_scores
+
 # Cell
 def get_bootstrap_idxs(x, bootstrap_bag_size=0.5):
     """Determines the indexes of an array to be used for the in- and out-of-bag bootstrap samples"""
@@ -428,6 +855,7 @@ def run_model(x, y, bag_size, model=Lowess(), x_pred=None, **model_kwargs):
 
     return y_pred
 
+@profiled()
 def bootstrap_model(x, y, bag_size=0.5, model=Lowess(), x_pred=None, num_runs=1000, **model_kwargs):
     """Repeatedly fits and predicts using the specified model, using different subsets of the data each time"""
     # Creating the ensemble predictions
@@ -512,37 +940,306 @@ def calc_timedelta_dists(dates, central_date, threshold_value=24, threshold_unit
     return timedelta_dists
 
 # Cell
+@profiled()
 def construct_dt_weights(dt_idx, reg_dates, threshold_value=52, threshold_units='W'):
     """Constructs a set of distance weightings based on the regression dates provided"""
     dt_to_weights = dict()
 
-    for reg_date in reg_dates:
-        dt_to_weights[reg_date] = pd.Series(calc_timedelta_dists(dt_idx, reg_date, threshold_value=threshold_value, threshold_units=threshold_units)).pipe(dist_to_weights).values
+    # Converting to UTC nanoseconds once, rather than for every regression date
+    dt_ns = pd.DatetimeIndex(pd.to_datetime(dt_idx, utc=True)).asi8
+    reg_dates_ns = pd.DatetimeIndex(pd.to_datetime(reg_dates, utc=True)).asi8
+    threshold_ns = pd.Timedelta(value=threshold_value, unit=threshold_units).value
+
+    for reg_date, reg_date_ns in zip(reg_dates, reg_dates_ns):
+        dt_to_weights[reg_date] = dist_to_weights((dt_ns - reg_date_ns)/threshold_ns)
 
     return dt_to_weights
 
 # Cell
-def fit_external_weighted_ensemble(x, y, ensemble_member_to_weights, lowess_kwargs={}, **fit_kwargs):
-    """Fits an ensemble of LOWESS models which have varying relevance for each subset of data over time"""
+@profiled()
+def construct_shared_fit_weights(x, dt_idx, reg_dates, frac=0.3, threshold_value=52, threshold_units='W', reg_anchors=None, num_fits=None, anchor_method='uniform', y=None):
+    """Constructs the date and distance weightings which can be shared by every fit on the same data"""
+    weighting_locs = get_weighting_locs(x, reg_anchors=reg_anchors, num_fits=num_fits, anchor_method=anchor_method, y=y)
+
+    fit_weights = {
+        'ensemble_member_to_weights': construct_dt_weights(dt_idx, reg_dates, threshold_value=threshold_value, threshold_units=threshold_units),
+        'base_weights': get_weights_matrix(x, frac=frac, weighting_locs=weighting_locs)
+    }
+
+    return fit_weights
+
+def get_weight_support(weights):
+    """Identifies the contiguous slice of data-points spanning those with a positive weighting"""
+    positive_idxs = np.flatnonzero(weights > 0)
+
+    if positive_idxs.size == 0:
+        return slice(None)
+
+    weight_support = slice(positive_idxs[0], positive_idxs[-1]+1)
+
+    return weight_support
+
+def fit_lowess_on_support(model, x, y, weight_support, reg_anchors, external_weights, base_weights, robust_weights=None, robust_iters=3, **fit_kwargs):
+    """
+    Fits the model on the window of data-points within the weight support, `base_weights` are the
+    distance weights of every data-point. The robustifying weights are calculated from the residuals
+    across the full dataset, as they would be when fitting on every data-point, so the fit only differs
+    from one on the full dataset by floating point error. The `base_weights` are also the weights that
+    blend the local regressions at each data-point, so the in-sample predictions only need two mat-vecs.
+    """
+    backend = resolve_backend(getattr(model, 'backend', 'numpy'))
+    support_base_weights = base_weights[:, weight_support]
+
+    if backend == 'numba':
+        from moepy import kernels
+
+    for robust_iter in range(max(robust_iters, 1)):
+        model.fit(
+            x[weight_support],
+            y[weight_support],
+            reg_anchors=reg_anchors,
+            external_weights=external_weights[weight_support],
+            robust_weights=None if robust_weights is None else robust_weights[weight_support],
+            robust_iters=1,
+            base_weights=support_base_weights,
+            **fit_kwargs
+        )
+
+        if robust_iter < robust_iters - 1:
+            with profile_stage('lowess.robust_iteration'):
+                y_pred = base_weights.T @ model.design_matrix[:, 0] + x * (base_weights.T @ model.design_matrix[:, 1])
+
+                if backend == 'numba':
+                    robust_weights = kernels.calc_robust_weights(np.asarray(y, dtype=float), y_pred)
+                else:
+                    robust_weights = calc_robust_weights(y, y_pred)
+
+    return model
+
+@profiled()
+def fit_external_weighted_ensemble(x, y, ensemble_member_to_weights, lowess_kwargs={}, base_weights=None, slice_to_support=True, distributed=None, **fit_kwargs):
+    """
+    Fits an ensemble of LOWESS models which have varying relevance for each subset of data over time.
+    When `slice_to_support` is True each model is only fitted on the window of data-points that have
+    a positive weighting, the regression anchors, distance weights and robustifying weights are still
+    calculated across the full dataset so the fits are unchanged but the cost of the regressions
+    scales with the date kernel width. When `distributed` is provided (as keyword arguments for
+    `distributed.run_distributed_tasks`) each member is fitted as a task by worker processes on
+    this or other hosts.
+    """
     ensemble_member_to_models = dict()
 
+    weighting_locs = get_weighting_locs(x, reg_anchors=fit_kwargs.pop('reg_anchors', None), num_fits=fit_kwargs.pop('num_fits', None),
+                                        anchor_method=fit_kwargs.pop('anchor_method', 'uniform'), y=y)
+    robust_weights = fit_kwargs.pop('robust_weights', None)
+
+    if base_weights is None:
+        base_weights = get_weights_matrix(x, frac=fit_kwargs.get('frac', 0.4), weighting_locs=weighting_locs)
+
+    if distributed is not None:
+        from moepy.distributed import fit_ensemble_members_distributed
+
+        return fit_ensemble_members_distributed(x, y, ensemble_member_to_weights, weighting_locs, base_weights, robust_weights=robust_weights,
+                                                lowess_kwargs=lowess_kwargs, slice_to_support=slice_to_support, distributed=distributed, **fit_kwargs)
+
     for ensemble_member, ensemble_weights in tqdm(ensemble_member_to_weights.items()):
-        ensemble_member_to_models[ensemble_member] = Lowess(**lowess_kwargs)
-        ensemble_member_to_models[ensemble_member].fit(x, y, external_weights=ensemble_weights, **fit_kwargs)
+        weight_support = get_weight_support(ensemble_weights) if slice_to_support == True else slice(None)
+
+        ensemble_member_to_models[ensemble_member] = fit_lowess_on_support(
+            Lowess(**lowess_kwargs),
+            x,
+            y,
+            weight_support,
+            reg_anchors=weighting_locs,
+            external_weights=ensemble_weights,
+            base_weights=base_weights,
+            robust_weights=robust_weights,
+            **fit_kwargs
+        )
 
     return ensemble_member_to_models
 
+@profiled()
 def get_ensemble_preds(ensemble_member_to_model, x_pred=np.linspace(8, 60, 53)):
     """Using the fitted ensemble of LOWESS models to generate the predictions for each of them"""
     ensemble_member_to_preds = dict()
 
     for ensemble_member in ensemble_member_to_model.keys():
-        ensemble_member_to_preds[ensemble_member] = ensemble_member_to_model[ensemble_member].predict(x_pred)
+        ensemble_member_to_preds[ensemble_member] = ensemble_member_to_model[ensemble_member].predict(x_pred, cache_weights=True)
 
     return ensemble_member_to_preds
 
-def process_smooth_dates_fit_inputs(x, y, dt_idx, reg_dates):
-    """Sanitises the inputs to the SmoothDates fitting method"""
+@profiled()
+def get_pred_dt_weights(dt_pred, reg_dates):
+    """Calculates the normalised weightings used to blend each regression date's model into the prediction dates"""
+    pred_weights = np.array(list(construct_dt_weights(dt_pred, reg_dates).values()))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pred_weights = pred_weights/pred_weights.sum(axis=0)
+
+    return pred_weights
+
+def get_shared_pred_kwargs(ensemble_member_to_model):
+    """Identifies the anchors and bandwidth shared by each of the ensemble members, returning None if they differ"""
+    models = list(ensemble_member_to_model.values())
+    shared_pred_kwargs = {'frac': models[0].frac, 'weighting_locs': models[0].weighting_locs, 'bandwidth': getattr(models[0], 'bandwidth', None)}
+
+    for model in models[1:]:
+        if (model.frac != shared_pred_kwargs['frac']) or (getattr(model, 'bandwidth', None) != shared_pred_kwargs['bandwidth']) or (not np.array_equal(model.weighting_locs, shared_pred_kwargs['weighting_locs'])):
+            return None
+
+    return shared_pred_kwargs
+
+@profiled()
+def calc_smooth_dates_surface(ensemble_member_to_model, reg_dates, x_pred, dt_pred):
+    """
+    Blends the ensemble members' predictions into the (date by x) surface without modifying
+    the models. When the members share their anchors (as they do when fitted with shared
+    weights) their design matrices are stacked so that all of them are evaluated with two
+    sparse matrix products, these release the GIL so separate models can be predicted from threads.
+    """
+    x_pred = np.asarray(x_pred, dtype=float)
+    shared_pred_kwargs = get_shared_pred_kwargs(ensemble_member_to_model)
+
+    if shared_pred_kwargs is not None:
+        pred_weights = get_cached_pred_weights(x_pred, **shared_pred_kwargs)
+        design_matrices = np.stack([model.design_matrix for model in ensemble_member_to_model.values()], axis=1)
+
+        pred_values = (pred_weights @ design_matrices[:, :, 0] + x_pred.reshape(-1, 1) * (pred_weights @ design_matrices[:, :, 1])).T
+    else:
+        pred_values = np.array(list(get_ensemble_preds(ensemble_member_to_model, x_pred=x_pred).values()))
+
+    dt_weights = get_pred_dt_weights(dt_pred, reg_dates)
+    y_pred = np.dot(dt_weights.T, pred_values)
+
+    return y_pred
+
+def get_reg_date_supports(dt_idx, reg_dates, threshold_value=52, threshold_units='W'):
+    """Identifies the start and end positions of the (sorted) data-points within the date kernel of each regression date"""
+    dt_values = np.sort(pd.DatetimeIndex(pd.to_datetime(dt_idx, utc=True)).asi8)
+    reg_dt_values = pd.DatetimeIndex(pd.to_datetime(reg_dates, utc=True)).asi8
+    threshold = pd.Timedelta(value=threshold_value, unit=threshold_units).value
+
+    start_idxs = np.searchsorted(dt_values, reg_dt_values - threshold, side='right')
+    end_idxs = np.searchsorted(dt_values, reg_dt_values + threshold, side='left')
+
+    return start_idxs, end_idxs
+
+def estimate_fit_cost(dt_idx, reg_dates, threshold_value=52, threshold_units='W', num_fits=None, robust_iters=3):
+    """
+    Estimates the size of a `SmoothDates` fit before it's run, the `weighted_rows` (the number of
+    data-point by local regression terms in the regression sums) scales the run time of the fit
+
+    Parameters:
+        dt_idx: Datetime index of the data
+        reg_dates: Dates at which the local time-adaptive models will be centered around
+        threshold_value: Number of datetime units to use in each regression
+        threshold_units: Datetime unit which should be compatible with pandas `date_range` function
+        num_fits: Number of locations at which to carry out a local regression
+        robust_iters: Number of robustifying iterations to carry out
+
+    Returns:
+        fit_cost: Mapping from each cost measure to its value
+    """
+    start_idxs, end_idxs = get_reg_date_supports(dt_idx, reg_dates, threshold_value=threshold_value, threshold_units=threshold_units)
+    support_sizes = end_idxs - start_idxs
+    num_anchors = len(dt_idx) if num_fits is None else num_fits
+
+    fit_cost = {
+        'num_models': len(reg_dates),
+        'mean_support_size': float(support_sizes.mean()) if len(reg_dates) > 0 else 0.,
+        'num_regressions': len(reg_dates) * num_anchors * robust_iters,
+        'weighted_rows': int(support_sizes.sum()) * num_anchors * robust_iters,
+        'base_weights_mb': num_anchors * len(dt_idx) * 8 / 1e6
+    }
+
+    return fit_cost
+
+def calc_pilot_reg_date_preds(x, y, dt_idx, reg_dates, threshold_value=52, threshold_units='W', x_quantiles=[0.1, 0.5, 0.9]):
+    """Fits a cheap date-weighted linear pilot model at each regression date and evaluates it across the range of `x`"""
+    x_eval = np.quantile(x, x_quantiles)
+    pilot_preds = []
+
+    for dt_weights in construct_dt_weights(dt_idx, reg_dates, threshold_value=threshold_value, threshold_units=threshold_units).values():
+        weight_support = get_weight_support(dt_weights)
+        betas = calc_lin_reg_betas(x[weight_support], y[weight_support], weights=dt_weights[weight_support])
+        pilot_preds += [betas[0] + betas[1]*x_eval]
+
+    pilot_preds = np.array(pilot_preds)
+
+    return pilot_preds
+
+def plan_reg_dates(dt_idx, threshold_value=52, threshold_units='W', spacing_frac=0.5, min_support=100,
+                   x=None, y=None, refine_tol=None, min_spacing_frac=0.125, max_refine_iters=3):
+    """
+    Plans the regression dates for a `SmoothDates` or `LowessDates` fit. The dates are evenly
+    spaced at a `spacing_frac` of the date smoothing threshold across the data, then any whose
+    date kernel contains fewer than `min_support` data-points are dropped so that no models are
+    fitted over gaps in the data. If `x`, `y` and a `refine_tol` are provided the spacing is then
+    refined where a cheap linear pilot model changes by more than `refine_tol` standard deviations
+    of `y` between neighbouring dates, down to a `min_spacing_frac` of the threshold.
+
+    Parameters:
+        dt_idx: Datetime index of the data
+        threshold_value: Number of datetime units to use in each regression
+        threshold_units: Datetime unit which should be compatible with pandas `date_range` function
+        spacing_frac: Spacing of the regression dates as a fraction of the date smoothing threshold
+        min_support: Minimum number of data-points within the date kernel of each regression date
+        x: Values for the independent variable, used for the refinement
+        y: Values for the dependent variable, used for the refinement
+        refine_tol: Change in the pilot predictions (in standard deviations of `y`) above which the spacing is refined
+        min_spacing_frac: Minimum spacing of the refined regression dates as a fraction of the date smoothing threshold
+        max_refine_iters: Maximum number of times the spacing can be halved
+
+    Returns:
+        reg_dates: Dates at which the local time-adaptive models will be centered around
+    """
+    local_dts = pd.DatetimeIndex(dt_idx)
+
+    if local_dts.tz is not None:
+        local_dts = local_dts.tz_localize(None)
+
+    threshold = pd.Timedelta(value=threshold_value, unit=threshold_units)
+    start_date, end_date = local_dts.min().normalize(), local_dts.max().normalize()
+
+    # Evenly spacing the dates across the data, rounded to whole days
+    num_reg_dates = int(np.ceil((end_date - start_date)/(spacing_frac*threshold))) + 1
+    reg_dates = pd.DatetimeIndex(np.linspace(start_date.value, end_date.value, num_reg_dates)).round('D').unique()
+
+    # Dropping dates without enough data
+    start_idxs, end_idxs = get_reg_date_supports(local_dts, reg_dates, threshold_value=threshold_value, threshold_units=threshold_units)
+    support_sizes = end_idxs - start_idxs
+    reg_dates = reg_dates[support_sizes >= min(min_support, support_sizes.max())]
+
+    if refine_tol is None or x is None or y is None:
+        return reg_dates
+
+    # Refining the spacing where the pilot model changes quickly
+    x, y = np.asarray(x), np.asarray(y)
+    min_spacing = min_spacing_frac*threshold
+    y_scale = np.std(y)
+
+    for _ in range(max_refine_iters):
+        pilot_preds = calc_pilot_reg_date_preds(x, y, dt_idx, reg_dates, threshold_value=threshold_value, threshold_units=threshold_units)
+        pilot_changes = np.abs(np.diff(pilot_preds, axis=0)).max(axis=1)/y_scale
+
+        refine_mask = (pilot_changes > refine_tol) & (np.diff(reg_dates) >= 2*min_spacing)
+
+        if refine_mask.sum() == 0:
+            break
+
+        mid_dates = (reg_dates[:-1][refine_mask] + (reg_dates[1:][refine_mask] - reg_dates[:-1][refine_mask])/2).round('D')
+        reg_dates = reg_dates.union(mid_dates)
+
+    return reg_dates
+
+max_fallback_reg_dates = 1000
+
+def process_smooth_dates_fit_inputs(x, y, dt_idx, reg_dates, threshold_value=52, threshold_units='W', num_fits=None, robust_iters=3):
+    """
+    Sanitises the inputs to the SmoothDates fitting method, when the regression dates are
+    planned (`reg_dates='auto'`) they're logged alongside the estimated fit cost before fitting
+    """
     if hasattr(x, 'index') and hasattr(y, 'index'):
         assert x.index.equals(y.index), 'If `x` and `y` have indexes then they must be the same'
         if dt_idx is None:
@@ -553,7 +1250,20 @@ def process_smooth_dates_fit_inputs(x, y, dt_idx, reg_dates):
 
     assert dt_idx is not None, '`dt_idx` must either be passed directly or `x` and `y` must include indexes'
 
+    if isinstance(reg_dates, str) and reg_dates == 'auto':
+        reg_dates = plan_reg_dates(dt_idx, threshold_value=threshold_value, threshold_units=threshold_units)
+        fit_cost = estimate_fit_cost(dt_idx, reg_dates, threshold_value=threshold_value, threshold_units=threshold_units, num_fits=num_fits, robust_iters=robust_iters)
+
+        logger = logging.getLogger('moepy.lowess')
+        logger.info(f"Planned {len(reg_dates)} regression dates from {reg_dates.min()} to {reg_dates.max()}, the fit is estimated at "
+                    f"{fit_cost['num_regressions']} regressions over {fit_cost['weighted_rows']:.2e} weighted rows ({fit_cost['base_weights_mb']:.1f} MB of base weights)")
+
     if reg_dates is None:
+        if len(dt_idx) > max_fallback_reg_dates:
+            fit_cost = estimate_fit_cost(dt_idx, dt_idx, threshold_value=threshold_value, threshold_units=threshold_units)
+            warn(f"`reg_dates` was not provided so a model will be fitted at each of the {len(dt_idx)} data-points "
+                 f"({fit_cost['weighted_rows']:.2e} weighted rows), pass `reg_dates='auto'` to have them planned from the date smoothing threshold")
+
         reg_dates = dt_idx
 
     return x, y, dt_idx, reg_dates
@@ -579,8 +1289,6 @@ class SmoothDates(BaseEstimator, RegressorMixin):
         ensemble_member_to_weights: Mapping from the regression dates to their respective weightings for each data-point
         ensemble_member_to_models: Mapping from the regression dates to their localised models
         reg_dates: Dates at which the local time-adaptive models will be centered around
-        pred_weights: Weightings to map from the local models to the values to be inferenced
-        pred_values: Raw prediction values as generated by each of the individual local models
     """
 
     def __init__(self, frac=0.3, threshold_value=52, threshold_units='W'):
@@ -590,7 +1298,8 @@ class SmoothDates(BaseEstimator, RegressorMixin):
         self.threshold_units = threshold_units
 
 
-    def fit(self, x, y, dt_idx=None, reg_dates=None, lowess_kwargs={}, **fit_kwargs):
+    @profiled()
+    def fit(self, x, y, dt_idx=None, reg_dates=None, lowess_kwargs={}, fit_weights=None, **fit_kwargs):
         """
         Calculation of the local regression coefficients for each of the
         LOWESS models across the dataset provided. This is a time-adaptive
@@ -600,13 +1309,16 @@ class SmoothDates(BaseEstimator, RegressorMixin):
             x: Values for the independent variable
             y: Values for the dependent variable
             dt_idx: Datetime index, if not provided the index of the x and y series will be used
-            reg_dates: Dates at which the local time-adaptive models will be centered around
+            reg_dates: Dates at which the local time-adaptive models will be centered around, or `'auto'` to plan them with `plan_reg_dates`
             lowess_kwargs: Additional arguments to be passed at model initialisation
+            fit_weights: Precomputed weightings from `construct_shared_fit_weights`, calculated if not provided
             reg_anchors: Locations at which to center the local regressions
             num_fits: Number of locations at which to carry out a local regression
             external_weights: Further weighting for the specific regression
             robust_weights: Robustifying weights to remove the influence of outliers
             robust_iters: Number of robustifying iterations to carry out
+            anchor_method: Placement of the `num_fits` regression anchors, one of 'uniform', 'quantile' or 'curvature'
+            distributed: Keyword arguments for `distributed.run_distributed_tasks`, when provided the ensemble members are fitted by worker processes
         """
 
         for attr_name in ['threshold_value', 'threshold_units', 'frac']:
@@ -614,12 +1326,20 @@ class SmoothDates(BaseEstimator, RegressorMixin):
                 attr_value = fit_kwargs.pop(attr_name)
                 setattr(self, attr_name, attr_value)
 
-        x, y, dt_idx, reg_dates = process_smooth_dates_fit_inputs(x, y, dt_idx, reg_dates)
-        self.ensemble_member_to_weights = construct_dt_weights(dt_idx, reg_dates,
-                                                               threshold_value=self.threshold_value,
-                                                               threshold_units=self.threshold_units)
+        x, y, dt_idx, reg_dates = process_smooth_dates_fit_inputs(x, y, dt_idx, reg_dates, threshold_value=self.threshold_value, threshold_units=self.threshold_units,
+                                                                  num_fits=fit_kwargs.get('num_fits'), robust_iters=fit_kwargs.get('robust_iters', 3))
 
-        self.ensemble_member_to_models = fit_external_weighted_ensemble(x, y, self.ensemble_member_to_weights, lowess_kwargs=lowess_kwargs, frac=self.frac, **fit_kwargs)
+        if fit_weights is None:
+            fit_weights = construct_shared_fit_weights(x, dt_idx, reg_dates, frac=self.frac,
+                                                       threshold_value=self.threshold_value,
+                                                       threshold_units=self.threshold_units,
+                                                       reg_anchors=fit_kwargs.get('reg_anchors'),
+                                                       num_fits=fit_kwargs.get('num_fits'),
+                                                       anchor_method=fit_kwargs.get('anchor_method', 'uniform'),
+                                                       y=y)
+
+        self.ensemble_member_to_weights = fit_weights['ensemble_member_to_weights']
+        self.ensemble_member_to_models = fit_external_weighted_ensemble(x, y, self.ensemble_member_to_weights, lowess_kwargs=lowess_kwargs, base_weights=fit_weights['base_weights'], frac=self.frac, **fit_kwargs)
 
         self.reg_dates = reg_dates
         self.fitted = True
@@ -627,9 +1347,11 @@ class SmoothDates(BaseEstimator, RegressorMixin):
         return
 
 
+    @profiled()
     def predict(self, x_pred=np.linspace(8, 60, 53), dt_pred=None, return_df=True):
         """
-        Inference using the design matrix from the time-adaptive LOWESS fits
+        Inference using the design matrix from the time-adaptive LOWESS fits,
+        the model isn't modified so it can be predicted from concurrently
 
         Parameters:
             x_pred: Independent variable locations for the time-adaptive LOWESS inference
@@ -646,16 +1368,7 @@ class SmoothDates(BaseEstimator, RegressorMixin):
         if isinstance(x_pred, pd.Series):
             x_pred = x_pred.values
 
-        self.ensemble_member_to_preds = get_ensemble_preds(self.ensemble_member_to_models, x_pred=x_pred)
-
-        self.pred_weights = np.array(list(construct_dt_weights(dt_pred, self.reg_dates).values()))
-
-        with np.errstate(divide='ignore', invalid='ignore'):
-            self.pred_weights = self.pred_weights/self.pred_weights.sum(axis=0)
-
-        self.pred_values = np.array(list(self.ensemble_member_to_preds.values()))
-
-        y_pred = np.dot(self.pred_weights.T, self.pred_values)
+        y_pred = calc_smooth_dates_surface(self.ensemble_member_to_models, self.reg_dates, x_pred, dt_pred)
 
         if return_df == True:
             df_pred = pd.DataFrame(y_pred, index=dt_pred, columns=x_pred).T
@@ -664,6 +1377,7 @@ class SmoothDates(BaseEstimator, RegressorMixin):
             return y_pred
 
 # Cell
+@profiled()
 def construct_pred_ts(s, df_pred, rounding_dec=1):
     """Uses the time-adaptive LOWESS surface to generate time-series prediction"""
     vals = []
@@ -694,10 +1408,6 @@ class LowessDates(BaseEstimator, RegressorMixin):
         ensemble_member_to_weights: Mapping from the regression dates to their respective weightings for each data-point
         ensemble_member_to_models: Mapping from the regression dates to their localised models
         reg_dates: Dates at which the local time-adaptive models will be centered around
-        ensemble_member_to_preds: Mapping from the regression dates to their predictions
-        reg_weights: Mapping from the prediction values to the weighting of each time-adaptive model
-        reg_values: Predictions from each regression
-        df_reg: A DataFrame of the time-adaptive surfce regression
     """
 
     def __init__(self, frac=0.3, threshold_value=52, threshold_units='W', pred_reg_dates=None):
@@ -708,7 +1418,8 @@ class LowessDates(BaseEstimator, RegressorMixin):
         self.pred_reg_dates = pred_reg_dates
 
 
-    def fit(self, x, y, dt_idx=None, reg_dates=None, lowess_kwargs={}, **fit_kwargs):
+    @profiled()
+    def fit(self, x, y, dt_idx=None, reg_dates=None, lowess_kwargs={}, fit_weights=None, **fit_kwargs):
         """
         Calculation of the local regression coefficients for each of the
         LOWESS models across the dataset provided. This is a time-adaptive
@@ -718,13 +1429,16 @@ class LowessDates(BaseEstimator, RegressorMixin):
             x: Values for the independent variable
             y: Values for the dependent variable
             dt_idx: Datetime index, if not provided the index of the x and y series will be used
-            reg_dates: Dates at which the local time-adaptive models will be centered around
+            reg_dates: Dates at which the local time-adaptive models will be centered around, or `'auto'` to plan them with `plan_reg_dates`
             lowess_kwargs: Additional arguments to be passed at model initialisation
+            fit_weights: Precomputed weightings from `construct_shared_fit_weights`, calculated if not provided
             reg_anchors: Locations at which to center the local regressions
             num_fits: Number of locations at which to carry out a local regression
             external_weights: Further weighting for the specific regression
             robust_weights: Robustifying weights to remove the influence of outliers
             robust_iters: Number of robustifying iterations to carry out
+            anchor_method: Placement of the `num_fits` regression anchors, one of 'uniform', 'quantile' or 'curvature'
+            distributed: Keyword arguments for `distributed.run_distributed_tasks`, when provided the ensemble members are fitted by worker processes
         """
 
         for attr_name in ['threshold_value', 'threshold_units', 'frac']:
@@ -732,12 +1446,20 @@ class LowessDates(BaseEstimator, RegressorMixin):
                 attr_value = fit_kwargs.pop(attr_name)
                 setattr(self, attr_name, attr_value)
 
-        x, y, dt_idx, reg_dates = process_smooth_dates_fit_inputs(x, y, dt_idx, reg_dates)
-        self.ensemble_member_to_weights = construct_dt_weights(dt_idx, reg_dates,
-                                                               threshold_value=self.threshold_value,
-                                                               threshold_units=self.threshold_units)
+        x, y, dt_idx, reg_dates = process_smooth_dates_fit_inputs(x, y, dt_idx, reg_dates, threshold_value=self.threshold_value, threshold_units=self.threshold_units,
+                                                                  num_fits=fit_kwargs.get('num_fits'), robust_iters=fit_kwargs.get('robust_iters', 3))
 
-        self.ensemble_member_to_models = fit_external_weighted_ensemble(x, y, self.ensemble_member_to_weights, lowess_kwargs=lowess_kwargs, frac=self.frac, **fit_kwargs)
+        if fit_weights is None:
+            fit_weights = construct_shared_fit_weights(x, dt_idx, reg_dates, frac=self.frac,
+                                                       threshold_value=self.threshold_value,
+                                                       threshold_units=self.threshold_units,
+                                                       reg_anchors=fit_kwargs.get('reg_anchors'),
+                                                       num_fits=fit_kwargs.get('num_fits'),
+                                                       anchor_method=fit_kwargs.get('anchor_method', 'uniform'),
+                                                       y=y)
+
+        self.ensemble_member_to_weights = fit_weights['ensemble_member_to_weights']
+        self.ensemble_member_to_models = fit_external_weighted_ensemble(x, y, self.ensemble_member_to_weights, lowess_kwargs=lowess_kwargs, base_weights=fit_weights['base_weights'], frac=self.frac, **fit_kwargs)
 
         self.reg_dates = reg_dates
         self.fitted = True
@@ -745,6 +1467,7 @@ class LowessDates(BaseEstimator, RegressorMixin):
         return
 
 
+    @profiled()
     def predict(self, x_pred, reg_x=None, reg_dates=None, return_df=True, rounding_dec=1):
         """
         Inference using the design matrix from the time-adaptive LOWESS fits
@@ -766,16 +1489,10 @@ class LowessDates(BaseEstimator, RegressorMixin):
             reg_x = reg_x.values
 
         # Fitting the smoothed regression
-        self.ensemble_member_to_preds = get_ensemble_preds(self.ensemble_member_to_models, x_pred=reg_x)
-
-        self.reg_weights = np.array(list(construct_dt_weights(reg_dates, self.reg_dates).values()))
-        self.reg_weights = self.reg_weights/self.reg_weights.sum(axis=0)
-        self.reg_values = np.array(list(self.ensemble_member_to_preds.values()))
-
-        y_reg = np.dot(self.reg_weights.T, self.reg_values)
-        self.df_reg = pd.DataFrame(y_reg, index=reg_dates.strftime('%Y-%m-%d'), columns=reg_x).T
+        y_reg = calc_smooth_dates_surface(self.ensemble_member_to_models, self.reg_dates, reg_x, reg_dates)
+        df_reg = pd.DataFrame(y_reg, index=reg_dates.strftime('%Y-%m-%d'), columns=reg_x).T
 
         # Making the prediction
-        s_pred_ts = construct_pred_ts(x_pred, self.df_reg, rounding_dec=rounding_dec)
+        s_pred_ts = construct_pred_ts(x_pred, df_reg, rounding_dec=rounding_dec)
 
         return s_pred_ts
\ No newline at end of file
@@ -1,7 +1,15 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-05-price-moe.ipynb (unless otherwise specified).
 
-__all__ = ['construct_dispatchable_lims_df', 'construct_pred_mask_df', 'AxTransformer', 'set_ticks', 'set_date_ticks',
-           'construct_df_pred', 'construct_pred_ts', 'calc_error_metrics', 'get_model_pred_ts', 'weighted_mean_s']
+__all__ = ['construct_dispatchable_lims_df', 'construct_pred_mask', 'construct_pred_mask_df', 'AxTransformer',
+           'set_ticks', 'set_date_ticks', 'construct_df_pred', 'df_pred_cache', 'max_df_pred_cache_size',
+           'get_cached_df_pred', 'construct_pred_ts', 'get_local_dates', 'get_surface_idxs', 'gather_surface_preds',
+           'calc_error_metrics', 'construct_multi_pred_ts', 'clean_pred_ts_inputs', 'get_model_multi_pred_ts',
+           'get_model_pred_ts', 'calc_surface_cells', 'calc_surface_date_means', 'calc_weighted_pred_intvl',
+           'calc_window_sums', 'weighted_mean_s', 'stream_surface', 'stream_multi_pred_ts', 'stream_moe',
+           'summarise_moe_aggs', 'stream_moe_aggregates', 'run_moe_pipeline', 'construct_scenario_state',
+           'scenario_worker_state', 'init_scenario_worker', 'evaluate_scenario', 'evaluate_scenarios',
+           'calc_scenario_savings', 'run_scenarios', 'predict_model_surface', 'predict_model_surfaces',
+           'get_position_lookup', 'dt_to_local_day', 'dts_to_local_days', 'SurfaceQueryService', 'SurfaceQueryHandler']
 
 # Cell
 import json
@@ -9,21 +17,16 @@ import pandas as pd
 import numpy as np
 
 import pickle
-import scipy
-from sklearn import linear_model
-from sklearn.metrics import r2_score
+import datetime
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from collections.abc import Iterable
 
-import seaborn as sns
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-
-from ipypb import track
-from IPython.display import JSON
-
 from moepy import lowess, eda
 from .surface import PicklableFunction
+from .profiling import profiled
 
 # Cell
 def construct_dispatchable_lims_df(s_dispatchable, rolling_w=3, daily_quantiles=[0.001, 0.999]):
@@ -39,18 +42,25 @@ def construct_dispatchable_lims_df(s_dispatchable, rolling_w=3, daily_quantiles=
                             .iloc[:-1, :]
                            )
 
-    df_dispatchable_lims.index = pd.to_datetime(df_dispatchable_lims.index.strftime('%Y-%m-%d'))
+    if df_dispatchable_lims.index.tz is not None:
+        df_dispatchable_lims.index = df_dispatchable_lims.index.tz_localize(None)
 
     return df_dispatchable_lims
 
+@profiled()
+def construct_pred_mask(x_pred, df_dispatchable_lims):
+    """Broadcasts the x-grid against the daily limits to construct a (len(x_pred), num_days) boolean mask"""
+    x_pred = np.asarray(x_pred).reshape(-1, 1)
+    lower_lims, upper_lims = df_dispatchable_lims.values[:, 0], df_dispatchable_lims.values[:, 1]
+
+    pred_mask = (x_pred > lower_lims) & (x_pred < upper_lims)
+
+    return pred_mask
+
 def construct_pred_mask_df(df_pred, df_dispatchable_lims):
     """Constructs a DataFrame mask for the prediction"""
-    df_pred = df_pred[df_dispatchable_lims.index]
-    df_pred_mask = pd.DataFrame(dict(zip(df_pred.columns, [df_pred.index]*df_pred.shape[1])), index=df_pred.index)
-    df_pred_mask = (df_pred_mask > df_dispatchable_lims.iloc[:, 0].values) & (df_pred_mask < df_dispatchable_lims.iloc[:, 1].values)
-
-    df_pred.columns = pd.to_datetime(df_pred.columns)
-    df_pred_mask.columns = pd.to_datetime(df_pred_mask.columns)
+    pred_mask = construct_pred_mask(df_pred.index.values, df_dispatchable_lims)
+    df_pred_mask = pd.DataFrame(pred_mask, index=df_pred.index, columns=df_dispatchable_lims.index)
 
     return df_pred_mask
 
@@ -58,6 +68,8 @@ def construct_pred_mask_df(df_pred, df_dispatchable_lims):
 class AxTransformer:
     """Helper class for cleaning axis tick locations and labels"""
     def __init__(self, datetime_vals=False):
+        from sklearn import linear_model
+
         self.datetime_vals = datetime_vals
         self.lr = linear_model.LinearRegression()
 
@@ -119,6 +131,7 @@ def set_date_ticks(ax, start_date, end_date, axis='y', date_format='%Y-%m-%d', *
     return ax
 
 # Cell
+@profiled()
 def construct_df_pred(model_fp, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D')):
     """Constructs the prediction surface for the specified pre-fitted model"""
     smooth_dates = pickle.load(open(model_fp, 'rb'))
@@ -127,9 +140,36 @@ def construct_df_pred(model_fp, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date
 
     return df_pred
 
+df_pred_cache = dict()
+max_df_pred_cache_size = 4
+
+@profiled()
+def get_cached_df_pred(model_fp, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D')):
+    """
+    Constructs the prediction surface for the specified pre-fitted model, reusing it if it has
+    already been constructed. Only the `max_df_pred_cache_size` most recently used surfaces are kept.
+    """
+    x_pred = np.asarray(x_pred)
+    dt_pred = pd.DatetimeIndex(dt_pred)
+    cache_key = (model_fp, x_pred.tobytes(), dt_pred.asi8.tobytes())
+
+    df_pred = df_pred_cache.pop(cache_key, None) # popped and re-added so that the least recently used surface is evicted
+
+    if df_pred is None:
+        df_pred = construct_df_pred(model_fp, x_pred=x_pred, dt_pred=dt_pred)
+
+    df_pred_cache[cache_key] = df_pred
+
+    for evicted_key in list(df_pred_cache.keys())[:-max_df_pred_cache_size]:
+        df_pred_cache.pop(evicted_key, None)
+
+    return df_pred
+
 # Cell
 def construct_pred_ts(s, df_pred):
     """Uses the time-adaptive LOWESS surface to generate time-series prediction"""
+    from ipypb import track
+
     s_pred_ts = pd.Series(index=s.index, dtype='float64')
 
     for dt_idx, val in track(s.iteritems(), total=s.size):
@@ -137,6 +177,31 @@ def construct_pred_ts(s, df_pred):
 
     return s_pred_ts
 
+# Cell
+def get_local_dates(dt_idx):
+    """Converts a (potentially localised) datetime index into its naive local dates"""
+    if dt_idx.tz is not None:
+        dt_idx = dt_idx.tz_localize(None)
+
+    local_dates = dt_idx.normalize()
+
+    return local_dates
+
+def get_surface_idxs(s, df_pred, rounding_dec=1):
+    """Identifies the surface row and column positions for each value in the time-series, -1 is returned where they're missing"""
+    row_idxs = df_pred.index.get_indexer(np.round(s.values, rounding_dec))
+    col_idxs = pd.DatetimeIndex(df_pred.columns).get_indexer(get_local_dates(s.index))
+
+    return row_idxs, col_idxs
+
+def gather_surface_preds(surface_values, row_idxs, col_idxs):
+    """Vectorised lookup of the surface values, positions that are missing from the surface are returned as nan"""
+    preds = np.full(row_idxs.shape, np.nan)
+    is_valid = (row_idxs >= 0) & (col_idxs >= 0)
+    preds[is_valid] = surface_values[row_idxs[is_valid], col_idxs[is_valid]]
+
+    return preds
+
 # Cell
 def calc_error_metrics(s_err, max_err_quantile=1):
     """Calculates several error metrics using the passed error series"""
@@ -155,35 +220,810 @@ def calc_error_metrics(s_err, max_err_quantile=1):
     return metrics
 
 # Cell
+@profiled()
+def construct_multi_pred_ts(series, df_pred, rounding_dec=1):
+    """
+    Uses the time-adaptive LOWESS surface to generate the time-series predictions for any
+    number of input series (e.g. dispatchable, demand and counterfactual scenarios), the
+    surface coordinates of every series are looked up together in a single vectorised gather.
+
+    When the series share an index the predictions are combined by position, so duplicated
+    timestamps (e.g. local times repeated at the DST fall-back) are kept as they are. Series
+    with differing indexes are aligned on their timestamps, which must then be unique.
+    """
+    if not isinstance(series, dict):
+        series = {s.name if s.name is not None else i: s for i, s in enumerate(series)}
+
+    series_idxs = [get_surface_idxs(s, df_pred, rounding_dec=rounding_dec) for s in series.values()]
+
+    row_idxs = np.concatenate([row_idxs for row_idxs, _ in series_idxs])
+    col_idxs = np.concatenate([col_idxs for _, col_idxs in series_idxs])
+    preds = gather_surface_preds(df_pred.values, row_idxs, col_idxs)
+
+    split_idxs = np.cumsum([s.size for s in series.values()])[:-1]
+    name_to_preds = dict(zip(series.keys(), np.split(preds, split_idxs)))
+    indexes = [s.index for s in series.values()]
+
+    if all([index.equals(indexes[0]) for index in indexes[1:]]):
+        df_pred_ts = pd.DataFrame(name_to_preds, index=indexes[0])
+    else:
+        assert all([index.is_unique for index in indexes]), 'Series with differing indexes are aligned on their timestamps, so none of them can contain duplicates'
+        df_pred_ts = pd.DataFrame({name: pd.Series(name_to_preds[name], index=s.index) for name, s in series.items()})
+
+    return df_pred_ts
+
+def clean_pred_ts_inputs(s, df_pred):
+    """Removes missing values and any dates that aren't covered by the prediction surface"""
+    s = s.dropna()
+
+    local_dates = get_local_dates(s.index)
+    dt_pred = pd.DatetimeIndex(df_pred.columns)
+    s = s[(local_dates >= dt_pred.min()) & (local_dates <= dt_pred.max())]
+
+    return s
+
+@profiled()
+def get_model_multi_pred_ts(series, model_fp, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), rounding_dec=1):
+    """Constructs the time-series predictions of several input series for the specified pre-fitted model in one pass"""
+    df_pred = construct_df_pred(model_fp, x_pred=x_pred, dt_pred=dt_pred)
+
+    if not isinstance(series, dict):
+        series = {s.name if s.name is not None else i: s for i, s in enumerate(series)}
+
+    series = {name: clean_pred_ts_inputs(s, df_pred) for name, s in series.items()}
+    df_pred_ts = construct_multi_pred_ts(series, df_pred, rounding_dec=rounding_dec)
+
+    return df_pred_ts
+
 def get_model_pred_ts(s, model_fp, s_demand=None, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D')):
     """Constructs the time-series prediction for the specified pre-fitted model"""
-    df_pred = construct_df_pred(model_fp, x_pred=x_pred, dt_pred=dt_pred)
-    s_cleaned = s.dropna().loc[df_pred.columns.min():df_pred.columns.max()+pd.Timedelta(hours=23, minutes=30)]
-    s_pred_ts = construct_pred_ts(s_cleaned, df_pred)
+    series = {'dispatchable': s}
+
+    if s_demand is not None:
+        series['demand'] = s_demand
+
+    df_pred_ts = get_model_multi_pred_ts(series, model_fp, x_pred=x_pred, dt_pred=dt_pred)
+    s_pred_ts = df_pred_ts['dispatchable'].dropna()
 
     if s_demand is None:
         return s_pred_ts
     else:
-        s_cleaned = s_demand.dropna().loc[df_pred.columns.min():df_pred.columns.max()+pd.Timedelta(hours=23, minutes=30)]
-        s_pred_ts_demand = construct_pred_ts(s_cleaned, df_pred)
+        s_pred_ts_demand = df_pred_ts['demand'].dropna()
         return s_pred_ts, s_pred_ts_demand
 
 # Cell
+@profiled()
+def calc_surface_cells(model, x_cells, dt_cells, x_pred=np.linspace(3, 61, 581), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), rounding_dec=1, max_cells_per_chunk=100_000):
+    """
+    Evaluates the surface of a pre-fitted model at specific (x, date) cells only, the cached
+    surface is used if it has already been constructed. Otherwise only the ensemble member
+    predictions at the unique x values of the cells are calculated rather than the full surface.
+    """
+    if isinstance(model, str):
+        cache_key = (model, np.asarray(x_pred).tobytes(), pd.DatetimeIndex(dt_pred).asi8.tobytes())
+
+        if cache_key in df_pred_cache:
+            df_pred = df_pred_cache[cache_key]
+            row_idxs = df_pred.index.get_indexer(np.round(x_cells, rounding_dec))
+            col_idxs = pd.DatetimeIndex(df_pred.columns).get_indexer(dt_cells)
+
+            return gather_surface_preds(df_pred.values, row_idxs, col_idxs)
+
+        model = pickle.load(open(model, 'rb'))
+
+    # The LOWESS blending depends on the full x grid, so the members are evaluated on it before the cells are selected
+    x_idxs = pd.Index(np.round(x_pred, rounding_dec)).get_indexer(np.round(x_cells, rounding_dec))
+    unique_dts, dt_idxs = np.unique(pd.DatetimeIndex(dt_cells).asi8, return_inverse=True)
+
+    member_preds = np.array(list(lowess.get_ensemble_preds(model.ensemble_member_to_models, x_pred=np.asarray(x_pred)).values()))
+    dt_weights = lowess.get_pred_dt_weights(pd.to_datetime(unique_dts), model.reg_dates)
+
+    # Chunking the cells to bound the (members, cells) intermediates
+    cell_preds = np.empty(len(x_idxs))
+
+    for i in range(0, len(x_idxs), max_cells_per_chunk):
+        chunk = slice(i, i+max_cells_per_chunk)
+        cell_preds[chunk] = np.einsum('ij,ij->j', dt_weights[:, dt_idxs[chunk]], member_preds[:, x_idxs[chunk]])
+
+    return cell_preds
+
+@profiled()
+def calc_surface_date_means(model, x_values, x_pred=np.linspace(3, 61, 581), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), rounding_dec=1):
+    """
+    Calculates the surface value at each x averaged over all of the prediction dates. As the
+    surface is linear in the date weightings only the mean weighting of each ensemble member
+    is needed, unless the cached surface has already been constructed.
+    """
+    if isinstance(model, str):
+        cache_key = (model, np.asarray(x_pred).tobytes(), pd.DatetimeIndex(dt_pred).asi8.tobytes())
+
+        if cache_key in df_pred_cache:
+            df_pred = df_pred_cache[cache_key]
+            return df_pred.loc[np.round(x_values, rounding_dec)].mean(axis=1).values
+
+        model = pickle.load(open(model, 'rb'))
+
+    x_idxs = pd.Index(np.round(x_pred, rounding_dec)).get_indexer(np.round(x_values, rounding_dec))
+    member_preds = np.array(list(lowess.get_ensemble_preds(model.ensemble_member_to_models, x_pred=np.asarray(x_pred)).values()))[:, x_idxs]
+    dt_weights = lowess.get_pred_dt_weights(pd.DatetimeIndex(dt_pred), model.reg_dates)
+
+    # Dates without any ensemble weighting are nan across all members, these are skipped like in `DataFrame.mean`
+    mean_dt_weights = dt_weights[:, ~np.isnan(dt_weights).any(axis=0)].mean(axis=1)
+    date_means = np.dot(mean_dt_weights, member_preds)
+
+    return date_means
+
+@profiled()
+def calc_weighted_pred_intvl(s_dispatchable, low_q_model, high_q_model, x_pred=np.linspace(3, 61, 581),
+                             dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), support='x', rounding_dec=1):
+    """
+    Calculates the average width of the prediction interval between a low and high quantile
+    model, weighted by how often each part of the surface actually occurs in the data
+
+    Parameters:
+        s_dispatchable: Dispatchable generation time-series used to weight the surface
+        low_q_model: Filepath of (or the fitted) low quantile model
+        high_q_model: Filepath of (or the fitted) high quantile model
+        x_pred: Independent variable locations of the surface
+        dt_pred: Date locations of the surface
+        support: 'x' weights each x value's interval averaged over all dates, 'cells' weights each observed (x, date) cell
+        rounding_dec: Decimal places the x values are rounded to
+
+    Returns:
+        pred_intvl: Weighted average width of the prediction interval
+    """
+    assert support in ['x', 'cells'], '`support` must be one of `x` or `cells`'
+
+    s_dispatchable = s_dispatchable.dropna()
+    x_grid = np.round(x_pred, rounding_dec)
+    dt_pred = pd.DatetimeIndex(dt_pred)
+
+    if support == 'x':
+        s_x_weights = s_dispatchable.round(rounding_dec).value_counts()
+        s_x_weights = s_x_weights[s_x_weights.index.isin(x_grid)].sort_index()
+
+        x_values = s_x_weights.index.values
+        intvl_widths = (calc_surface_date_means(high_q_model, x_values, x_pred=x_pred, dt_pred=dt_pred, rounding_dec=rounding_dec)
+                        - calc_surface_date_means(low_q_model, x_values, x_pred=x_pred, dt_pred=dt_pred, rounding_dec=rounding_dec))
+
+        pred_intvl = np.average(intvl_widths, weights=s_x_weights.values)
+
+    else:
+        df_cells = pd.DataFrame({'x': np.round(s_dispatchable.values, rounding_dec), 'dt': get_local_dates(s_dispatchable.index)})
+        df_cells = df_cells[df_cells['x'].isin(x_grid) & df_cells['dt'].isin(dt_pred)]
+        s_cell_weights = df_cells.value_counts()
+
+        x_cells = s_cell_weights.index.get_level_values('x').values
+        dt_cells = s_cell_weights.index.get_level_values('dt').values
+
+        intvl_widths = (calc_surface_cells(high_q_model, x_cells, dt_cells, x_pred=x_pred, dt_pred=dt_pred, rounding_dec=rounding_dec)
+                        - calc_surface_cells(low_q_model, x_cells, dt_cells, x_pred=x_pred, dt_pred=dt_pred, rounding_dec=rounding_dec))
+
+        is_valid = ~np.isnan(intvl_widths)
+        pred_intvl = np.average(intvl_widths[is_valid], weights=s_cell_weights.values[is_valid])
+
+    return pred_intvl
+
+# Cell
+def calc_window_sums(cumsums, start_idxs, end_idxs):
+    """Calculates the sum within each window from the prefix sums, where `cumsums` has a leading row of zeros"""
+    window_sums = cumsums[end_idxs] - cumsums[start_idxs]
+
+    return window_sums
+
+@profiled()
 def weighted_mean_s(s, s_weight=None, dt_rng=pd.date_range('2009-12-01', '2021-01-01', freq='W'), end_dt_delta_days=7):
-    """Calculates the weighted average of a series"""
-    capture_prices = dict()
+    """
+    Calculates the weighted average of a series within each window starting at the dates in `dt_rng`
+
+    Prefix sums of w*s and w are calculated once, the windows (which can be overlapping and have
+    any length) are then located with two `searchsorted` calls. If `s_weight` is a DataFrame the
+    weighted average is returned for each of its columns, e.g. wind, solar and demand in one pass.
+    """
+    if not s.index.is_monotonic_increasing:
+        s = s.sort_index()
+
+    # Locating the (inclusive) windows
+    start_dts = pd.DatetimeIndex(dt_rng)
+    end_dts = start_dts + pd.to_timedelta(end_dt_delta_days, unit='D')
+
+    # The window ends are added to the naive dates so that they're wall-clock days across DST changes
+    if s.index.tz is not None and start_dts.tz is None:
+        start_dts = start_dts.tz_localize(s.index.tz)
+        end_dts = end_dts.tz_localize(s.index.tz)
+
+    start_idxs = s.index.searchsorted(start_dts, side='left')
+    end_idxs = s.index.searchsorted(end_dts, side='right')
+
+    # Aligning the weights
+    if s_weight is None:
+        df_weights = pd.DataFrame({None: np.ones(s.size)}, index=s.index)
+    elif isinstance(s_weight, pd.Series):
+        df_weights = s_weight.reindex(s.index).to_frame()
+    else:
+        df_weights = s_weight.reindex(s.index)
+
+    values = s.values.astype(float).reshape(-1, 1)
+    weights = df_weights.values.astype(float)
+
+    # Any missing values will return a nan for the windows they fall in, as `np.average` does
+    is_nan = np.isnan(values) | np.isnan(weights)
+    weights = np.where(is_nan, 0, weights)
+    weighted_values = np.where(is_nan, 0, weights*values)
+
+    prepend_zeros = lambda arr: np.vstack([np.zeros((1, arr.shape[1])), np.cumsum(arr, axis=0)])
+
+    window_nan_counts = calc_window_sums(prepend_zeros(is_nan.astype(int)), start_idxs, end_idxs)
+    window_weights = calc_window_sums(prepend_zeros(weights), start_idxs, end_idxs)
+    window_weighted_values = calc_window_sums(prepend_zeros(weighted_values), start_idxs, end_idxs)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        capture_prices = window_weighted_values/window_weights
+
+    capture_prices[(window_nan_counts > 0) | (window_weights == 0)] = np.nan
+
+    df_capture_prices = pd.DataFrame(capture_prices, index=pd.to_datetime(dt_rng), columns=df_weights.columns)
+
+    if isinstance(s_weight, pd.DataFrame):
+        return df_capture_prices
+
+    s_capture_prices = df_capture_prices.iloc[:, 0].rename(None)
+
+    return s_capture_prices
+
+# Cell
+def stream_surface(smooth_dates, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), chunk_freq='AS', rounding_dec=1):
+    """Generator that predicts the surface one date chunk at a time, yielding each chunk's (x by date) surface"""
+    if isinstance(smooth_dates, str):
+        smooth_dates = pickle.load(open(smooth_dates, 'rb'))
+
+    dt_pred = pd.DatetimeIndex(dt_pred)
+
+    if dt_pred.size == 0:
+        return
+
+    chunk_dts = pd.date_range(dt_pred[0], dt_pred[-1], freq=chunk_freq)
+    chunk_dts = chunk_dts.union([dt_pred[0], dt_pred[-1] + pd.Timedelta(days=1)])
+    chunk_idxs = dt_pred.searchsorted(chunk_dts)
+
+    for start_idx, end_idx in zip(chunk_idxs[:-1], chunk_idxs[1:]):
+        if start_idx == end_idx:
+            continue
+
+        df_pred = smooth_dates.predict(x_pred=x_pred, dt_pred=dt_pred[start_idx:end_idx])
+        df_pred.index = np.round(df_pred.index, rounding_dec)
+
+        yield df_pred
+
+def stream_multi_pred_ts(smooth_dates, series, x_pred=np.linspace(-2, 61, 631), chunk_freq='AS', rounding_dec=1):
+    """
+    Generator that streams any number of half-hourly input series through the surface prediction
+    one date chunk at a time, only the surface for the current chunk is held in memory
+
+    Parameters:
+        smooth_dates: Fitted `SmoothDates` model or the filepath of its pickle
+        series: Mapping from the name of each input series to its values
+        x_pred: Independent variable locations for the surface prediction
+        chunk_freq: Pandas frequency used to split the local dates into chunks
+        rounding_dec: Decimal places the x values are rounded to when looking up the surface
+    """
+    if isinstance(smooth_dates, str):
+        smooth_dates = pickle.load(open(smooth_dates, 'rb'))
+
+    df_inputs = pd.DataFrame(series).dropna(how='all').sort_index()
+
+    if df_inputs.size == 0:
+        return
+
+    local_dates = get_local_dates(df_inputs.index)
+    chunk_dts = pd.date_range(local_dates[0], local_dates[-1], freq=chunk_freq)
+    chunk_dts = chunk_dts.union([local_dates[0], local_dates[-1] + pd.Timedelta(days=1)])
+    chunk_idxs = local_dates.searchsorted(chunk_dts)
+
+    for chunk_start_dt, chunk_end_dt, start_idx, end_idx in zip(chunk_dts[:-1], chunk_dts[1:], chunk_idxs[:-1], chunk_idxs[1:]):
+        if start_idx == end_idx:
+            continue
+
+        df_chunk = df_inputs.iloc[start_idx:end_idx]
+
+        dt_pred = pd.date_range(chunk_start_dt, chunk_end_dt-pd.Timedelta(days=1), freq='D')
+        df_pred = smooth_dates.predict(x_pred=x_pred, dt_pred=dt_pred)
+        df_pred.index = np.round(df_pred.index, rounding_dec)
+
+        df_pred_ts_chunk = construct_multi_pred_ts({name: df_chunk[name] for name in df_chunk.columns}, df_pred, rounding_dec=rounding_dec)
+
+        yield df_pred_ts_chunk
+
+def stream_moe(smooth_dates, s_dispatchable, s_demand, x_pred=np.linspace(-2, 61, 631), chunk_freq='AS', rounding_dec=1):
+    """
+    Generator that streams the half-hourly data through the surface prediction and MOE
+    differencing one date chunk at a time, only the surface for the current chunk is held in memory
+
+    Parameters:
+        smooth_dates: Fitted `SmoothDates` model or the filepath of its pickle
+        s_dispatchable: Dispatchable generation time-series
+        s_demand: Demand time-series
+        x_pred: Independent variable locations for the surface prediction
+        chunk_freq: Pandas frequency used to split the local dates into chunks
+        rounding_dec: Decimal places the x values are rounded to when looking up the surface
+    """
+    df_inputs = pd.DataFrame({'dispatchable_pred': s_dispatchable, 'demand_pred': s_demand}).dropna()
+
+    df_pred_ts_chunks = stream_multi_pred_ts(smooth_dates, df_inputs, x_pred=x_pred, chunk_freq=chunk_freq, rounding_dec=rounding_dec)
+
+    for df_moe_chunk in df_pred_ts_chunks:
+        df_moe_chunk['moe'] = df_moe_chunk['demand_pred'] - df_moe_chunk['dispatchable_pred']
+
+        yield df_moe_chunk
+
+@profiled()
+def summarise_moe_aggs(df_aggs, df_prev_aggs, running_totals, cols, rolling_window=28):
+    """Converts the period sums and counts into means, running totals and rolling means"""
+    df_window_aggs = pd.concat([df_prev_aggs, df_aggs])
+    df_rolling_aggs = df_window_aggs.rolling(rolling_window, min_periods=rolling_window).sum().loc[df_aggs.index]
+
+    df_summary = pd.DataFrame(index=df_aggs.index)
+
+    for col in cols:
+        df_summary[f'{col}_mean'] = df_aggs[f'{col}_sum']/df_aggs[f'{col}_count']
+        df_summary[f'{col}_total'] = df_aggs[f'{col}_sum']
+        df_summary[f'{col}_running_total'] = df_aggs[f'{col}_sum'].cumsum() + running_totals[col]
+        df_summary[f'{col}_rolling_mean'] = df_rolling_aggs[f'{col}_sum']/df_rolling_aggs[f'{col}_count']
+
+    return df_summary
+
+def stream_moe_aggregates(df_moe_chunks, agg_freq='D', rolling_window=28):
+    """
+    Aggregates the streamed MOE chunks into periods, emitting their means, running totals
+    and rolling means. Only the trailing `rolling_window` periods are held between chunks.
+    """
+    cols = ['dispatchable_pred', 'demand_pred', 'moe']
+    running_totals = pd.Series(0., index=cols)
+    df_prev_aggs = pd.DataFrame()
+    df_pending_aggs = pd.DataFrame()
+
+    for df_moe_chunk in df_moe_chunks:
+        df_resampler = df_moe_chunk[cols].resample(agg_freq)
+        df_aggs = pd.concat([df_resampler.sum().add_suffix('_sum'), df_resampler.count().add_suffix('_count')], axis=1)
 
-    for start_dt in dt_rng:
-        end_dt = start_dt + pd.Timedelta(days=end_dt_delta_days)
+        # The last period may continue into the next chunk so it's held back until then
+        df_aggs = pd.concat([df_pending_aggs, df_aggs]).groupby(level=0).sum()
+        df_aggs, df_pending_aggs = df_aggs.iloc[:-1], df_aggs.iloc[-1:]
 
-        if s_weight is not None:
-            weights = s_weight[start_dt:end_dt]
+        if df_aggs.size == 0:
+            continue
+
+        yield summarise_moe_aggs(df_aggs, df_prev_aggs, running_totals, cols, rolling_window=rolling_window)
+
+        running_totals += df_aggs[[f'{col}_sum' for col in cols]].sum().values
+        df_prev_aggs = pd.concat([df_prev_aggs, df_aggs]).iloc[-rolling_window:]
+
+    if df_pending_aggs.size > 0:
+        yield summarise_moe_aggs(df_pending_aggs, df_prev_aggs, running_totals, cols, rolling_window=rolling_window)
+
+@profiled()
+def run_moe_pipeline(moe_jobs, x_pred=np.linspace(-2, 61, 631), chunk_freq='AS', agg_freq='D', rolling_window=28, rounding_dec=1):
+    """
+    Runs the chunked MOE pipeline for each job, e.g. every country and quantile model
+
+    Parameters:
+        moe_jobs: Mapping from the job name to a dictionary with `model_fp` (or `model`), `s_dispatchable` and `s_demand`
+        x_pred: Independent variable locations for the surface prediction
+        chunk_freq: Pandas frequency used to split the local dates into chunks
+        agg_freq: Pandas frequency the MOE and predictions are aggregated to
+        rolling_window: Number of aggregation periods in the rolling means
+        rounding_dec: Decimal places the x values are rounded to when looking up the surface
+
+    Returns:
+        job_to_df_moe: Mapping from the job name to its aggregated MOE DataFrame
+    """
+    job_to_df_moe = dict()
+
+    for job_name, moe_job in moe_jobs.items():
+        df_moe_chunks = stream_moe(moe_job.get('model', moe_job.get('model_fp')), moe_job['s_dispatchable'], moe_job['s_demand'],
+                                   x_pred=x_pred, chunk_freq=chunk_freq, rounding_dec=rounding_dec)
+
+        df_moe_summaries = list(stream_moe_aggregates(df_moe_chunks, agg_freq=agg_freq, rolling_window=rolling_window))
+        job_to_df_moe[job_name] = pd.concat(df_moe_summaries) if len(df_moe_summaries) > 0 else pd.DataFrame()
+
+    return job_to_df_moe
+
+# Cell
+def construct_scenario_state(surface_values, surface_x, x_values, col_idxs, rounding_dec=1):
+    """Collects the surface and inputs shared by every scenario"""
+    scenario_state = {
+        'surface_values': surface_values,
+        'surface_x': pd.Index(surface_x),
+        'x_values': x_values,
+        'col_idxs': col_idxs,
+        'rounding_dec': rounding_dec
+    }
+
+    return scenario_state
+
+scenario_worker_state = dict()
+
+def init_scenario_worker(surface_values, surface_x, x_values, col_idxs, rounding_dec=1):
+    """Stores the shared surface and inputs once per worker process, only used as a process pool initialiser"""
+    scenario_worker_state.update(construct_scenario_state(surface_values, surface_x, x_values, col_idxs, rounding_dec=rounding_dec))
+
+    return
+
+def evaluate_scenario(scenario_state, x_shift=0, x_scale=1):
+    """Predicts the time-series for a single x-shift/scale scenario using the shared surface and inputs"""
+    x_scenario = scenario_state['x_values']*x_scale + x_shift
+    row_idxs = scenario_state['surface_x'].get_indexer(np.round(x_scenario, scenario_state['rounding_dec']))
+    preds = gather_surface_preds(scenario_state['surface_values'], row_idxs, scenario_state['col_idxs'])
+
+    return preds
+
+def evaluate_scenarios(scenario_specs, scenario_state=None):
+    """Evaluates a batch of scenario specifications, in a pool worker the state stored by its initialiser is used"""
+    if scenario_state is None:
+        scenario_state = scenario_worker_state
+
+    scenario_preds = [evaluate_scenario(scenario_state, **scenario_spec) for scenario_spec in scenario_specs]
+
+    return scenario_preds
+
+def calc_scenario_savings(df_scenario_moe, s_volume):
+    """
+    Weights each period's price difference by the volume it applies to (as for the MOE totals).
+    Periods of `s_volume` without a difference (e.g. where the scenario or baseline falls outside
+    of the surface) are excluded, the fraction of the volume that was covered is reported alongside
+    the savings.
+    """
+    s_volume = s_volume.dropna()
+    df_scenario_moe = df_scenario_moe.reindex(s_volume.index)
+
+    volume = s_volume.values
+    total_volume = volume.sum()
+
+    scenario_savings = dict()
+
+    for scenario_name, s_moe in df_scenario_moe.items():
+        is_covered = np.isfinite(s_moe.values)
+        covered_volume = volume[is_covered].sum()
+
+        scenario_savings[scenario_name] = {
+            'saving': (s_moe.values[is_covered]*volume[is_covered]).sum(),
+            'volume_weighted_moe': (s_moe.values[is_covered]*volume[is_covered]).sum()/covered_volume if covered_volume > 0 else np.nan,
+            'covered_volume_frac': covered_volume/total_volume if total_volume > 0 else np.nan
+        }
+
+    df_scenario_savings = pd.DataFrame.from_dict(scenario_savings, orient='index')
+
+    return df_scenario_savings
+
+@profiled()
+def run_scenarios(s_dispatchable, s_demand, scenarios, model_fp=None, df_pred=None, x_pred=np.linspace(-2, 61, 631),
+                  dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), rounding_dec=1, n_jobs=1):
+    """
+    Evaluates a batch of counterfactual dispatchable scenarios against a single cached surface,
+    e.g. `{'5GW_less_wind': {'x_shift': 5}}` describes the dispatchable generation that would
+    have been needed with 5 GW less wind. Scenario predictions are vectorised gathers from the
+    surface and are split across `n_jobs` processes.
+
+    Parameters:
+        s_dispatchable: Observed dispatchable generation time-series
+        s_demand: Demand (or other volume, e.g. MWh per settlement period) that each period's price difference applies to
+        scenarios: Mapping from the scenario name to its `x_shift` and/or `x_scale`
+        model_fp: Filepath of the pre-fitted model, used if `df_pred` isn't provided
+        df_pred: Pre-computed prediction surface
+        x_pred: Independent variable locations for the surface prediction
+        dt_pred: Date locations for the surface prediction
+        rounding_dec: Decimal places the x values are rounded to when looking up the surface
+        n_jobs: Number of processes to evaluate the scenarios across
+
+    Returns:
+        df_scenario_moe: Difference between each scenario's prediction and the baseline prediction, nan where either falls outside the surface
+        df_scenario_savings: Volume-weighted total and mean of each scenario's MOE, as well as the fraction of the volume covered by the surface
+    """
+    if n_jobs < 1:
+        raise ValueError(f'`n_jobs` must be at least 1, but {n_jobs} was passed')
+
+    if df_pred is None:
+        assert model_fp is not None, 'Either `model_fp` or `df_pred` must be provided'
+        df_pred = get_cached_df_pred(model_fp, x_pred=x_pred, dt_pred=dt_pred)
+
+    s_volume = s_demand.reindex(s_dispatchable.dropna().index)
+    s_dispatchable = clean_pred_ts_inputs(s_dispatchable, df_pred)
+    row_idxs, col_idxs = get_surface_idxs(s_dispatchable, df_pred, rounding_dec=rounding_dec)
+    s_baseline_pred = pd.Series(gather_surface_preds(df_pred.values, row_idxs, col_idxs), index=s_dispatchable.index)
+
+    worker_args = (df_pred.values, df_pred.index.values, s_dispatchable.values, col_idxs, rounding_dec)
+    scenario_specs = list(scenarios.values())
+
+    if n_jobs == 1:
+        scenario_preds = evaluate_scenarios(scenario_specs, scenario_state=construct_scenario_state(*worker_args))
+    else:
+        scenario_spec_batches = [scenario_specs[i::n_jobs] for i in range(n_jobs)]
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_scenario_worker, initargs=worker_args) as executor:
+            batch_preds = list(executor.map(evaluate_scenarios, scenario_spec_batches))
+
+        scenario_preds = [None]*len(scenario_specs)
+        for i, preds in enumerate(batch_preds):
+            scenario_preds[i::n_jobs] = preds
+
+    df_scenario_moe = pd.DataFrame(
+        {name: preds - s_baseline_pred.values for name, preds in zip(scenarios.keys(), scenario_preds)},
+        index=s_dispatchable.index
+    )
+
+    df_scenario_savings = calc_scenario_savings(df_scenario_moe, s_volume)
+
+    return df_scenario_moe, df_scenario_savings
+
+# Cell
+def predict_model_surface(model, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), rounding_dec=1):
+    """Predicts the surface of a single fitted model, loading it first if a pickle filepath is provided"""
+    if isinstance(model, str):
+        model = pickle.load(open(model, 'rb'))
+
+    df_pred = model.predict(x_pred=x_pred, dt_pred=dt_pred)
+    df_pred.index = np.round(df_pred.index, rounding_dec)
+
+    return df_pred
+
+@profiled()
+def predict_model_surfaces(models, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), rounding_dec=1, n_jobs=4):
+    """
+    Predicts the surfaces of many fitted models (e.g. countries x quantiles x price/carbon)
+    concurrently from a thread pool. `SmoothDates.predict` doesn't modify the model, so the
+    model arrays and the cached prediction weights are shared read-only between the threads,
+    and the matrix products that make up most of each prediction release the GIL. This avoids
+    loading every model (and its dependencies) into a separate process.
+
+    Parameters:
+        models: Mapping from each model's name to the fitted `SmoothDates` model or the filepath of its pickle
+        x_pred: Independent variable locations for the surface prediction
+        dt_pred: Date locations for the surface prediction
+        rounding_dec: Decimal places the x values of the surfaces are rounded to
+        n_jobs: Number of threads to predict the models across
+
+    Returns:
+        model_to_df_pred: Mapping from each model's name to its prediction surface
+    """
+    x_pred = np.asarray(x_pred, dtype=float)
+    dt_pred = pd.DatetimeIndex(dt_pred)
+
+    if n_jobs == 1:
+        model_to_df_pred = {name: predict_model_surface(model, x_pred=x_pred, dt_pred=dt_pred, rounding_dec=rounding_dec) for name, model in models.items()}
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            model_to_future = {name: executor.submit(predict_model_surface, model, x_pred=x_pred, dt_pred=dt_pred, rounding_dec=rounding_dec) for name, model in models.items()}
+            model_to_df_pred = {name: future.result() for name, future in model_to_future.items()}
+
+    return model_to_df_pred
+
+# Cell
+def get_position_lookup(keys):
+    """Constructs a dense array mapping each integer key (offset by the minimum key) to its position, missing keys map to -1"""
+    keys = np.asarray(keys, dtype=np.int64)
+    min_key = keys.min()
+
+    key_to_position = np.full(keys.max() - min_key + 1, -1, dtype=np.int64)
+    key_to_position[keys - min_key] = np.arange(keys.size)
+
+    return min_key, key_to_position
+
+def dt_to_local_day(dt):
+    """Converts a single datetime (or ISO formatted string) to the number of days between its local date and the epoch"""
+    if isinstance(dt, str):
+        dt = datetime.datetime.fromisoformat(dt)
+    elif isinstance(dt, np.datetime64):
+        dt = pd.Timestamp(dt)
+
+    return dt.toordinal() - 719163 # ordinal of 1970-01-01
+
+def dts_to_local_days(dts):
+    """Converts the datetimes to the number of days between their local dates and the epoch"""
+    dt_idx = pd.to_datetime(dts)
+
+    if not isinstance(dt_idx, pd.DatetimeIndex): # e.g. ISO formatted strings with differing UTC offsets either side of a DST change
+        return np.array([dt_to_local_day(dt) for dt in dt_idx], dtype=np.int64)
+
+    local_days = get_local_dates(dt_idx).values.astype('datetime64[D]').astype(np.int64)
+
+    return local_days
+
+class SurfaceQueryService:
+    """
+    Serves low-latency queries of the form "value at dispatchable x on date d for
+    quantile q" from surfaces that are preloaded into a single (quantile by x by date)
+    array. The x values are rounded and the datetimes converted to their local dates
+    in the same way as `construct_multi_pred_ts`, then mapped to their positions with
+    dense lookup arrays so each query is a handful of integer operations. Queries
+    outside of the surfaces return nan.
+
+    Example Usage:
+    ```
+    service = SurfaceQueryService({0.1: 'models/DAM_price_GB_p10.pkl', 0.5: 'models/DAM_price_GB_p50.pkl'})
+
+    price = service.query(25.3, '2020-06-01 18:00', quantile=0.5)
+    prices = service.query_batch(s_dispatchable.values, s_dispatchable.index, quantiles=0.5)
+
+    server = service.start_server(port=8050) # GET /query?x=25.3&dt=2020-06-01&quantile=0.5
+    ```
+
+    Initialisation Parameters:
+        models: Mapping from each quantile to its fitted `SmoothDates` model, the filepath of its pickle, or its (x by date) prediction surface
+        x_pred: Independent variable locations for the surface prediction
+        dt_pred: Date locations for the surface prediction
+        rounding_dec: Decimal places the x values are rounded to when looking up the surface
+        dtype: Data type the surfaces are stored as, e.g. `np.float32` to halve their memory
+        n_jobs: Number of threads to predict the models' surfaces across
+
+    Attributes:
+        quantiles: Quantiles of the preloaded surfaces
+        surface_values: The surfaces stacked into a (quantile by x by date) array
+        surface_x: Rounded x values of the surface rows
+        surface_dates: Local dates of the surface columns
+    """
+
+    def __init__(self, models, x_pred=np.linspace(-2, 61, 631), dt_pred=pd.date_range('2009-01-01', '2020-12-31', freq='1D'), rounding_dec=1, dtype=np.float64, n_jobs=4):
+        self.rounding_dec = rounding_dec
+
+        model_qs = {q: model for q, model in models.items() if not isinstance(model, pd.DataFrame)}
+        q_to_df_pred = {q: df_pred for q, df_pred in models.items() if isinstance(df_pred, pd.DataFrame)}
+        q_to_df_pred.update(predict_model_surfaces(model_qs, x_pred=x_pred, dt_pred=dt_pred, rounding_dec=rounding_dec, n_jobs=n_jobs))
+
+        self.quantiles = sorted(q_to_df_pred.keys())
+        df_first_pred = q_to_df_pred[self.quantiles[0]]
+
+        self.surface_x = np.round(np.asarray(df_first_pred.index, dtype=float), rounding_dec)
+        self.surface_dates = get_local_dates(pd.DatetimeIndex(df_first_pred.columns))
+        self.surface_values = np.stack([
+            q_to_df_pred[q].reindex(index=df_first_pred.index, columns=df_first_pred.columns).values.astype(dtype)
+            for q in self.quantiles
+        ])
+
+        self.construct_lookups()
+
+        return
+
+
+    def construct_lookups(self):
+        """Constructs the dense key to position lookups for the quantiles, x values and dates"""
+        self.x_scale = 10**self.rounding_dec
+        self.quantile_to_position = {q: i for i, q in enumerate(self.quantiles)}
+
+        self.min_x_key, self.x_key_to_row = get_position_lookup(np.rint(self.surface_x*self.x_scale))
+        self.min_day, self.day_to_col = get_position_lookup(dts_to_local_days(self.surface_dates))
+
+        return
+
+
+    def query(self, x, dt, quantile=0.5):
+        """
+        Looks up the surface value for a single query
+
+        Parameters:
+            x: Independent variable value, e.g. the dispatchable generation
+            dt: Datetime (or ISO formatted string) whose local date is used
+            quantile: Quantile of the surface to use
+
+        Returns:
+            value: Surface value, nan if the query is outside of the surfaces
+        """
+        if not np.isfinite(x):
+            return np.nan # consistent with `query_batch`, where missing x values fall outside of the lookup
+
+        x_key = int(round(x*self.x_scale)) - self.min_x_key
+        day = dt_to_local_day(dt) - self.min_day
+
+        if not (0 <= x_key < self.x_key_to_row.size and 0 <= day < self.day_to_col.size):
+            return np.nan
+
+        row, col = self.x_key_to_row[x_key], self.day_to_col[day]
+
+        if row < 0 or col < 0:
+            return np.nan
+
+        return float(self.surface_values[self.quantile_to_position[quantile], row, col])
+
+
+    def query_batch(self, x, dts, quantiles=0.5):
+        """
+        Looks up the surface values for a batch of queries with a single vectorised gather
+
+        Parameters:
+            x: Independent variable values
+            dts: Datetimes (or ISO formatted strings) whose local dates are used
+            quantiles: Quantile of the surface to use for each query, or a single quantile for all of them
+
+        Returns:
+            values: Surface values, nan where the queries are outside of the surfaces
+        """
+        x_keys = np.rint(np.asarray(x, dtype=float)*self.x_scale) - self.min_x_key # kept as floats so missing x values fall outside of the lookup
+        days = dts_to_local_days(dts) - self.min_day
+
+        if np.ndim(quantiles) == 0:
+            q_positions = np.full(x_keys.shape, self.quantile_to_position[quantiles])
         else:
-            weights=None
+            q_positions = np.array([self.quantile_to_position[q] for q in quantiles])
+
+        is_x_covered = (x_keys >= 0) & (x_keys < self.x_key_to_row.size)
+        rows = np.where(is_x_covered, self.x_key_to_row[np.where(is_x_covered, x_keys, 0).astype(np.int64)], -1)
+        cols = np.where((days >= 0) & (days < self.day_to_col.size), self.day_to_col[days.clip(0, self.day_to_col.size-1)], -1)
+
+        values = np.full(x_keys.shape, np.nan)
+        is_valid = (rows >= 0) & (cols >= 0)
+        values[is_valid] = self.surface_values[q_positions[is_valid], rows[is_valid], cols[is_valid]]
+
+        return values
+
+
+    def start_server(self, host='127.0.0.1', port=8050, block=False):
+        """
+        Serves the queries over a local HTTP endpoint, `GET /query?x=..&dt=..&quantile=..` answers a
+        single query and `POST /query` with a JSON body of `x`, `dt` and `quantile` lists answers a batch
+
+        Parameters:
+            host: Address to serve the endpoint on, only the local machine by default
+            port: Port to serve the endpoint on, 0 selects a free port
+            block: Flag specifying whether to serve in the current thread rather than a background thread
+
+        Returns:
+            server: The HTTP server, its `server_address` holds the port and `shutdown` stops it
+        """
+        server = ThreadingHTTPServer((host, port), SurfaceQueryHandler)
+        server.service = self
+
+        if block == True:
+            server.serve_forever()
+        else:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        return server
+
+class SurfaceQueryHandler(BaseHTTPRequestHandler):
+    """Answers the HTTP queries using the `SurfaceQueryService` attached to the server"""
+
+    def send_json(self, response, status=200):
+        response_json = json.dumps(response).encode()
 
-        capture_prices[start_dt] = np.average(s[start_dt:end_dt], weights=weights)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response_json)))
+        self.end_headers()
+        self.wfile.write(response_json)
+
+        return
+
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path != '/query':
+            return self.send_json({'error': f'Unknown path {url.path}'}, status=404)
+
+        try:
+            value = self.server.service.query(float(params['x']), params['dt'], quantile=float(params.get('quantile', 0.5)))
+        except (KeyError, ValueError) as e:
+            return self.send_json({'error': f'Invalid query: {e}'}, status=400)
+
+        self.send_json({'value': None if np.isnan(value) else value})
+
+        return
+
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/query':
+            return self.send_json({'error': f'Unknown path {self.path}'}, status=404)
+
+        try:
+            batch = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            values = self.server.service.query_batch(batch['x'], batch['dt'], quantiles=batch.get('quantile', 0.5))
+        except (KeyError, ValueError, TypeError) as e:
+            return self.send_json({'error': f'Invalid query: {e}'}, status=400)
+
+        self.send_json({'values': [None if np.isnan(value) else value for value in values.tolist()]})
+
+        return
 
-    s_capture_prices = pd.Series(capture_prices)
-    s_capture_prices.index = pd.to_datetime(s_capture_prices.index)
 
-    return s_capture_prices
\ No newline at end of file
+    def log_message(self, format, *args):
+        return # the per-request logging would dominate the latency
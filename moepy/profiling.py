@@ -0,0 +1,238 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-11-profiling.ipynb (unless otherwise specified).
+
+__all__ = ['profiler_state', 'get_array_sizes', 'Profiler', 'profile_stage', 'profiled']
+
+# Cell
+import os
+import json
+import time
+import threading
+import functools
+import numpy as np
+import pandas as pd
+
+# Cell
+profiler_state = {'profiler': None}
+
+def get_array_sizes(args, kwargs):
+    """Identifies the shapes of any array-like arguments, keyed by their position or name"""
+    array_sizes = dict()
+
+    for arg_name, arg in list(enumerate(args)) + list(kwargs.items()):
+        if hasattr(arg, 'shape'):
+            array_sizes[str(arg_name)] = list(arg.shape)
+
+    return array_sizes
+
+# Cell
+class Profiler:
+    """
+    Records the wall time, call count and array sizes of the instrumented
+    stages in `lowess` and `moe`. Stages are only recorded whilst the
+    profiler is active, otherwise the instrumentation is a single lookup.
+    Stages run inside worker processes are not recorded.
+
+    Example Usage:
+    ```
+    with Profiler() as profiler:
+        smooth_dates.fit(x, y, dt_idx=dt_idx, reg_dates=reg_dates, frac=0.3, num_fits=31)
+
+    df_summary = profiler.summary()
+    profiler.to_chrome_trace('fit_trace.json')
+    ```
+
+    Attributes:
+        events: Records of each completed stage, including its path, start, duration and array sizes
+        start_time: Time at which the profiler was activated
+    """
+
+    def __init__(self):
+        self.events = []
+        self.start_time = None
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        return
+
+
+    def __enter__(self):
+        self.previous_profiler = profiler_state['profiler']
+        profiler_state['profiler'] = self
+        self.start_time = time.perf_counter()
+
+        return self
+
+
+    def __exit__(self, *exc_info):
+        profiler_state['profiler'] = self.previous_profiler
+
+        return False
+
+
+    def get_stack(self):
+        """Retrieves the stack of open stages for the current thread"""
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+
+        return self.local.stack
+
+
+    def start_stage(self, name, array_sizes=None):
+        """Opens a stage, nesting it within any stage that is already open in this thread"""
+        stack = self.get_stack()
+        stack += [{'name': name, 'start': time.perf_counter(), 'child_duration': 0, 'array_sizes': array_sizes or {}}]
+
+        return
+
+
+    def end_stage(self):
+        """Closes the most recently opened stage in this thread and records it"""
+        end = time.perf_counter()
+        stack = self.get_stack()
+
+        stage = stack.pop()
+        duration = end - stage['start']
+
+        if len(stack) > 0:
+            stack[-1]['child_duration'] += duration
+
+        event = {
+            'name': stage['name'],
+            'path': ';'.join([parent['name'] for parent in stack] + [stage['name']]),
+            'start': stage['start'] - self.start_time,
+            'duration': duration,
+            'self_duration': duration - stage['child_duration'],
+            'thread': threading.get_ident(),
+            'array_sizes': stage['array_sizes']
+        }
+
+        with self.lock:
+            self.events += [event]
+
+        return
+
+
+    def summary(self):
+        """Aggregates the recorded events into the call count, wall time and self time of each stage"""
+        if len(self.events) == 0:
+            return pd.DataFrame(columns=['calls', 'total_s', 'self_s', 'mean_s', 'max_s', 'total_elements'], dtype=float)
+
+        df_events = pd.DataFrame(self.events)
+        df_events['elements'] = df_events['array_sizes'].apply(lambda array_sizes: sum([int(np.prod(shape)) for shape in array_sizes.values()]))
+
+        df_summary = (df_events
+                      .groupby('name')
+                      .agg(calls=('duration', 'size'),
+                           total_s=('duration', 'sum'),
+                           self_s=('self_duration', 'sum'),
+                           mean_s=('duration', 'mean'),
+                           max_s=('duration', 'max'),
+                           total_elements=('elements', 'sum'))
+                      .sort_values('self_s', ascending=False))
+
+        return df_summary
+
+
+    def to_json(self, fp=None):
+        """Exports the stage summary and raw events as JSON, saving them if a filepath is provided"""
+        profile = {
+            'summary': self.summary().reset_index().to_dict(orient='records'),
+            'events': self.events
+        }
+
+        profile_json = json.dumps(profile, indent=4, default=float)
+
+        if fp is not None:
+            with open(fp, 'w') as f:
+                f.write(profile_json)
+
+        return profile_json
+
+
+    def to_chrome_trace(self, fp=None):
+        """Exports the events in the Chrome trace format, which can be viewed as a flame chart in Perfetto or speedscope"""
+        trace_events = [
+            {
+                'name': event['name'],
+                'cat': event['name'].split('.')[0],
+                'ph': 'X',
+                'ts': event['start']*1e6,
+                'dur': event['duration']*1e6,
+                'pid': os.getpid(),
+                'tid': event['thread'],
+                'args': event['array_sizes']
+            }
+            for event
+            in self.events
+        ]
+
+        trace = {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+        if fp is not None:
+            with open(fp, 'w') as f:
+                json.dump(trace, f)
+
+        return trace
+
+
+    def to_collapsed_stacks(self, fp=None):
+        """Exports the self time (in microseconds) of each stage path in the collapsed stack format used by flamegraph tools"""
+        path_to_self_duration = dict()
+
+        for event in self.events:
+            path_to_self_duration[event['path']] = path_to_self_duration.get(event['path'], 0) + event['self_duration']
+
+        collapsed_stacks = '\n'.join([f'{path} {int(round(self_duration*1e6))}' for path, self_duration in path_to_self_duration.items()])
+
+        if fp is not None:
+            with open(fp, 'w') as f:
+                f.write(collapsed_stacks)
+
+        return collapsed_stacks
+
+# Cell
+class profile_stage:
+    """Context manager that records the enclosed block as a stage when a `Profiler` is active"""
+
+    def __init__(self, name, **arrays):
+        self.name = name
+        self.arrays = arrays
+
+
+    def __enter__(self):
+        self.profiler = profiler_state['profiler']
+
+        if self.profiler is not None:
+            self.profiler.start_stage(self.name, get_array_sizes((), self.arrays))
+
+        return self
+
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.end_stage()
+
+        return False
+
+def profiled(name=None):
+    """Decorator that records each call of the function as a stage when a `Profiler` is active"""
+    def decorator(func):
+        stage_name = name if name is not None else f"{func.__module__.split('.')[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = profiler_state['profiler']
+
+            if profiler is None:
+                return func(*args, **kwargs)
+
+            profiler.start_stage(stage_name, get_array_sizes(args, kwargs))
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.end_stage()
+
+        return wrapper
+
+    return decorator
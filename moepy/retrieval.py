@@ -1,6 +1,7 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-01-retrieval.ipynb (unless otherwise specified).
 
-__all__ = ['query_API', 'dict_col_2_cols', 'clean_nested_dict_cols', 'set_dt_idx', 'create_df_dt_rng', 'clean_df_dts',
+__all__ = ['query_API', 'dict_col_2_cols', 'clean_nested_dict_cols', 'values_2_typed_array', 'json_records_2_df',
+           'set_dt_idx', 'dt_rng_2_SPs', 'construct_df_dt_rng', 'create_df_dt_rng', 'clean_df_dts',
            'retrieve_stream_df', 'check_streams', 'retrieve_streams_df', 'parse_A44_response', 'retreive_DAM_prices',
            'parse_A75_response', 'retrieve_production']
 
@@ -10,14 +11,10 @@ import numpy as np
 import pandas as pd
 
 import os
-import requests
-import xmltodict
 from datetime import date
 from warnings import warn
 from itertools import product
-
-from dotenv import load_dotenv
-from entsoe import EntsoePandasClient, EntsoeRawClient
+from functools import lru_cache
 
 # Cell
 def query_API(start_date:str, end_date:str, stream:str, time_group='30m'):
@@ -45,6 +42,8 @@ def query_API(start_date:str, end_date:str, stream:str, time_group='30m'):
     end_date = format_dt(end_date)
 
     # Running query and parsing response
+    import requests
+
     response = requests.get(f'http://drax-production.herokuapp.com/api/1/{stream}?date_from={start_date}&date_to={end_date}&group_by={time_group}')
     r_json = response.json()
 
@@ -83,6 +82,54 @@ def clean_nested_dict_cols(df):
 
     return df
 
+# Cell
+def values_2_typed_array(values):
+    """Converts a list of JSON values into a float array, falling back to an object array for non-numeric data"""
+    first_value = next((value for value in values if value is not None), None)
+
+    if isinstance(first_value, (int, float)) and not isinstance(first_value, bool):
+        try:
+            return np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            pass
+
+    return np.array(values, dtype=object)
+
+def json_records_2_df(records):
+    """
+    Flattens a list of (nested) JSON records into a DataFrame in a single pass
+
+    Nested dictionaries are unpacked into columns named after their keys, with deeper
+    levels overwriting shallower ones in the same way as `clean_nested_dict_cols`.
+    Keys missing from a record are filled with NaN, and numeric columns are returned
+    as float arrays rather than objects.
+    """
+    num_records = len(records)
+    col_to_values = dict()
+
+    for record_idx, record in enumerate(records):
+        level_dicts = [record]
+
+        while len(level_dicts) > 0:
+            next_level_dicts = []
+
+            for level_dict in level_dicts:
+                for key, value in level_dict.items():
+                    if isinstance(value, dict):
+                        next_level_dicts += [value]
+                        continue
+
+                    if key not in col_to_values:
+                        col_to_values[key] = [None]*num_records
+
+                    col_to_values[key][record_idx] = value
+
+            level_dicts = next_level_dicts
+
+    df = pd.DataFrame({col: values_2_typed_array(values) for col, values in col_to_values.items()}, index=pd.RangeIndex(num_records))
+
+    return df
+
 # Cell
 def set_dt_idx(df:pd.DataFrame, idx_name='local_datetime'):
     """
@@ -97,30 +144,47 @@ def set_dt_idx(df:pd.DataFrame, idx_name='local_datetime'):
 
     return df
 
-def create_df_dt_rng(start_date, end_date, freq='30T', tz='Europe/London', dt_str_template='%Y-%m-%d'):
+def dt_rng_2_SPs(dt_rng):
     """
-    Creates a dataframe mapping between local datetimes and electricity market dates/settlement periods
+    Vectorised calculation of the settlement period and market day for each datetime in the range
+
+    The local datetimes are converted to int64 nanoseconds and floor-divided into days, the
+    settlement period is then the offset from the first datetime of that day. As the day
+    boundaries are calculated on the local time DST days will have 46 or 50 periods.
     """
+    local_dt_ints = (dt_rng.tz_localize(None) if dt_rng.tz is not None else dt_rng).asi8
+    day_ints = local_dt_ints // pd.Timedelta(days=1).value
 
+    unique_day_ints, day_start_idxs, day_idxs = np.unique(day_ints, return_index=True, return_inverse=True)
+    SPs = np.arange(day_ints.size) - day_start_idxs[day_idxs] + 1
+
+    return SPs, unique_day_ints, day_idxs
+
+@lru_cache(maxsize=32)
+def construct_df_dt_rng(start_date, end_date, freq='30T', tz='Europe/London', dt_str_template='%Y-%m-%d'):
+    """Constructs and caches the local datetime to market date/settlement period mapping"""
     # Creating localised datetime index
     s_dt_rng = pd.date_range(start_date, end_date, freq=freq, tz=tz)
-    s_dt_SP_count = pd.Series(0, index=s_dt_rng).resample('D').count()
-
-    # Creating SP column
-    SPs = []
-    for num_SPs in list(s_dt_SP_count):
-        SPs += list(range(1, num_SPs+1))
+    SPs, unique_day_ints, day_idxs = dt_rng_2_SPs(s_dt_rng)
 
     # Creating datetime dataframe
     df_dt_rng = pd.DataFrame(index=s_dt_rng)
     df_dt_rng.index.name = 'local_datetime'
 
-    # Adding query call cols
+    # Adding query call cols, the date strings are only formatted once per day
     df_dt_rng['SP'] = SPs
-    df_dt_rng['date'] = df_dt_rng.index.strftime(dt_str_template)
+    df_dt_rng['date'] = pd.to_datetime(unique_day_ints, unit='D').strftime(dt_str_template).values[day_idxs]
 
     return df_dt_rng
 
+def create_df_dt_rng(start_date, end_date, freq='30T', tz='Europe/London', dt_str_template='%Y-%m-%d'):
+    """
+    Creates a dataframe mapping between local datetimes and electricity market dates/settlement periods
+    """
+    df_dt_rng = construct_df_dt_rng(pd.Timestamp(start_date), pd.Timestamp(end_date), freq=freq, tz=tz, dt_str_template=dt_str_template)
+
+    return df_dt_rng.copy()
+
 def clean_df_dts(df):
     """Cleans the datetime index of the passed DataFrame"""
     df = set_dt_idx(df)
@@ -148,10 +212,9 @@ def retrieve_stream_df(start_date:str, end_date:str, stream:str, time_group='30m
 
     # Calling data and parsing into dataframe
     r_json = query_API(start_date, end_date, stream, time_group)
-    df = pd.DataFrame.from_dict(r_json)
 
-    # Handling entrys which are dictionarys
-    df = clean_nested_dict_cols(df)
+    # Flattening the records, entrys which are dictionarys are unpacked into their own columns
+    df = json_records_2_df(r_json)
 
     # Setting index as localised datetime, reindexing with all intervals and adding SP
     df = clean_df_dts(df)
@@ -214,6 +277,8 @@ def retrieve_streams_df(start_date:str, end_date:str, streams='*', time_group='3
 # Cell
 def parse_A44_response(r, freq='H', tz='UTC'):
     """Extracts the price time-series"""
+    import xmltodict
+
     s_price = pd.Series(dtype=float)
     parsed_r = xmltodict.parse(r.text)
 
@@ -230,6 +295,8 @@ def parse_A44_response(r, freq='H', tz='UTC'):
 # Cell
 def retreive_DAM_prices(dt_pairs, domain='10Y1001A1001A63L'):
     """Retrieves and collates the day-ahead prices for the specified date ranges"""
+    from ipypb import track
+
     params = {
         'documentType': 'A44',
         'in_Domain': domain,
@@ -285,6 +352,8 @@ def parse_A75_response(r, freq='15T', tz='UTC', warn_on_failure=False):
         'B24': 'Transformer'
     }
 
+    import xmltodict
+
     parsed_r = xmltodict.parse(r.text)
 
     columns = [f'B{str(fuel_idx).zfill(2)}' for fuel_idx in np.arange(1, 24)]
@@ -318,6 +387,8 @@ def parse_A75_response(r, freq='15T', tz='UTC', warn_on_failure=False):
 
 def retrieve_production(dt_pairs, domain='10Y1001A1001A63L', warn_on_failure=False):
     """Retrieves and collates the production data for the specified date ranges"""
+    from ipypb import track
+
     params = {
         'documentType': 'A75',
         'processType': 'A16',
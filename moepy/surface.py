@@ -1,18 +1,21 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/dev-04-price-surface-estimation.ipynb (unless otherwise specified).
 
-__all__ = ['PicklableFunction', 'get_fit_kwarg_sets', 'fit_models']
+__all__ = ['PicklableFunction', 'get_fit_kwarg_sets', 'hash_fit_code', 'hash_fit_value', 'get_fit_job_hash',
+           'load_fit_manifest', 'atomic_write', 'construct_fit_jobs', 'get_model_spec_reg_dates',
+           'add_shared_fit_weights', 'add_latest_fit_weights', 'fit_model_job', 'pool_worker_fit_weights',
+           'fit_model_job_in_pool', 'fit_models']
 
 # Cell
 import pandas as pd
 import numpy as np
 
-import seaborn as sns
-import matplotlib.pyplot as plt
-
 import os
+import json
+import time
 import pickle
-import FEAutils as hlp
-from ipypb import track
+import hashlib
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from moepy import lowess, eda
 
@@ -20,6 +23,7 @@ from moepy import lowess, eda
 import copy
 import types
 import marshal
+import importlib
 
 class PicklableFunction:
     """Provides a wrapper to ensure functions can be pickled"""
@@ -33,7 +37,8 @@ class PicklableFunction:
         try:
             return pickle.dumps(self._fun)
         except Exception:
-            return marshal.dumps((self._fun.__code__, self._fun.__name__))
+            # the defaults and module are kept so that lambdas still work when called in another process
+            return pickle.dumps((marshal.dumps(self._fun.__code__), self._fun.__name__, self._fun.__defaults__, self._fun.__module__))
 
     def __setstate__(self, state):
         try:
@@ -42,6 +47,11 @@ class PicklableFunction:
             code, name = marshal.loads(state)
             self._fun = types.FunctionType(code, {}, name)
 
+        if isinstance(self._fun, tuple):
+            code, name, defaults, module = self._fun
+            fun_globals = importlib.import_module(module).__dict__ if module is not None else {}
+            self._fun = types.FunctionType(marshal.loads(code), fun_globals, name, defaults)
+
         return
 
 def get_fit_kwarg_sets(qs=np.linspace(0.1, 0.9, 9)):
@@ -61,35 +71,293 @@ def get_fit_kwarg_sets(qs=np.linspace(0.1, 0.9, 9)):
     return fit_kwarg_sets
 
 # Cell
-def fit_models(model_definitions, models_dir):
-    """Fits LOWESS variants using the specified model definitions"""
+def hash_fit_code(code, hasher):
+    """
+    Feeds a code object's bytecode, constants and referenced names into the hasher, its
+    filename and line numbers are left out so that moving or reinstalling a function
+    doesn't change the hash unless its body changes
+    """
+    hasher.update(code.co_code)
+    hasher.update(repr(code.co_names).encode())
+
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            hash_fit_code(const, hasher)
+        else:
+            hasher.update(repr(const).encode())
+
+    return
+
+def hash_fit_value(value, hasher):
+    """Recursively feeds a hyper-parameter value (arrays and functions included) into the hasher"""
+    if isinstance(value, dict):
+        for key in sorted(value.keys(), key=str):
+            hasher.update(str(key).encode())
+            hash_fit_value(value[key], hasher)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            hash_fit_value(item, hasher)
+    elif isinstance(value, pd.DatetimeIndex):
+        hasher.update(value.asi8.tobytes())
+    elif isinstance(value, (pd.Series, pd.Index, np.ndarray)):
+        value = np.asarray(value)
+        hasher.update(f'{value.dtype}{value.shape}'.encode())
+        hasher.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, PicklableFunction):
+        hash_fit_value(value._fun, hasher)
+    elif callable(value) and hasattr(value, '__code__'):
+        hasher.update(f'{value.__module__}.{value.__qualname__}'.encode())
+        hash_fit_code(value.__code__, hasher)
+        hash_fit_value(value.__defaults__, hasher)
+    else:
+        hasher.update(repr(value).encode())
+
+    return
+
+def get_fit_job_hash(model_spec, fit_kwarg_set):
+    """Hashes the data and hyper-parameters of a model fit so that any changes invalidate previous results"""
+    hasher = hashlib.md5()
+    hash_fit_value({key: value for key, value in model_spec.items() if key != 'fit_kwarg_sets'}, hasher)
+    hash_fit_value(fit_kwarg_set, hasher)
+
+    return hasher.hexdigest()
+
+def load_fit_manifest(manifest_fp):
+    """Loads the manifest of completed fits, an empty one is returned if it doesn't exist yet"""
+    if not os.path.exists(manifest_fp):
+        return dict()
+
+    with open(manifest_fp, 'r') as f:
+        manifest = json.load(f)
+
+    return manifest
+
+def atomic_write(fp, write_func, mode='wb'):
+    """Writes to a temporary file which then replaces the destination, so interrupted writes can't leave partial files"""
+    tmp_fp = f'{fp}.tmp'
+
+    with open(tmp_fp, mode) as f:
+        write_func(f)
+
+    os.replace(tmp_fp, fp)
+
+    return
+
+def construct_fit_jobs(model_definitions, models_dir, manifest):
+    """Expands the model definitions into model x variant fit jobs, skipping those that are already complete"""
+    fit_jobs = []
+
     for model_parent_name, model_spec in model_definitions.items():
-        for fit_kwarg_set in track(model_spec['fit_kwarg_sets'], label=model_parent_name):
+        for fit_kwarg_set in model_spec['fit_kwarg_sets']:
+            fit_kwarg_set = fit_kwarg_set.copy()
             run_name = fit_kwarg_set.pop('name')
+
             model_name = f'{model_parent_name}_{run_name}'
+            model_fp = f'{models_dir}/{model_name}.pkl'
+            fit_hash = get_fit_job_hash(model_spec, fit_kwarg_set)
+
+            if os.path.exists(model_fp):
+                # Models fitted before the manifest existed are kept, otherwise the hash must still match
+                if model_name not in manifest or manifest[model_name]['hash'] == fit_hash:
+                    continue
+
+            fit_jobs += [{
+                'model_parent_name': model_parent_name,
+                'model_name': model_name,
+                'model_fp': model_fp,
+                'model_spec': {key: value for key, value in model_spec.items() if key != 'fit_kwarg_sets'},
+                'fit_kwarg_set': fit_kwarg_set,
+                'hash': fit_hash
+            }]
+
+    return fit_jobs
+
+def get_model_spec_reg_dates(model_spec):
+    """Constructs the regression dates for a model definition, they're planned from the data when the frequency is 'auto'"""
+    if model_spec['reg_dates_freq'] == 'auto':
+        reg_dates = lowess.plan_reg_dates(
+            model_spec['dt_idx'],
+            threshold_value=model_spec['dates_smoothing_value'],
+            threshold_units=model_spec['dates_smoothing_units']
+        )
+
+        reg_dates = reg_dates[(reg_dates >= model_spec['reg_dates_start']) & (reg_dates <= model_spec['reg_dates_end'])]
+
+    else:
+        reg_dates = pd.date_range(
+            model_spec['reg_dates_start'],
+            model_spec['reg_dates_end'],
+            freq=model_spec['reg_dates_freq']
+        )
+
+    return reg_dates
+
+def add_shared_fit_weights(fit_jobs, weight_kwargs=['frac', 'threshold_value', 'threshold_units', 'reg_anchors', 'num_fits', 'anchor_method'], model_parent_name_to_fit_weights=None):
+    """
+    Calculates the date and distance weightings once per model definition and shares them with each of its
+    variants, an existing mapping from the model name to its weightings can be passed to reuse them across calls
+    """
+    if model_parent_name_to_fit_weights is None:
+        model_parent_name_to_fit_weights = dict()
+
+    for fit_job in fit_jobs:
+        if any([weight_kwarg in fit_job['fit_kwarg_set'].keys() for weight_kwarg in weight_kwargs]):
+            continue # variants which change the weightings can't use the shared ones
+
+        model_parent_name = fit_job['model_parent_name']
+
+        if model_parent_name not in model_parent_name_to_fit_weights.keys():
+            model_spec = fit_job['model_spec']
+            x, _, dt_idx, reg_dates = lowess.process_smooth_dates_fit_inputs(model_spec['x'], model_spec['y'], model_spec['dt_idx'], get_model_spec_reg_dates(model_spec))
+
+            model_parent_name_to_fit_weights[model_parent_name] = lowess.construct_shared_fit_weights(
+                x,
+                dt_idx,
+                reg_dates,
+                frac=model_spec['frac'],
+                threshold_value=model_spec['dates_smoothing_value'],
+                threshold_units=model_spec['dates_smoothing_units'],
+                num_fits=model_spec['num_fits']
+            )
+
+        fit_job['fit_weights'] = model_parent_name_to_fit_weights[model_parent_name]
+
+    return fit_jobs
+
+def add_latest_fit_weights(fit_job, model_parent_name_to_fit_weights):
+    """
+    Adds the shared fit weights to the job from a mapping that only keeps the weightings of the most recent
+    model definition, this lets a worker fitting consecutive variants of a model calculate them once
+    """
+    for model_parent_name in list(model_parent_name_to_fit_weights.keys()):
+        if model_parent_name != fit_job['model_parent_name']:
+            del model_parent_name_to_fit_weights[model_parent_name]
+
+    fit_job = add_shared_fit_weights([fit_job], model_parent_name_to_fit_weights=model_parent_name_to_fit_weights)[0]
+
+    return fit_job
+
+def fit_model_job(fit_job, track_memory=True, save_model=True):
+    """Fits and saves the model for a single fit job, returning its timing and peak memory (and the model itself when it isn't saved)"""
+    model_spec = fit_job['model_spec']
+
+    if track_memory == True:
+        tracemalloc.start()
+
+    start_time = time.perf_counter()
+
+    smooth_dates = lowess.SmoothDates()
+
+    smooth_dates.fit(
+        model_spec['x'],
+        model_spec['y'],
+        dt_idx=model_spec['dt_idx'],
+        reg_dates=get_model_spec_reg_dates(model_spec),
+        fit_weights=fit_job.get('fit_weights'),
+        frac=model_spec['frac'],
+        threshold_value=model_spec['dates_smoothing_value'],
+        threshold_units=model_spec['dates_smoothing_units'],
+        num_fits=model_spec['num_fits'],
+        **fit_job['fit_kwarg_set']
+    )
+
+    fit_time = time.perf_counter() - start_time
+
+    if track_memory == True:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        peak_memory = np.nan
+
+    if save_model == True:
+        atomic_write(fit_job['model_fp'], lambda f: pickle.dump(smooth_dates, f))
+
+    fit_results = {
+        'hash': fit_job['hash'],
+        'model_fp': fit_job['model_fp'],
+        'fit_time_s': fit_time,
+        'peak_memory_mb': peak_memory/1e6,
+        'completed_at': pd.Timestamp.now().isoformat()
+    }
+
+    if save_model == False:
+        fit_results['model'] = smooth_dates
+
+    return fit_results
+
+pool_worker_fit_weights = dict()
+
+def fit_model_job_in_pool(fit_job, track_memory=True, share_fit_weights=True):
+    """
+    Fits a job within a process pool worker, the shared weightings are calculated by the worker
+    rather than being pickled and sent along with every variant of the model definition
+    """
+    if share_fit_weights == True:
+        fit_job = add_latest_fit_weights(fit_job, pool_worker_fit_weights)
+
+    return fit_model_job(fit_job, track_memory=track_memory)
+
+def fit_models(model_definitions, models_dir, n_jobs=1, manifest_fp=None, track_memory=True, share_fit_weights=True, distributed=None):
+    """
+    Fits LOWESS variants using the specified model definitions. The model x variant fits are
+    scheduled across `n_jobs` processes, each model is written atomically and a manifest of the
+    hyper-parameter hashes, fit timings and peak memory is kept so that runs can be resumed
+    and fits with changed inputs are redone. The date and distance weightings are calculated
+    once per model definition (once per process when `n_jobs` > 1) and shared by its variants,
+    so each fit mostly costs the regression solves, only the weightings of the definition being
+    fitted are held in memory. Alternatively the fits can be distributed as tasks to worker
+    processes on this and other hosts, with tasks from lost workers being requeued (see `distributed`).
+
+    Parameters:
+        model_definitions: Mapping from the model name to its data, hyper-parameters and `fit_kwarg_sets`
+        models_dir: Directory the fitted models are saved in
+        n_jobs: Number of processes to fit the models across
+        manifest_fp: Filepath of the fit manifest, defaults to `manifest.json` in the `models_dir`
+        track_memory: Flag specifying whether to record the peak (traced) memory of each fit
+        share_fit_weights: Flag specifying whether to share the weightings between variants of a model definition
+        distributed: Keyword arguments for `distributed.run_distributed_tasks` (e.g. `n_local_workers`), when provided the fits are distributed rather than run with `n_jobs`
+
+    Returns:
+        manifest: Mapping from the model name to its fit information
+    """
+    if manifest_fp is None:
+        manifest_fp = f'{models_dir}/manifest.json'
+
+    manifest = load_fit_manifest(manifest_fp)
+    fit_jobs = construct_fit_jobs(model_definitions, models_dir, manifest)
+
+    if len(fit_jobs) == 0:
+        return manifest
+
+    from ipypb import track
+
+    def record_fit(model_name, fit_results):
+        manifest[model_name] = fit_results
+        atomic_write(manifest_fp, lambda f: json.dump(manifest, f, indent=4), mode='w')
+
+    if distributed is not None:
+        from moepy.distributed import fit_jobs_distributed
+
+        for model_name, fit_results in track(fit_jobs_distributed(fit_jobs, track_memory=track_memory, share_fit_weights=share_fit_weights, **distributed), total=len(fit_jobs), label='Fitting models'):
+            record_fit(model_name, fit_results)
+
+    elif n_jobs == 1:
+        model_parent_name_to_fit_weights = dict() # only the current model definition's weightings are held
+
+        for fit_job in track(fit_jobs, label='Fitting models'):
+            if share_fit_weights == True:
+                fit_job = add_latest_fit_weights(dict(fit_job), model_parent_name_to_fit_weights)
+
+            record_fit(fit_job['model_name'], fit_model_job(fit_job, track_memory=track_memory))
+
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            future_to_model_name = {
+                executor.submit(fit_model_job_in_pool, fit_job, track_memory=track_memory, share_fit_weights=share_fit_weights): fit_job['model_name']
+                for fit_job in fit_jobs
+            }
+
+            for future in track(as_completed(future_to_model_name), total=len(fit_jobs), label='Fitting models'):
+                record_fit(future_to_model_name[future], future.result())
 
-            if f'{model_name}.pkl' not in os.listdir(models_dir):
-                smooth_dates = lowess.SmoothDates()
-
-                reg_dates = pd.date_range(
-                    model_spec['reg_dates_start'],
-                    model_spec['reg_dates_end'],
-                    freq=model_spec['reg_dates_freq']
-                )
-
-                smooth_dates.fit(
-                    model_spec['x'],
-                    model_spec['y'],
-                    dt_idx=model_spec['dt_idx'],
-                    reg_dates=reg_dates,
-                    frac=model_spec['frac'],
-                    threshold_value=model_spec['dates_smoothing_value'],
-                    threshold_units=model_spec['dates_smoothing_units'],
-                    num_fits=model_spec['num_fits'],
-                    **fit_kwarg_set
-                )
-
-                model_fp = f'{models_dir}/{model_name}.pkl'
-                pickle.dump(smooth_dates, open(model_fp, 'wb'))
-
-                del smooth_dates
\ No newline at end of file
+    return manifest
\ No newline at end of file
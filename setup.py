@@ -22,6 +22,7 @@ setuptools.setup(
     url=setup_kwargs['git_url'],
     packages=setuptools.find_packages(),
     install_requires=setup_kwargs['requirements'].split(' '),
+    extras_require={'optional': setup_kwargs.get('optional_requirements', '').split()},
     classifiers=[
         "Programming Language :: Python :: 3",
     ],